@@ -0,0 +1,164 @@
+# app/core/align.py
+import numpy as np
+import pandas as pd
+
+from app.core.config import ALIGN_FFILL_LIMIT, ASSET_CALENDARS, CALENDARS
+from app.core.instrumentation import instrumented
+
+_NS_PER_UNIT = {"s": 1_000_000_000, "ms": 1_000_000, "us": 1_000, "ns": 1}
+
+COVERAGE_COLUMNS = ["Bars", "Observed", "Filled", "Closed", "Missing", "Rows_Dropped", "Coverage", "First", "Last"]
+
+
+def _as_int64(index) -> np.ndarray:
+    """Index -> int64 (nanosecondes epoch UTC), comme PriceArrays."""
+    index = pd.DatetimeIndex(index)
+    index = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+    # Mise à l'échelle directe (as_unit vérifie chaque valeur, ~10x plus lent)
+    return index.asi8 * _NS_PER_UNIT[index.unit]
+
+
+def merge_timestamps(arrays, return_rows=False):
+    """
+    Union triée, sans doublons, de tableaux int64 déjà triés.
+    Le tri stable (timsort) repère les k séries déjà triées et les fusionne :
+    O(n log k) pour n horodatages au total, sans passer par un DataFrame.
+
+    return_rows=True : renvoie aussi, pour chaque tableau, la ligne de la grille de
+    chacun de ses horodatages (sans recherche dichotomique).
+    """
+    arrays = [np.asarray(a, dtype=np.int64) for a in arrays]
+    concat = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+    order = np.argsort(concat, kind="stable")
+    merged = concat[order]
+    keep = np.empty(len(merged), dtype=bool)
+    keep[:1] = True
+    np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+    grid = merged[keep]
+    if not return_rows:
+        return grid
+    rows = np.empty(len(concat), dtype=np.int64)
+    rows[order] = np.cumsum(keep) - 1
+    return grid, np.split(rows, np.cumsum([len(a) for a in arrays])[:-1])
+
+
+def _minutes(hhmm):
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+def session_mask(grid, calendar, intraday=True) -> np.ndarray:
+    """
+    True pour les horodatages (int64 UTC) en séance selon `calendar`
+    ({"tz", "days", "open", "close"}, voir CALENDARS ; None = 24/7).
+    intraday=False (bougies journalières ou plus) : seul le jour de la semaine compte, pris
+    dans la date UTC de la bougie (une bougie de 00:00 UTC serait la veille à New York).
+    """
+    if not calendar:
+        return np.ones(len(grid), dtype=bool)
+    local = pd.DatetimeIndex(grid, tz="UTC")
+    if intraday:
+        local = local.tz_convert(calendar.get("tz", "UTC"))
+    mask = np.isin(local.dayofweek, calendar.get("days", range(7)))
+    if intraday and "open" in calendar:
+        minutes = np.asarray(local.hour * 60 + local.minute)
+        mask &= (minutes >= _minutes(calendar["open"])) & (minutes < _minutes(calendar["close"]))
+    return mask
+
+
+def asset_calendar(key):
+    name = ASSET_CALENDARS.get(key)
+    return CALENDARS[name] if name else None
+
+
+@instrumented()
+def align_frames(frames, ffill_limit=ALIGN_FFILL_LIMIT, calendars=None, column="Close"):
+    """
+    Aligne plusieurs séries sur la grille commune (union des horodatages), par jointure
+    "as-of" : chaque actif prend sa dernière cotation connue à chaque horodatage.
+
+    - En séance (voir session_mask), une cotation manquante est comblée par le dernier prix
+      pendant au plus `ffill_limit` bougies en séance ; au-delà, la ligne est écartée.
+      ffill_limit=0 redonne l'intersection stricte (ancien comportement).
+    - Hors séance (marché fermé : week-end d'une action à côté des cryptos), le dernier
+      prix est conservé sans limite : c'est le vrai prix de l'actif.
+    - Les lignes antérieures à la première cotation d'un actif sont écartées.
+
+    Une seule matrice (lignes x actifs) est remplie, colonne par colonne, à partir des
+    tableaux int64 triés : pas de jointure externe via des DataFrames réindexés.
+
+    Args:
+        frames: {clé: DataFrame avec `column` ou Series}, index datetime trié
+        calendars: {clé: calendrier ou None} ; par défaut ASSET_CALENDARS (absent : 24/7)
+
+    Returns:
+        (prices, coverage):
+        - prices : DataFrame (index UTC, colonnes = clés), sans valeur manquante
+        - coverage : une ligne par actif : Bars (cotations reçues), Observed / Filled / Closed
+          (lignes gardées avec une cotation réelle / comblée en séance / hors séance), Missing
+          (bougies en séance sans prix au-delà de la limite), Rows_Dropped (lignes de la grille
+          écartées faute de prix pour cet actif), Coverage (Observed / lignes en séance gardées),
+          First / Last (première et dernière cotation)
+    """
+    if not frames:
+        return pd.DataFrame(), pd.DataFrame(columns=COVERAGE_COLUMNS)
+    keys = list(frames)
+    series = {k: frames[k][column] if isinstance(frames[k], pd.DataFrame) else frames[k] for k in keys}
+    stamps = {k: _as_int64(s.index) for k, s in series.items()}
+    grid, grid_rows = merge_timestamps(list(stamps.values()), return_rows=True)
+    T = len(grid)
+    intraday = T > 1 and np.median(np.diff(grid)) < pd.Timedelta(days=1).value
+
+    out = np.full((len(keys), T), np.nan)  # une ligne contiguë par actif, transposée à la fin
+    kinds = {}  # clé -> masques (observé, comblé en séance, hors séance, manquant en séance, en séance)
+    for j, k in enumerate(keys):
+        idx, values = stamps[k], series[k].to_numpy(dtype=float)
+        calendar = asset_calendar(k) if calendars is None else calendars.get(k)
+        in_session = session_mask(grid, calendar, intraday)
+        if not len(idx):
+            none = np.zeros(T, dtype=bool)
+            kinds[k] = (none, none, none, none, in_session)
+            continue
+
+        # Lignes de la grille des cotations de l'actif, puis pour chaque ligne le rang de
+        # la dernière cotation connue (jointure as-of par cumul, en O(T))
+        idx_rows = grid_rows[j]
+        observed = np.zeros(T, dtype=bool)
+        observed[idx_rows] = True
+        pos = np.cumsum(observed) - 1
+        started = pos >= 0
+        safe = np.maximum(pos, 0)
+        obs_row = idx_rows[safe]
+
+        # Ancienneté de la cotation en bougies en séance (les heures de fermeture ne comptent pas)
+        session_count = np.cumsum(in_session)
+        age = session_count - session_count[obs_row]
+        filled = started & ~observed & in_session & (age <= ffill_limit)
+        closed = started & ~observed & ~in_session
+        valid = observed | filled | closed
+
+        out[j] = np.where(valid, values[safe], np.nan)
+        kinds[k] = (observed, filled, closed, started & in_session & ~valid, in_session)
+
+    out = out.T
+    keep = ~np.isnan(out).any(axis=1)
+    first = frames[keys[0]]
+    index = pd.DatetimeIndex(grid[keep], tz="UTC", name=first.index.name)
+    prices = pd.DataFrame(out[keep], index=index, columns=keys)
+
+    coverage = []
+    for j, k in enumerate(keys):
+        observed, filled, closed, missing, in_session = kinds[k]
+        session_kept = int((in_session & keep).sum())
+        coverage.append({
+            "Bars": len(stamps[k]),
+            "Observed": int((observed & keep).sum()),
+            "Filled": int((filled & keep).sum()),
+            "Closed": int((closed & keep).sum()),
+            "Missing": int(missing.sum()),
+            "Rows_Dropped": int(np.isnan(out[:, j]).sum()),
+            "Coverage": (observed & keep & in_session).sum() / session_kept if session_kept else np.nan,
+            "First": pd.Timestamp(int(stamps[k][0]), tz="UTC") if len(stamps[k]) else pd.NaT,
+            "Last": pd.Timestamp(int(stamps[k][-1]), tz="UTC") if len(stamps[k]) else pd.NaT,
+        })
+    return prices, pd.DataFrame(coverage, index=keys, columns=COVERAGE_COLUMNS)
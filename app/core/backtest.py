@@ -0,0 +1,236 @@
+# app/core/backtest.py
+import numpy as np
+import pandas as pd
+
+from app.core.costs import COST_COLUMNS, as_cost_model
+from app.core.instrumentation import instrumented
+from app.core.metrics import column_stats, fold_first_row
+from app.core.strategies import BuyAndHoldStream, MACrossoverStream, rolling_means
+
+# Registre des stratégies : nom -> instance (voir register_strategy)
+STRATEGIES = {}
+
+
+class Strategy:
+    """
+    Interface d'une stratégie :
+    - name / label : identifiant du registre et libellé affiché
+    - params : {nom: {"label", "default", "min", "max"}} (paramètres entiers déclarés,
+      les pages génèrent les champs de saisie à partir de cette déclaration)
+    - positions(closes, **params) : matrice (T x actifs) des positions décidées à la
+      clôture de chaque bougie (1 = investi, 0 = cash ; fractions et négatifs permis),
+      calculée pour tous les actifs en une fois. L'exécuteur les applique à la bougie suivante.
+    - stream(**params) : version incrémentale optionnelle (None si la stratégie n'en a pas)
+    - valid_params(params) : combinaisons à écarter d'une grille (ex : courte >= longue)
+    """
+
+    name = None
+    label = None
+    params = {}
+
+    def defaults(self):
+        return {k: spec["default"] for k, spec in self.params.items()}
+
+    def check_params(self, params):
+        """Paramètres complétés par les valeurs par défaut et bornés aux valeurs déclarées."""
+        checked = self.defaults()
+        for k, v in (params or {}).items():
+            if k not in self.params:
+                raise ValueError(f"Unknown parameter for {self.name}: {k}")
+            spec = self.params[k]
+            checked[k] = int(min(max(v, spec["min"]), spec["max"]))
+        return checked
+
+    def valid_params(self, params):
+        return True
+
+    def positions(self, closes, **params):
+        raise NotImplementedError
+
+    def stream(self, **params):
+        return None
+
+
+def register_strategy(cls):
+    """Décorateur : ajoute la stratégie au registre (une instance par classe)."""
+    strategy = cls()
+    STRATEGIES[strategy.name] = strategy
+    return cls
+
+
+def get_strategy(name) -> Strategy:
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {name}")
+    return STRATEGIES[name]
+
+
+def list_strategies():
+    """[(nom, libellé)] dans l'ordre d'enregistrement."""
+    return [(name, s.label) for name, s in STRATEGIES.items()]
+
+
+@register_strategy
+class BuyAndHold(Strategy):
+    name = "buy_and_hold"
+    label = "Buy & Hold"
+    params = {}
+
+    def positions(self, closes, **params):
+        return np.ones(np.shape(closes))
+
+    def stream(self, **params):
+        return BuyAndHoldStream()
+
+
+@register_strategy
+class MACrossover(Strategy):
+    name = "ma_crossover"
+    label = "MA Crossover"
+    params = {
+        "short": {"label": "Moyenne Courte", "default": 20, "min": 5, "max": 50},
+        "long": {"label": "Moyenne Longue", "default": 50, "min": 10, "max": 200},
+    }
+
+    def valid_params(self, params):
+        return params["short"] < params["long"]
+
+    def positions(self, closes, short=20, long=50):
+        # Mêmes moyennes que calculate_ma_crossover, toutes les colonnes en un passage
+        means = rolling_means(closes, [short, long])
+        return (means[int(short)] > means[int(long)]).astype(float)
+
+    def stream(self, short=20, long=50):
+        return MACrossoverStream(short, long)
+
+
+@register_strategy
+class Momentum(Strategy):
+    name = "momentum"
+    label = "Momentum"
+    params = {
+        "lookback": {"label": "Lookback (bougies)", "default": 50, "min": 2, "max": 500},
+    }
+
+    def positions(self, closes, lookback=50):
+        # Investi quand le prix est au-dessus de son niveau d'il y a `lookback` bougies
+        x = np.asarray(closes, dtype=float)
+        pos = np.zeros(x.shape)
+        lookback = int(lookback)
+        if lookback < len(x):
+            with np.errstate(invalid="ignore"):
+                pos[lookback:] = (x[lookback:] > x[:-lookback]).astype(float)
+        return pos
+
+
+def _is_ohlcv(prices):
+    return isinstance(prices, pd.DataFrame) and "Close" in prices.columns and "Open" in prices.columns
+
+
+def _as_closes(prices):
+    """DataFrame de clôtures (colonnes = actifs) ; un DataFrame OHLCV donne une seule colonne."""
+    if isinstance(prices, pd.Series):
+        return prices.to_frame()
+    if _is_ohlcv(prices):
+        return prices[["Close"]]
+    return prices
+
+
+@instrumented()
+def run_backtest(prices, positions, base=100.0, costs=None, volumes=None, periods_per_year=252) -> dict:
+    """
+    Exécuteur commun : positions (T x actifs, décidées à la clôture) -> rendements et equity.
+    Le rendement de la bougie t utilise la position de la veille (pas de look-ahead).
+
+    costs : None, un taux proportionnel (ex: 0.001 = 10 bps) ou un CostModel. Les coûts sont
+    calculés sur le turnover |position_t - position_{t-1}| et prélevés sur le rendement de la
+    bougie où la position change ; volumes (T x actifs, mêmes colonnes) sert au slippage.
+    Chaque colonne est un backtest indépendant sur le capital du CostModel.
+
+    Returns:
+        dict de DataFrames (T x actifs) positions, gross_returns, returns (nets), equity,
+        turnover, costs ; cost_attribution (une ligne par actif : Turnover, Trades, Fees, Fixed,
+        Slippage, Total, en % du capital cumulés) ; stats (Annualized_Return, Annualized_Vol,
+        Sharpe, Max_Drawdown, sur les rendements nets)
+    """
+    closes = _as_closes(prices)
+    x = closes.to_numpy(dtype=float)
+    pos = np.asarray(positions, dtype=float).reshape(x.shape)
+
+    r = np.zeros(x.shape)
+    r[1:] = x[1:] / x[:-1] - 1.0
+    held = np.zeros(x.shape)
+    held[1:] = pos[:-1]
+    strat_r = np.nan_to_num(held * r, nan=0.0)
+    turnover = np.abs(np.diff(pos, axis=0, prepend=0.0))
+
+    model = as_cost_model(costs)
+    if model is None:
+        parts = {name: np.zeros(x.shape) for name in COST_COLUMNS}
+    else:
+        # Valeur au moment de l'ordre : equity brute (avant coûts) à la clôture de la bougie
+        value = model.capital * np.cumprod(1.0 + strat_r, axis=0)
+        vol = None if volumes is None else pd.DataFrame(volumes).reindex(closes.index).to_numpy(dtype=float)
+        parts = model.costs(turnover, value, price=x, volume=vol)
+    total = sum(parts.values())
+
+    net_r = strat_r - total
+    equity = base * np.cumprod(1.0 + net_r, axis=0)
+
+    stats = column_stats(fold_first_row(net_r), equity, periods_per_year=periods_per_year)
+    frame = lambda a: pd.DataFrame(a, index=closes.index, columns=closes.columns)
+    attribution = pd.DataFrame({"Turnover": turnover.sum(axis=0), "Trades": (turnover > 0).sum(axis=0)},
+                               index=closes.columns)
+    for name, values in parts.items():
+        attribution[name] = values.sum(axis=0) * 100.0
+    attribution["Total"] = total.sum(axis=0) * 100.0
+    return {
+        "positions": frame(pos),
+        "gross_returns": frame(strat_r),
+        "returns": frame(net_r),
+        "equity": frame(equity),
+        "turnover": frame(turnover),
+        "costs": frame(total),
+        "cost_attribution": attribution,
+        "stats": pd.DataFrame(stats, index=closes.columns),
+    }
+
+
+def backtest(strategy_name, prices, params=None, **kwargs) -> dict:
+    """
+    Positions de la stratégie du registre pour tous les actifs de `prices`, puis run_backtest.
+    Avec un DataFrame OHLCV (un actif), la colonne Volume sert au slippage.
+    """
+    strategy = get_strategy(strategy_name)
+    closes = _as_closes(prices)
+    if _is_ohlcv(prices) and "Volume" in prices.columns and "volumes" not in kwargs:
+        kwargs["volumes"] = prices[["Volume"]].rename(columns={"Volume": "Close"})
+    pos = strategy.positions(closes.to_numpy(dtype=float), **strategy.check_params(params))
+    return run_backtest(closes, pos, **kwargs)
+
+
+def sleeve_returns(result, asset_weights=None) -> pd.Series:
+    """Rendements d'une poche : moyenne pondérée (rebalancée à chaque bougie) des actifs du backtest."""
+    returns = result["returns"]
+    w = pd.Series(asset_weights if asset_weights else 1.0, index=returns.columns, dtype=float)
+    w = w.reindex(returns.columns).fillna(0.0)
+    w = w / w.sum() if w.sum() > 0 else pd.Series(1.0 / len(w), index=w.index)
+    return pd.Series(returns.to_numpy() @ w.to_numpy(), index=returns.index)
+
+
+def combine_sleeves(sleeves, sleeve_weights=None, base=100.0) -> pd.DataFrame:
+    """
+    Combine plusieurs poches (ex: MA Crossover 60 % + Buy & Hold 40 %).
+
+    Args:
+        sleeves: {nom: Series des rendements de la poche} (voir sleeve_returns)
+        sleeve_weights: {nom: poids} (équipondéré si None), normalisés à 1
+
+    Returns:
+        DataFrame : une colonne d'equity par poche + "Combined" (base 100)
+    """
+    names = list(sleeves)
+    r = pd.concat([sleeves[n].rename(n) for n in names], axis=1).fillna(0.0)
+    w = np.array([(sleeve_weights or {}).get(n, 1.0) for n in names], dtype=float)
+    w = w / w.sum() if w.sum() > 0 else np.full(len(names), 1.0 / len(names))
+    r["Combined"] = r.to_numpy() @ w
+    return base * (1.0 + r).cumprod()
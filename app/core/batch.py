@@ -0,0 +1,310 @@
+# app/core/batch.py
+import hashlib
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from app.core.backtest import backtest, get_strategy
+from app.core.config import BATCH_CHUNK_JOBS
+from app.core.costs import CostModel
+from app.core.data import PriceArrays, align_closes, get_price_arrays_many
+from app.core.metrics import column_stats, fold_first_row
+from app.core.portfolio import simulate_portfolio
+
+# Bougies partagées par les processus du pool : chaque processus ouvre les fichiers
+# écrits par prepare_arrays en mmap (pages de cache de l'OS communes), rien n'est
+# sérialisé avec les tâches, qui ne transportent que la description des jobs.
+_WORKER_DIR = None
+_WORKER_ARRAYS = {}
+_WORKER_FRAMES = {}
+_WORKER_MAX_FRAMES = 16  # DataFrames float64 gardés par processus (jobs triés par actif)
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _grid(params):
+    """{nom: valeur ou liste de valeurs} -> liste de dicts (produit cartésien)."""
+    names = list(params or {})
+    return [dict(zip(names, combo)) for combo in itertools.product(*(_as_list(params[n]) for n in names))]
+
+
+def job_id(job) -> str:
+    """Empreinte du contenu du job : identique d'une exécution à l'autre (reprise)."""
+    return hashlib.sha1(json.dumps(job, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def expand_jobs(spec) -> list:
+    """
+    Spec (dict JSON) -> liste de jobs. Clés de la spec :
+    - assets, intervals, periods : listes (ou valeur seule)
+    - strategies : {nom du registre: {paramètre: valeur ou liste}} (grille, produit cartésien),
+      un job par actif et par combinaison valide (voir Strategy.valid_params)
+    - portfolios : [{"name", "weights": {actif: poids}, "rebalance": fréquence ou liste}]
+    - costs : paramètres de CostModel, ou liste de scénarios (chacun multiplie les jobs)
+    - periods_per_year : annualisation des métriques (252 par défaut, comme les pages)
+
+    Returns:
+        liste de dicts, chacun avec son job_id ; les doublons sont retirés
+    """
+    assets = _as_list(spec.get("assets", []))
+    costs = [c or {} for c in _as_list(spec.get("costs") or {})]
+    common_grid = itertools.product(_as_list(spec.get("intervals", "1d")), _as_list(spec.get("periods", "1y")), costs)
+
+    jobs = []
+    for interval, period, cost in common_grid:
+        common = {"interval": interval, "period": period, "costs": cost,
+                  "periods_per_year": spec.get("periods_per_year", 252)}
+        for name, grid in (spec.get("strategies") or {}).items():
+            strategy = get_strategy(name)
+            param_sets = []
+            for params in _grid(grid):
+                checked = strategy.check_params(params)
+                if strategy.valid_params(checked) and checked not in param_sets:
+                    param_sets.append(checked)
+            for asset in assets:
+                jobs += [{"kind": "strategy", "asset": asset, "strategy": name, "params": p, **common}
+                         for p in param_sets]
+        for portfolio in spec.get("portfolios") or []:
+            weights = portfolio.get("weights") or {a: 1.0 for a in portfolio.get("assets", assets)}
+            name = portfolio.get("name") or "+".join(weights)
+            for rebalance in _as_list(portfolio.get("rebalance", "W")):
+                jobs.append({"kind": "portfolio", "asset": name, "weights": weights,
+                             "rebalance": rebalance, **common})
+
+    unique = {}
+    for job in jobs:
+        unique.setdefault(job_id(job), job)
+    return [{**job, "job_id": jid} for jid, job in unique.items()]
+
+
+def _job_assets(job):
+    return list(job["weights"]) if job["kind"] == "portfolio" else [job["asset"]]
+
+
+def arrays_path(arrays_dir, asset, interval, period):
+    return os.path.join(arrays_dir, f"{asset}_{interval}_{period}")
+
+
+def prepare_arrays(jobs, arrays_dir, refresh=False) -> dict:
+    """
+    Ecrit une fois les bougies de chaque (actif, intervalle, période) des jobs (PriceArrays.save).
+    Les fichiers existants sont réutilisés (une reprise travaille sur les mêmes données
+    que l'exécution interrompue), sauf refresh=True.
+
+    Returns:
+        {(actif, intervalle, période): raison} pour les données indisponibles
+    """
+    needed = {}
+    for job in jobs:
+        for asset in _job_assets(job):
+            path = arrays_path(arrays_dir, asset, job["interval"], job["period"])
+            if refresh or not os.path.exists(os.path.join(path, "values.npy")):
+                needed.setdefault((job["interval"], job["period"]), set()).add(asset)
+
+    failures = {}
+    for (interval, period), assets in needed.items():
+        arrays, missing = get_price_arrays_many(sorted(assets), period=period, interval=interval)
+        for asset, arr in arrays.items():
+            arr.save(arrays_path(arrays_dir, asset, interval, period))
+        for asset, reason in missing.items():
+            failures[(asset, interval, period)] = reason
+    return failures
+
+
+def _init_worker(arrays_dir):
+    global _WORKER_DIR
+    _WORKER_DIR = arrays_dir
+    _WORKER_ARRAYS.clear()
+    _WORKER_FRAMES.clear()
+
+
+def _frame(asset, interval, period):
+    """DataFrame OHLCV float64 d'un actif, construit à partir des tableaux mmap du processus."""
+    key = (asset, interval, period)
+    if key not in _WORKER_FRAMES:
+        if key not in _WORKER_ARRAYS:
+            _WORKER_ARRAYS[key] = PriceArrays.load(arrays_path(_WORKER_DIR, *key), mmap=True)
+        if len(_WORKER_FRAMES) >= _WORKER_MAX_FRAMES:
+            _WORKER_FRAMES.pop(next(iter(_WORKER_FRAMES)))
+        _WORKER_FRAMES[key] = _WORKER_ARRAYS[key].to_frame()
+    return _WORKER_FRAMES[key]
+
+
+def _run_job(job) -> dict:
+    model = CostModel(**job["costs"]) if job["costs"] else None
+    ppy = job["periods_per_year"]
+
+    if job["kind"] == "strategy":
+        df = _frame(job["asset"], job["interval"], job["period"])
+        res = backtest(job["strategy"], df, job["params"], costs=model, periods_per_year=ppy)
+        attribution = res["cost_attribution"].iloc[0]
+        row = {k: float(v.iloc[0]) for k, v in res["stats"].items()}
+        row.update({"Final_Equity": float(res["equity"].iloc[-1, 0]), "Turnover": float(attribution["Turnover"]),
+                    "Trades": int(attribution["Trades"]), "Costs": float(attribution["Total"])})
+        index = df.index
+    else:
+        frames = {a: _frame(a, job["interval"], job["period"]) for a in job["weights"]}
+        prices = align_closes(frames)
+        if prices.empty:
+            raise ValueError("No common history for the portfolio assets.")
+        volumes = pd.concat([df["Volume"].rename(a) for a, df in frames.items()], axis=1).reindex(prices.index)
+        sim = simulate_portfolio(prices, job["weights"], rebalance=job["rebalance"], costs=model, volumes=volumes)
+        r, equity = sim["Portfolio_Returns"].to_numpy(), sim["Portfolio_Equity"].to_numpy()
+        row = {k: float(v[0]) for k, v in column_stats(fold_first_row(r), equity, periods_per_year=ppy).items()}
+        row.update({"Final_Equity": float(equity[-1]),
+                    "Turnover": float(sim["Turnover"].sum()) if "Turnover" in sim else np.nan,
+                    "Trades": int((sim["Turnover"] > 0).sum()) if "Turnover" in sim else np.nan,
+                    "Costs": float(sim["Costs"].sum() * 100.0) if "Costs" in sim else 0.0})
+        index = prices.index
+    row.update({"Bars": len(index), "Start": index[0], "End": index[-1]})
+    return row
+
+
+def _describe(job) -> dict:
+    """Colonnes d'identification d'un résultat (paramètres en JSON pour rester tabulaires)."""
+    return {
+        "job_id": job["job_id"],
+        "kind": job["kind"],
+        "asset": job["asset"],
+        "strategy": job.get("strategy", "portfolio"),
+        "params": json.dumps(job.get("params", job.get("weights")), sort_keys=True),
+        "rebalance": job.get("rebalance"),
+        "interval": job["interval"],
+        "period": job["period"],
+        "costs": json.dumps(job["costs"], sort_keys=True),
+    }
+
+
+def _run_chunk(jobs) -> list:
+    """Exécute une tâche du pool ; l'échec d'un job est noté dans sa ligne (colonne Error)."""
+    rows = []
+    for job in jobs:
+        start = time.perf_counter()
+        try:
+            row, error = _run_job(job), None
+        except Exception as e:
+            row, error = {}, f"{type(e).__name__}: {e}"
+        rows.append({**_describe(job), **row, "Error": error, "Seconds": time.perf_counter() - start})
+    return rows
+
+
+def _write_atomic(df, path):
+    tmp = path + ".tmp"
+    if path.endswith(".csv"):
+        df.to_csv(tmp, index=False)
+    else:
+        df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _write_part(rows, parts_dir):
+    name = hashlib.sha1("".join(r["job_id"] for r in rows).encode()).hexdigest()[:16]
+    _write_atomic(pd.DataFrame(rows), os.path.join(parts_dir, f"part-{name}.parquet"))
+
+
+def _parts(parts_dir):
+    return sorted(os.path.join(parts_dir, f) for f in os.listdir(parts_dir) if f.endswith(".parquet"))
+
+
+def completed_jobs(out_dir) -> set:
+    """job_id déjà écrits dans out_dir/parts (les fichiers partiels .tmp sont ignorés)."""
+    parts_dir = os.path.join(out_dir, "parts")
+    if not os.path.isdir(parts_dir):
+        return set()
+    return {jid for path in _parts(parts_dir) for jid in pd.read_parquet(path, columns=["job_id"])["job_id"]}
+
+
+def _chunks(jobs, n_workers, chunk_size):
+    """Tâches du pool : jobs triés par données (réutilisation des DataFrames du processus),
+    assez de tâches pour occuper tous les processus jusqu'à la fin."""
+    if chunk_size is None:
+        chunk_size = max(1, min(BATCH_CHUNK_JOBS, math.ceil(len(jobs) / (4 * n_workers))))
+    ordered = sorted(jobs, key=lambda j: (j["interval"], j["period"], j["kind"], j["asset"]))
+    return [ordered[i:i + chunk_size] for i in range(0, len(ordered), chunk_size)]
+
+
+def run_batch(spec, out_dir, n_workers=None, chunk_size=None, refresh_data=False, progress=print) -> pd.DataFrame:
+    """
+    Exécute tous les jobs de la spec (voir expand_jobs) sur un pool de processus.
+
+    Dossier de sortie :
+    - spec.json : copie de la spec
+    - arrays/ : bougies des actifs (PriceArrays), lues en mmap par les processus
+    - parts/ : résultats écrits au fil de l'eau, une tâche par fichier (écriture atomique)
+    - results.parquet / results.csv : résultats consolidés, dans l'ordre des jobs
+
+    Reprise : relancer la même commande n'exécute que les jobs absents de parts/
+    (job_id = empreinte du contenu du job). Les jobs en erreur sont conservés avec leur
+    message (colonne Error) ; supprimer parts/ pour tout recalculer.
+
+    Returns:
+        DataFrame des résultats (une ligne par job)
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    arrays_dir, parts_dir = os.path.join(out_dir, "arrays"), os.path.join(out_dir, "parts")
+    os.makedirs(parts_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "spec.json"), "w", encoding="utf-8") as f:
+        json.dump(spec, f, indent=2)
+
+    jobs = expand_jobs(spec)
+    failures = prepare_arrays(jobs, arrays_dir, refresh=refresh_data)
+    unavailable = {}
+    for job in jobs:
+        missing = [a for a in _job_assets(job) if (a, job["interval"], job["period"]) in failures]
+        if missing:
+            unavailable[job["job_id"]] = f"no data for {', '.join(missing)}"
+
+    done = completed_jobs(out_dir)
+    pending = [j for j in jobs if j["job_id"] not in done and j["job_id"] not in unavailable]
+    total = len(pending)
+    progress(f"[Batch] {len(jobs)} jobs : {len(jobs) - total - len(unavailable)} déjà faits, "
+             f"{len(unavailable)} sans données, {total} à exécuter sur {n_workers} processus.")
+
+    start, finished = time.perf_counter(), 0
+
+    def report(rows):
+        nonlocal finished
+        _write_part(rows, parts_dir)
+        finished += len(rows)
+        elapsed = time.perf_counter() - start
+        rate = finished / elapsed if elapsed > 0 else float("nan")
+        eta = (total - finished) / rate if rate > 0 else float("nan")
+        progress(f"[Batch] {finished}/{total} ({finished / total:.0%}) - {rate:.1f} jobs/s - reste ~{eta:.0f}s")
+
+    tasks = _chunks(pending, n_workers, chunk_size)
+    if n_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(arrays_dir,)) as pool:
+            for future in as_completed([pool.submit(_run_chunk, task) for task in tasks]):
+                report(future.result())
+    else:
+        _init_worker(arrays_dir)
+        for task in tasks:
+            report(_run_chunk(task))
+
+    return consolidate(jobs, out_dir, unavailable)
+
+
+def consolidate(jobs, out_dir, unavailable=None) -> pd.DataFrame:
+    """Rassemble les résultats des jobs (parts/) dans results.parquet et results.csv."""
+    parts_dir = os.path.join(out_dir, "parts")
+    frames = [pd.read_parquet(path) for path in _parts(parts_dir)]
+    done = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["job_id"])
+    done = done.drop_duplicates("job_id", keep="last").set_index("job_id")
+
+    unavailable = unavailable or {}
+    missing = [{**_describe(j), "Error": unavailable[j["job_id"]]} for j in jobs if j["job_id"] in unavailable]
+    if missing:
+        done = pd.concat([done, pd.DataFrame(missing).set_index("job_id")])
+
+    order = [j["job_id"] for j in jobs if j["job_id"] in done.index]
+    results = done.loc[order].reset_index()
+    _write_atomic(results, os.path.join(out_dir, "results.parquet"))
+    _write_atomic(results, os.path.join(out_dir, "results.csv"))
+    return results
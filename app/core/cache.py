@@ -0,0 +1,167 @@
+# app/core/cache.py
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_DERIVED_TTL
+from app.core.store import interval_to_timedelta
+
+
+def _sizeof(value) -> int:
+    """Taille approximative en octets (DataFrame / Series / ndarray / PriceArrays / tuple / dict)."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(index=True, deep=False).sum()) if isinstance(value, pd.DataFrame) \
+            else int(value.memory_usage(index=True, deep=False))
+    if hasattr(value, "nbytes"):  # ndarray, PriceArrays
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(_sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_sizeof(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class SharedCache:
+    """
+    Cache partagé par toutes les sessions du processus Streamlit.
+    - éviction LRU bornée en nombre d'entrées et en octets
+    - TTL par entrée
+    - invalidation ciblée (prédicat sur les clés)
+    Les clés sont des tuples, ex : ("prices", ticker, interval, period).
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # clé -> (valeur, expiration, taille)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _alive(self, key, now):
+        value, expires, size = self._data[key]
+        if expires is not None and expires <= now:
+            del self._data[key]
+            self._bytes -= size
+            return False
+        return True
+
+    def get(self, key, default=None, record=True):
+        """Valeur en cache ou default ; record=False : ne compte ni hit ni miss (voir record())."""
+        with self._lock:
+            if key in self._data and self._alive(key, time.time()):
+                self._data.move_to_end(key)
+                self.hits += record
+                return self._data[key][0]
+            self.misses += record
+            return default
+
+    def find(self, prefix):
+        """Entrées valides dont la clé commence par `prefix` (sans compter de hit/miss)."""
+        now = time.time()
+        with self._lock:
+            keys = [k for k in self._data if k[:len(prefix)] == prefix]
+            return [(k, self._data[k][0]) for k in keys if self._alive(k, now)]
+
+    def record(self, hit, key=None):
+        """Compte un hit / miss résolu par l'appelant (ex : tranche d'une période plus longue)."""
+        with self._lock:
+            if hit and key in self._data:
+                self._data.move_to_end(key)
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def set(self, key, value, ttl=None):
+        size = _sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[2]
+            if size > self.max_bytes:
+                return value
+            self._data[key] = (value, time.time() + ttl if ttl else None, size)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, old_size) = self._data.popitem(last=False)
+                self._bytes -= old_size
+        return value
+
+    def invalidate(self, predicate=None) -> int:
+        """Supprime les entrées dont la clé vérifie predicate(key) (toutes si None)."""
+        with self._lock:
+            keys = [k for k in self._data if predicate is None or predicate(k)]
+            for k in keys:
+                self._bytes -= self._data.pop(k)[2]
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else float("nan"),
+            }
+
+
+_cache = SharedCache()
+
+
+def get_cache() -> SharedCache:
+    return _cache
+
+
+def ttl_for_interval(interval: str) -> float:
+    """TTL des prix = durée d'une bougie (bornée entre 60 s et CACHE_DERIVED_TTL)."""
+    seconds = interval_to_timedelta(interval).total_seconds()
+    return float(min(max(seconds, 60.0), CACHE_DERIVED_TTL))
+
+
+def fingerprint(obj) -> str:
+    """Empreinte du contenu d'un DataFrame / Series / ndarray (index compris)."""
+    h = hashlib.sha1()
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(repr((obj.shape, list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.shape, obj.dtype.str)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (tuple, list)):
+        for item in obj:
+            h.update(fingerprint(item).encode())
+    else:
+        h.update(repr(obj).encode())
+    return h.hexdigest()
+
+
+def _freeze(params):
+    """Paramètres -> valeur hashable (dict trié, listes en tuples, tableaux par empreinte)."""
+    if isinstance(params, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in params.items()))
+    if isinstance(params, (list, tuple, range)):
+        return tuple(_freeze(v) for v in params)
+    if isinstance(params, np.ndarray):
+        return fingerprint(params)
+    return params
+
+
+def cached_compute(name, inputs, params, fn, ttl=CACHE_DERIVED_TTL):
+    """
+    Résultat dérivé (equity, métriques, ...) mis en cache sous
+    (nom, empreinte des données d'entrée, paramètres) : partagé entre sessions,
+    et naturellement invalidé quand les données changent.
+    """
+    key = ("derived", name, fingerprint(inputs), _freeze(params))
+    value = _cache.get(key)
+    if value is None:
+        value = _cache.set(key, fn(), ttl=ttl)
+    return value
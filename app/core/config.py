@@ -1,4 +1,5 @@
 # app/core/config.py
+import os
 
 # Liste des actifs à surveiller (Symboles Yahoo Finance)
 ASSETS = {
@@ -15,6 +16,66 @@ PERIOD_DEFAULT = "7d"    # Historique par défaut
 # Paramètres techniques
 RETRIES = 3              # Nombre d'essais si l'API échoue
 TIMEOUT = 10             # Temps max d'attente (secondes)
+RETRY_BACKOFF = 0.5      # Attente avant le 2e essai (doublée à chaque essai, secondes)
+FETCH_WORKERS = 4        # Téléchargements simultanés max (plusieurs actifs)
 
 # Fuseau horaire (Important pour les cron jobs)
-TIMEZONE = "Europe/Paris"
\ No newline at end of file
+TIMEZONE = "Europe/Paris"
+
+# Stockage local des bougies OHLCV (Parquet, une entrée par (ticker, intervalle))
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+STORE_DIR = os.environ.get("DASHBOARD_STORE_DIR", os.path.join(DATA_DIR, "store"))
+STORE_REFRESH_SECONDS = 300  # Pas de nouvel appel réseau si la dernière synchro est plus récente
+STORE_MAX_SEGMENTS = 24     # Fichiers d'ajout avant fusion dans le fichier principal
+DATA_PROVIDER = os.environ.get("DASHBOARD_DATA_PROVIDER", "yahoo")  # "fake" : flux synthétique hors ligne
+
+
+# Résolutions de base téléchargées -> historique disponible chez Yahoo. Les autres intervalles
+# (15m, 4h, ...) sont dérivés localement de la base la plus fine qui couvre la période
+# (voir app.core.resample.base_interval) : changer d'intervalle ne coûte pas d'appel réseau.
+RESAMPLE_BASES = {
+    "5m": "60d",
+    "1h": "730d",
+    "1d": "max",
+}
+
+# Ingestion en arrière-plan (ingest.py) : intervalle de base -> historique maintenu dans le stockage
+# (Yahoo limite l'intraday 5m à 60 jours)
+INGEST_JOBS = {
+    "5m": "60d",
+    "1h": "1y",
+}
+INGEST_EVERY_SECONDS = 300  # Fréquence de rafraîchissement du worker
+
+# Si le worker tourne, les pages ne font que lire le stockage (pas d'appel réseau)
+READ_ONLY_STORE = os.environ.get("DASHBOARD_READ_ONLY_STORE", "0") == "1"
+
+# Graphiques : nombre max de points envoyés au navigateur par trace
+CHART_MAX_POINTS = 2000   # Lignes (LTTB), ~1 point par pixel sur un écran large
+CHART_MAX_CANDLES = 500   # Chandeliers (regroupement OHLC)
+
+# Cache partagé entre sessions (app.core.cache)
+CACHE_MAX_ENTRIES = 512
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 Mo
+CACHE_DERIVED_TTL = 900              # Résultats dérivés (secondes), et TTL max des prix
+
+# Backtests en lot hors Streamlit (run_batch.py, app.core.batch)
+BATCH_DIR = os.path.join(DATA_DIR, "batch")  # Dossier de sortie par défaut
+BATCH_CHUNK_JOBS = 64                        # Jobs max par tâche envoyée au pool
+
+# Instrumentation des chemins critiques (app.core.instrumentation, onglet Système)
+INSTRUMENTATION_ENABLED = os.environ.get("DASHBOARD_INSTRUMENTATION", "1") == "1"
+INSTRUMENTATION_WINDOW = 1000    # Dernières durées gardées par étape (percentiles)
+INSTRUMENTATION_EVENTS = 10_000  # Derniers événements gardés pour l'export JSON lines
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10_000)  # Bornes de l'histogramme
+
+# Alignement multi-actifs (app.core.align, build_prices_matrix)
+ALIGN_FFILL_LIMIT = 3       # Bougies en séance sans cotation comblées par le dernier prix (au-delà : ligne écartée)
+ALIGN_WARN_COVERAGE = 0.8   # Avertissement si moins de 80 % des bougies en séance sont des cotations réelles
+# Calendriers de cotation (heures locales, bougie horodatée à son ouverture ; jours fériés non gérés)
+CALENDARS = {
+    "XNYS": {"tz": "America/New_York", "days": (0, 1, 2, 3, 4), "open": "09:30", "close": "16:00"},
+    "XPAR": {"tz": "Europe/Paris", "days": (0, 1, 2, 3, 4), "open": "09:00", "close": "17:30"},
+    "WEEKDAYS": {"tz": "UTC", "days": (0, 1, 2, 3, 4)},  # ex: FX, approximation du week-end
+}
+ASSET_CALENDARS = {}  # clé d'actif -> nom de CALENDARS (absent : cotation 24/7, comme les cryptos)
@@ -0,0 +1,66 @@
+# app/core/costs.py
+import numpy as np
+
+COST_COLUMNS = ["Fees", "Fixed", "Slippage"]
+
+
+class CostModel:
+    """
+    Coûts de transaction, exprimés en fraction de la valeur du portefeuille au moment de l'ordre :
+    - fee_bps : frais proportionnels au montant échangé (points de base)
+    - fixed_cost : coût fixe par ordre (en devise, rapporté à la valeur du portefeuille)
+    - impact_coef : slippage "racine carrée" sur le volume de la bougie,
+      slippage = impact_coef x sqrt(montant échangé / (Volume x prix)) par unité échangée,
+      participation bornée à max_participation. Sans volume (NaN ou 0), pas de slippage.
+    capital : valeur initiale du portefeuille en devise (base 100 = capital), nécessaire
+    pour le coût fixe et le taux de participation.
+
+    Tout est calculé sur des matrices (bougies x actifs) : aucun parcours ligne à ligne.
+    """
+
+    def __init__(self, fee_bps=0.0, fixed_cost=0.0, impact_coef=0.0, capital=10_000.0, max_participation=1.0):
+        self.fee_bps = float(fee_bps)
+        self.fixed_cost = float(fixed_cost)
+        self.impact_coef = float(impact_coef)
+        self.capital = float(capital)
+        self.max_participation = float(max_participation)
+
+    def is_free(self):
+        return self.fee_bps == 0 and self.fixed_cost == 0 and self.impact_coef == 0
+
+    def costs(self, trades, value, price=None, volume=None) -> dict:
+        """
+        Args:
+            trades: (T, k) |variation de poids| par actif (fraction de la valeur échangée)
+            value: (T,) ou (T, k) valeur du portefeuille en devise au moment de l'ordre
+            price, volume: (T, k) prix et volume de la bougie de l'ordre (slippage)
+
+        Returns:
+            {Fees, Fixed, Slippage}: (T, k) en fraction de la valeur du portefeuille
+        """
+        trades = np.asarray(trades, dtype=float)
+        value = np.asarray(value, dtype=float)
+        if value.ndim < trades.ndim:
+            value = value.reshape(value.shape + (1,) * (trades.ndim - value.ndim))
+        traded = trades > 0
+
+        fees = trades * self.fee_bps / 1e4
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fixed = np.where(traded & (value > 0), self.fixed_cost / value, 0.0)
+
+            slippage = np.zeros(trades.shape)
+            if self.impact_coef and price is not None and volume is not None:
+                liquidity = np.asarray(volume, dtype=float) * np.asarray(price, dtype=float)
+                liquidity = liquidity.reshape(liquidity.shape + (1,) * (trades.ndim - liquidity.ndim))
+                participation = np.where(liquidity > 0, trades * value / liquidity, 0.0)
+                participation = np.minimum(np.nan_to_num(participation, nan=0.0), self.max_participation)
+                slippage = trades * self.impact_coef * np.sqrt(participation)
+
+        return {"Fees": fees, "Fixed": fixed, "Slippage": slippage}
+
+
+def as_cost_model(costs):
+    """None -> None ; nombre -> frais proportionnels (taux, ex: 0.001 = 10 bps) ; CostModel inchangé."""
+    if costs is None or isinstance(costs, CostModel):
+        return None if costs is not None and costs.is_free() else costs
+    return CostModel(fee_bps=float(costs) * 1e4) if costs else None
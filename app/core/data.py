@@ -1,11 +1,494 @@
-import yfinance as yf
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
-import streamlit as st
-from app.core.config import ASSETS, RETRIES, TIMEOUT
+from app.core.config import ALIGN_FFILL_LIMIT, ASSETS, RETRIES, RETRY_BACKOFF, FETCH_WORKERS, STORE_REFRESH_SECONDS, READ_ONLY_STORE, DATA_PROVIDER
+from app.core.align import align_frames
+from app.core.cache import get_cache, ttl_for_interval
+from app.core.instrumentation import count, instrumented, payload_size, timed
+from app.core.providers import FakeProvider, YahooProvider, OHLCV_COLUMNS
+from app.core.resample import base_interval, update_resampled
+from app.core.store import OHLCVStore, period_start
+
+# Source de données et stockage local (remplaçables, ex: FakeProvider pour travailler hors ligne)
+_provider = FakeProvider() if DATA_PROVIDER == "fake" else YahooProvider()
+_store = OHLCVStore()
+
+
+def set_provider(provider):
+    """
+    Change la source de données : tout objet avec une méthode fetch(ticker, interval, period, start),
+    et optionnellement fetch_many(tickers, interval, period) + supports_batch = True.
+    """
+    global _provider
+    _provider = provider
+
+
+def get_provider():
+    return _provider
+
+
+def set_store(store):
+    """Change le stockage local (ex: un OHLCVStore dans un dossier temporaire)."""
+    global _store
+    _store = store
+
+
+def get_store():
+    return _store
+
+
+def fetch_with_retries(ticker, interval, period=None, start=None):
+    """
+    Appelle la source avec RETRIES essais (attente exponentielle entre deux essais).
+    Renvoie un DataFrame vide en cas d'échec.
+    """
+    df = pd.DataFrame()
+    for i in range(RETRIES):
+        if i:
+            count("data.retries")
+        try:
+            with timed("data.fetch") as t:
+                df = _provider.fetch(ticker, interval, period=period, start=start)
+                t.nbytes = payload_size(df)
+
+            # Si on a des données, on arrête la boucle
+            if not df.empty:
+                break
+        except Exception as e:
+            print(f"Tentative {i+1} échouée pour {ticker}: {e}")
+        if i < RETRIES - 1:
+            time.sleep(RETRY_BACKOFF * 2 ** i)
+    if df.empty:
+        count("data.fetch_failures")
+    return df
+
+
+def _sync_plan(ticker, period, interval, max_age=None):
+    """
+    Ce qu'il faut demander à la source pour (ticker, interval) :
+    - None si le stockage est à jour
+    - ("incremental", dernier horodatage stocké)
+    - ("full", début de la période demandée)
+    """
+    meta = _store.meta(ticker, interval)
+    last = _store.last_timestamp(ticker, interval, meta)
+
+    wanted_since = period_start(pd.Timestamp.now(tz='UTC'), period)
+    if wanted_since is None:
+        wanted_since = pd.Timestamp.min.tz_localize('UTC')
+    covered_since = meta.get("covered_since")
+    covered = last is not None and covered_since is not None and pd.Timestamp(covered_since) <= wanted_since
+
+    if not covered:
+        return ("full", wanted_since)
+    max_age = STORE_REFRESH_SECONDS if max_age is None else max_age
+    if time.time() - meta.get("fetched_at", 0.0) < max_age:
+        return None
+    return ("incremental", last)
+
+
+def _store_bars(ticker, interval, new, since=None):
+    if new.empty:
+        return False
+    try:
+        _store.append(ticker, interval, new, covered_since=since)
+    except Exception as e:
+        print(f"[Store] Ecriture impossible pour {ticker} ({interval}): {e}")
+        return False
+    return True
+
+
+def sync_store(ticker, period="7d", interval="5m", max_age=None):
+    """
+    Met à jour le stockage local pour (ticker, interval) :
+    - historique complet de `period` si le stockage ne le couvre pas encore
+    - sinon uniquement les bougies après le dernier horodatage stocké
+    Aucun appel réseau si la dernière synchro date de moins de max_age secondes
+    (STORE_REFRESH_SECONDS par défaut).
+
+    Renvoie False si la source n'a rien renvoyé (le stockage garde alors les anciennes bougies).
+    """
+    with _store.lock(ticker, interval):
+        plan = _sync_plan(ticker, period, interval, max_age)
+        if plan is None:
+            return True
+
+        kind, value = plan
+        if kind == "incremental":
+            # La dernière bougie stockée peut être incomplète : on la redemande
+            new = fetch_with_retries(ticker, interval, start=value)
+            return _store_bars(ticker, interval, new)
+
+        new = fetch_with_retries(ticker, interval, period=period)
+        return _store_bars(ticker, interval, new, since=value)
+
+
+def _sync_full_batch(tickers, period, interval, max_age=None):
+    """
+    Historique complet de plusieurs tickers en une seule requête, si la source le permet.
+    Renvoie l'ensemble des tickers synchronisés ; les autres passent par sync_store.
+    """
+    done = set()
+    locks = [_store.lock(t, interval) for t in sorted(tickers)]
+    for lock in locks:
+        lock.acquire()
+    try:
+        # Une autre session a pu synchroniser entre-temps
+        pending = {}
+        for t in tickers:
+            plan = _sync_plan(t, period, interval, max_age)
+            if plan is None:
+                done.add(t)
+            elif plan[0] == "full":
+                pending[t] = plan[1]
+        if not pending:
+            return done
+
+        try:
+            with timed("data.fetch_many") as t:
+                frames = _provider.fetch_many(list(pending), interval, period=period)
+                t.nbytes = payload_size(frames)
+        except Exception as e:
+            print(f"Requête groupée échouée ({', '.join(pending)}): {e}")
+            count("data.fetch_failures", len(pending))
+            return done
+
+        for t, since in pending.items():
+            if _store_bars(t, interval, frames.get(t, pd.DataFrame()), since=since):
+                done.add(t)
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+    return done
+
+
+def sync_many(tickers, period="7d", interval="5m", max_workers=FETCH_WORKERS, max_age=None):
+    """
+    Synchronise plusieurs tickers :
+    1. une requête multi-tickers pour ceux qui n'ont pas encore d'historique (si la source le permet)
+    2. un pool de threads borné pour le reste (mises à jour incrémentales, échecs de l'étape 1)
+
+    Renvoie {ticker: bool} (False si la source n'a rien renvoyé pour ce ticker).
+    """
+    tickers = list(dict.fromkeys(tickers))
+    status = {}
+
+    if getattr(_provider, "supports_batch", False):
+        full = [t for t in tickers if (_sync_plan(t, period, interval, max_age) or ("",))[0] == "full"]
+        if len(full) > 1:
+            for t in _sync_full_batch(full, period, interval, max_age):
+                status[t] = True
+
+    remaining = [t for t in tickers if t not in status]
+    if len(remaining) == 1:
+        status[remaining[0]] = sync_store(remaining[0], period=period, interval=interval, max_age=max_age)
+    elif remaining:
+        workers = max(1, min(max_workers, len(remaining)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(lambda t: sync_store(t, period=period, interval=interval, max_age=max_age), remaining)
+            status.update(zip(remaining, results))
+
+    return {t: status[t] for t in tickers}
+
+
+@instrumented(size=True)
+def get_historical_data_many(symbol_keys, period="7d", interval="5m", max_workers=FETCH_WORKERS):
+    """
+    Récupère les données historiques de plusieurs actifs en parallèle.
+
+    Returns:
+        (frames, failures):
+        - frames: {clé: DataFrame OHLCV}, dans l'ordre de symbol_keys, actifs sans données exclus
+        - failures: {clé: raison} pour les actifs non configurés ou sans données
+    """
+    failures = {}
+    tickers = {}
+    for k in symbol_keys:
+        ticker = ASSETS.get(k)
+        if ticker:
+            tickers[k] = ticker
+        else:
+            failures[k] = "not configured"
+
+    # 1. Cache partagé entre sessions : seuls les actifs absents (ou expirés) sont synchronisés
+    cached = {}
+    for k, ticker in tickers.items():
+        df = cached_prices(ticker, interval, period)
+        if df is not None:
+            cached[k] = df
+    pending = {k: t for k, t in tickers.items() if k not in cached}
+    status = _sync_pending(list(pending.values()), period, interval, max_workers)
+
+    frames = {}
+    for k, ticker in tickers.items():
+        if k in cached:
+            frames[k] = cached[k]
+            continue
+        df = _store.read(ticker, interval, period)
+        if df.empty:
+            failures[k] = "no data"
+            continue
+        if not status.get(ticker, False):
+            print(f"[Data] Source indisponible pour {k}, données locales servies.")
+        get_cache().set(("prices", ticker, interval, period), df, ttl=ttl_for_interval(interval))
+        frames[k] = df
+    return frames, failures
+
+
+@instrumented("data.derive_interval")
+def _derive_interval(ticker, base, interval):
+    """
+    Met à jour (ticker, interval) dans le stockage par agrégation des bougies `base`
+    déjà stockées : seul le dernier bucket (souvent partiel) et les suivants sont recalculés,
+    sauf si l'historique de base a été étendu vers le passé (tout est alors ré-agrégé).
+    covered_since vient des buckets effectivement agrégés, pas de la méta de la base.
+    """
+    with _store.lock(ticker, interval):
+        derived = _store.load(ticker, interval)
+        bars = _store.load(ticker, base)
+        if bars.empty:
+            return False
+        fresh = update_resampled(derived, bars, interval)
+        since = None
+        if not fresh.empty and (derived.empty or fresh.index[0] < derived.index[0]):
+            since = fresh.index[0]
+        return _store_bars(ticker, interval, fresh, since=since) or not derived.empty
+
+
+def _sync_pending(tickers, period, interval, max_workers=FETCH_WORKERS):
+    """
+    Synchronise les tickers absents du cache. Renvoie {ticker: bool}.
+    Un intervalle dérivable (voir base_interval) est synchronisé dans sa résolution
+    de base, puis agrégé localement.
+    """
+    if not tickers:
+        return {}
+    base = base_interval(interval, period)
+    if base != interval:
+        status = _sync_pending(tickers, period, base, max_workers)
+        for t in tickers:
+            _derive_interval(t, base, interval)
+        return status
+    if READ_ONLY_STORE:
+        # Le worker d'ingestion alimente le stockage : on ne synchronise que les tickers
+        # encore absents (démarrage à froid), les autres sont lus tels quels.
+        missing = [t for t in tickers if _store.last_timestamp(t, interval) is None]
+        status = {t: True for t in tickers}
+        status.update(sync_many(missing, period=period, interval=interval, max_workers=max_workers))
+        return status
+    return sync_many(list(tickers), period=period, interval=interval, max_workers=max_workers)
+
+
+def cached_prices(ticker, interval, period):
+    """
+    Bougies en cache pour (ticker, interval, period), ou None.
+    Une période plus courte qu'une période déjà en cache (ex: 7d alors que 1mo est chargé)
+    est servie par découpage, avec la même règle que OHLCVStore.read.
+    """
+    cache = get_cache()
+    key = ("prices", ticker, interval, period)
+    df = cache.get(key, record=False)
+    if df is not None:
+        cache.record(True, key)
+        return df
+    for other_key, other in cache.find(("prices", ticker, interval)):
+        if other.empty:
+            continue
+        start = period_start(other.index[-1], period)
+        if start is not None and start >= other.index[0]:
+            cache.record(True, other_key)
+            return other[other.index > start]
+    cache.record(False)
+    return None
+
+
+def invalidate_prices(symbol_key=None, interval=None) -> int:
+    """
+    Invalidation ciblée du cache des prix (un actif, un intervalle, ou les deux).
+    Les résultats dérivés sont indexés par l'empreinte des données : ils ne sont plus
+    atteints dès que les prix changent. Renvoie le nombre d'entrées supprimées.
+    """
+    ticker = ASSETS.get(symbol_key) if symbol_key is not None else None
+
+    def match(key):
+        return (key[0] in ("prices", "arrays")
+                and (ticker is None or key[1] == ticker)
+                and (interval is None or key[2] == interval))
+
+    return get_cache().invalidate(match)
+
+
+def refresh_prices(symbol_key, period="7d", interval="5m"):
+    """Force la synchronisation d'un actif avec la source, puis invalide ses prix en cache."""
+    ticker = ASSETS.get(symbol_key)
+    if not ticker:
+        return False
+    ok = True
+    base = base_interval(interval, period)
+    if not READ_ONLY_STORE:
+        ok = sync_store(ticker, period=period, interval=base, max_age=0)
+    if base != interval:
+        _derive_interval(ticker, base, interval)
+    invalidate_prices(symbol_key, interval)
+    return ok
+
+
+def align_closes(frames, ffill_limit=ALIGN_FFILL_LIMIT, calendars=None) -> pd.DataFrame:
+    """
+    Aligne les prix de clôture de plusieurs actifs sur un index commun.
+    Columns = assets (keys), index = UTC datetime.
+    Jointure as-of avec calendriers par actif (voir app.core.align.align_frames).
+    """
+    prices, _ = align_frames(frames, ffill_limit=ffill_limit, calendars=calendars)
+    return prices
+
+
+# Précision du chemin float32 (PriceArrays) par rapport au chemin float64 (DataFrame)
+FLOAT32_RTOL = 2.0 ** -24  # erreur relative max d'un prix arrondi en float32 (~6e-8)
+
+
+class PriceArrays:
+    """
+    Représentation compacte des bougies OHLCV d'un actif :
+    - index : int64 (nanosecondes epoch UTC)
+    - values : float32, une ligne contiguë par colonne (Open, High, Low, Close, Volume)
+    soit 28 octets par bougie contre 48 pour le DataFrame float64.
+
+    column() / close / since() renvoient des vues (aucune copie) : les stratégies et
+    métriques qui acceptent des tableaux (rolling_means, column_stats, ...) les lisent
+    directement. save() / load(mmap=True) partagent les tableaux entre processus
+    (pages de cache de l'OS) ; au sein du processus Streamlit, get_price_arrays les
+    partage entre sessions via le cache.
+
+    Précision : chaque prix est arrondi à FLOAT32_RTOL près (relatif). Un rendement
+    calculé en float64 à partir de deux prix float32 est donc à ~2 * FLOAT32_RTOL
+    (1.2e-7) du chemin float64, et une equity composée sur T bougies à ~T * 1.2e-7
+    en relatif au pire (en pratique ~sqrt(T) * 1.2e-7, les erreurs se compensant).
+    Les signaux de croisement peuvent différer quand les deux moyennes sont à moins
+    de cette tolérance l'une de l'autre.
+    """
+
+    COLUMNS = OHLCV_COLUMNS
+
+    def __init__(self, index, values):
+        self.index = index
+        self.values = values
+
+    @classmethod
+    def from_frame(cls, df):
+        index = pd.DatetimeIndex(df.index)
+        index = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+        values = np.empty((len(cls.COLUMNS), len(df)), dtype=np.float32)
+        for i, col in enumerate(cls.COLUMNS):
+            values[i] = df[col].to_numpy(dtype=np.float32) if col in df else np.nan
+        return cls(index.as_unit("ns").asi8.copy(), values)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def nbytes(self):
+        return int(self.index.nbytes + self.values.nbytes)
+
+    def column(self, name):
+        """Vue float32 d'une colonne (lecture seule si chargée par mmap)."""
+        return self.values[self.COLUMNS.index(name)]
+
+    @property
+    def close(self):
+        return self.column("Close")
+
+    def datetime_index(self):
+        return pd.DatetimeIndex(self.index, tz="UTC")
+
+    def since(self, start):
+        """Vue des bougies strictement après `start` (Timestamp), comme OHLCVStore.read."""
+        lo = np.searchsorted(self.index, pd.Timestamp(start).as_unit("ns").value, side="right")
+        return PriceArrays(self.index[lo:], self.values[:, lo:])
+
+    def to_frame(self, dtype=np.float64):
+        """DataFrame OHLCV (copie, float64 par défaut) pour les fonctions historiques."""
+        data = {col: self.values[i].astype(dtype) for i, col in enumerate(self.COLUMNS)}
+        return pd.DataFrame(data, index=self.datetime_index())
+
+    def save(self, path):
+        """Ecrit index.npy et values.npy dans le dossier `path` (remplacement atomique)."""
+        os.makedirs(path, exist_ok=True)
+        for name, arr in (("index", self.index), ("values", self.values)):
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(arr))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Relit un dossier écrit par save() ; mmap=True : tableaux partagés, en lecture seule."""
+        mode = "r" if mmap else None
+        return cls(np.load(os.path.join(path, "index.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "values.npy"), mmap_mode=mode))
+
+
+@instrumented(size=True)
+def get_price_arrays_many(symbol_keys, period="7d", interval="5m", max_workers=FETCH_WORKERS):
+    """
+    Comme get_historical_data_many, mais renvoie des PriceArrays partagés par toutes
+    les sessions (une seule copie float32 en mémoire par ticker / intervalle / période).
+
+    Returns:
+        (arrays, failures): {clé: PriceArrays}, {clé: raison}
+    """
+    cache = get_cache()
+    failures = {}
+    tickers = {}
+    for k in symbol_keys:
+        ticker = ASSETS.get(k)
+        if ticker:
+            tickers[k] = ticker
+        else:
+            failures[k] = "not configured"
+
+    arrays = {}
+    for k, ticker in tickers.items():
+        arr = cache.get(("arrays", ticker, interval, period), record=False)
+        if arr is None:
+            # Tranche d'une période plus longue déjà chargée : simple vue
+            for _, other in cache.find(("arrays", ticker, interval)):
+                if len(other):
+                    last = pd.Timestamp(int(other.index[-1]), tz="UTC")
+                    start = period_start(last, period)
+                    if start is not None and start.as_unit("ns").value >= other.index[0]:
+                        arr = other.since(start)
+                        break
+        cache.record(arr is not None)
+        if arr is not None:
+            arrays[k] = arr
+
+    pending = {k: t for k, t in tickers.items() if k not in arrays}
+    _sync_pending(list(pending.values()), period, interval, max_workers)
+    for k, ticker in pending.items():
+        df = _store.read(ticker, interval, period)
+        if df.empty:
+            failures[k] = "no data"
+            continue
+        arrays[k] = cache.set(("arrays", ticker, interval, period), PriceArrays.from_frame(df),
+                              ttl=ttl_for_interval(interval))
+    return {k: arrays[k] for k in tickers if k in arrays}, failures
+
+
+def get_price_arrays(symbol_key, period="7d", interval="5m"):
+    """PriceArrays d'un actif, ou None si aucune donnée."""
+    arrays, _ = get_price_arrays_many([symbol_key], period=period, interval=interval)
+    return arrays.get(symbol_key)
+
 
 def get_historical_data(symbol_key, period="7d", interval="5m"):
     """
     Récupère les données historiques pour un actif donné.
+    Les bougies sont servies depuis le stockage local, qui n'est complété
+    que par les nouvelles bougies (voir sync_store).
+    Pour plusieurs actifs, utiliser get_historical_data_many (requêtes en parallèle).
     
     Args:
         symbol_key (str): La clé de l'actif (ex: 'BTC', 'ETH') définie dans config.py
@@ -18,41 +501,20 @@ def get_historical_data(symbol_key, period="7d", interval="5m"):
     # 1. Récupérer le symbole Yahoo Finance depuis la config
     ticker = ASSETS.get(symbol_key)
     if not ticker:
+        import streamlit as st
         st.error(f"Erreur : L'actif '{symbol_key}' n'est pas configuré.")
         return pd.DataFrame()
 
-    # 2. Tentative de téléchargement avec retries
-    df = pd.DataFrame()
-    for i in range(RETRIES):
-        try:
-            # Téléchargement silencieux (pas de print dans la console)
-            df = yf.download(ticker, period=period, interval=interval, progress=False, timeout=TIMEOUT)
-            
-            # Si on a des données, on arrête la boucle
-            if not df.empty:
-                break
-        except Exception as e:
-            print(f"Tentative {i+1} échouée pour {ticker}: {e}")
-    
+    # 2. Synchronisation incrémentale du stockage local, puis lecture de la période
+    frames, _ = get_historical_data_many([symbol_key], period=period, interval=interval)
+    df = frames.get(symbol_key, pd.DataFrame())
+
     # 3. Vérification finale
     if df.empty:
+        import streamlit as st
         st.warning(f"Aucune donnée récupérée pour {symbol_key} (Yahoo Finance peut être instable).")
         return df
 
-    # 4. Nettoyage des données
-    # Yahoo renvoie parfois un MultiIndex difficile à gérer, on le simplifie
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.droplevel(1)
-    
-    # On s'assure que les colonnes sont propres
-    df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
-    
-    # On s'assure que l'index est bien un datetime UTC (important pour comparer)
-    if df.index.tz is None:
-        df.index = df.index.tz_localize('UTC')
-    else:
-        df.index = df.index.tz_convert('UTC')
-        
     return df
 
 def get_latest_price(symbol_key):
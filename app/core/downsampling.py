@@ -0,0 +1,79 @@
+# app/core/downsampling.py
+import numpy as np
+import pandas as pd
+
+from app.core.config import CHART_MAX_POINTS, CHART_MAX_CANDLES
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets : positions des n_out points à garder pour tracer (x, y).
+    Le premier et le dernier point sont toujours gardés ; dans chaque bucket, on garde le point
+    qui forme le plus grand triangle avec le point gardé précédent et la moyenne du bucket suivant,
+    ce qui conserve les pics et les creux visibles.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bornes des buckets (hors premier et dernier point), fixes : moyennes précalculées
+    bounds = (np.floor(np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64) + 1)
+    bounds[-1] = n - 1
+    sizes = np.diff(bounds)
+    mean_x = np.add.reduceat(x[:-1], bounds[:-1]) / sizes
+    mean_y = np.add.reduceat(y[:-1], bounds[:-1]) / sizes
+    # Le "bucket suivant" du dernier bucket est le dernier point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def downsample_line(series: pd.Series, max_points: int = CHART_MAX_POINTS) -> pd.Series:
+    """Sous-échantillonne une série (index datetime ou numérique) pour un tracé en ligne (LTTB)."""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    if isinstance(series.index, pd.DatetimeIndex):
+        x = series.index.as_unit("s").asi8.astype(float)
+    else:
+        x = np.asarray(series.index, dtype=float)
+    return series.iloc[lttb_indices(x, series.to_numpy(dtype=float), max_points)]
+
+
+def downsample_ohlc(df: pd.DataFrame, max_candles: int = CHART_MAX_CANDLES) -> pd.DataFrame:
+    """
+    Regroupe des bougies consécutives pour ne pas dépasser max_candles :
+    Open = premier, High = max, Low = min, Close = dernier, Volume = somme.
+    Les extrêmes (plus haut / plus bas) sont donc conservés. Index = début du groupe.
+    """
+    n = len(df)
+    if n <= max_candles:
+        return df
+    step = int(np.ceil(n / max_candles))
+    starts = np.arange(0, n, step)
+    ends = np.append(starts[1:], n) - 1
+
+    out = pd.DataFrame(index=df.index[starts])
+    if 'Open' in df:
+        out['Open'] = df['Open'].to_numpy()[starts]
+    if 'High' in df:
+        out['High'] = np.fmax.reduceat(df['High'].to_numpy(dtype=float), starts)
+    if 'Low' in df:
+        out['Low'] = np.fmin.reduceat(df['Low'].to_numpy(dtype=float), starts)
+    if 'Close' in df:
+        out['Close'] = df['Close'].to_numpy()[ends]
+    if 'Volume' in df:
+        out['Volume'] = np.add.reduceat(np.nan_to_num(df['Volume'].to_numpy(dtype=float)), starts)
+    return out
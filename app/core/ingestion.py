@@ -0,0 +1,78 @@
+# app/core/ingestion.py
+import threading
+import time
+
+import schedule
+
+from app.core.config import ASSETS, INGEST_JOBS, INGEST_EVERY_SECONDS
+from app.core.data import sync_many, invalidate_prices
+
+
+def run_ingestion_once(jobs=None, assets=None):
+    """
+    Rafraîchit le stockage local pour tous les actifs et tous les intervalles configurés.
+    Une seule requête (groupée ou non) par actif et par intervalle.
+
+    Returns:
+        {interval: {ticker: bool}} (False si la source n'a rien renvoyé)
+    """
+    jobs = INGEST_JOBS if jobs is None else jobs
+    tickers = list((ASSETS if assets is None else assets).values())
+
+    results = {}
+    for interval, period in jobs.items():
+        start = time.perf_counter()
+        # max_age=0 : le worker force la synchro à chaque passage
+        results[interval] = sync_many(tickers, period=period, interval=interval, max_age=0)
+        # Worker dans le même processus que l'app : les prix en cache de cet intervalle, et des
+        # intervalles qui en sont dérivés (voir app.core.resample), sont périmés
+        invalidate_prices()
+        failed = [t for t, ok in results[interval].items() if not ok]
+        elapsed = time.perf_counter() - start
+        print(f"[Ingestion] {interval}: {len(tickers) - len(failed)}/{len(tickers)} OK en {elapsed:.1f}s"
+              + (f" (échecs: {', '.join(failed)})" if failed else ""))
+    return results
+
+
+class IngestionWorker:
+    """
+    Rafraîchit le stockage à intervalle régulier (package `schedule`),
+    soit dans un processus dédié (run_forever), soit dans un thread (start).
+    """
+
+    def __init__(self, every_seconds=INGEST_EVERY_SECONDS, jobs=None, assets=None):
+        self.every_seconds = every_seconds
+        self.jobs = jobs
+        self.assets = assets
+        self._scheduler = schedule.Scheduler()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        try:
+            return run_ingestion_once(self.jobs, self.assets)
+        except Exception as e:
+            # Le worker ne doit jamais s'arrêter sur une erreur ponctuelle
+            print(f"[Ingestion] Erreur : {e}")
+            return {}
+
+    def run_forever(self):
+        self.run_once()
+        self._scheduler.every(self.every_seconds).seconds.do(self.run_once)
+        while not self._stop.is_set():
+            self._scheduler.run_pending()
+            self._stop.wait(1.0)
+
+    def start(self):
+        """Démarre le worker dans un thread daemon (une seule fois)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="ingestion", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._scheduler.clear()
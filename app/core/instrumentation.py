@@ -0,0 +1,226 @@
+# app/core/instrumentation.py
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from app.core.cache import _sizeof, get_cache
+from app.core.config import (
+    INSTRUMENTATION_ENABLED,
+    INSTRUMENTATION_EVENTS,
+    INSTRUMENTATION_WINDOW,
+    LATENCY_BUCKETS_MS,
+)
+
+
+class Recorder:
+    """
+    Mesures du processus (partagées par toutes les sessions Streamlit, comme le cache) :
+    - par étape : nombre d'appels, erreurs, durée totale / max, histogramme des durées
+      (bornes LATENCY_BUCKETS_MS, la dernière case compte les dépassements), dernières
+      durées (percentiles) et taille des données produites (octets)
+    - compteurs libres (essais de téléchargement, échecs, ...)
+    - derniers événements, pour l'export JSON lines
+    """
+
+    def __init__(self, window=INSTRUMENTATION_WINDOW, max_events=INSTRUMENTATION_EVENTS):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._events = deque(maxlen=max_events)
+
+    def observe(self, stage, ms, nbytes=None, error=False):
+        with self._lock:
+            s = self._stages.get(stage)
+            if s is None:
+                s = self._stages[stage] = {
+                    "count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "hist": [0] * (len(LATENCY_BUCKETS_MS) + 1), "recent": deque(maxlen=self.window),
+                    "bytes_total": 0, "bytes_max": 0,
+                }
+            s["count"] += 1
+            s["errors"] += bool(error)
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+            s["hist"][bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+            s["recent"].append(ms)
+            if nbytes is not None:
+                s["bytes_total"] += nbytes
+                s["bytes_max"] = max(s["bytes_max"], nbytes)
+            self._events.append({"type": "timing", "ts": time.time(), "stage": stage, "ms": round(ms, 3),
+                                 "bytes": nbytes, "error": bool(error)})
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+            self._events.append({"type": "counter", "ts": time.time(), "name": name, "n": n})
+
+    def stages(self) -> dict:
+        """{étape: count, errors, mean_ms, p50_ms, p95_ms, p99_ms, max_ms, bytes_total, bytes_max}."""
+        with self._lock:
+            out = {}
+            for stage, s in self._stages.items():
+                recent = np.fromiter(s["recent"], dtype=float)
+                p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if len(recent) else (np.nan,) * 3
+                out[stage] = {
+                    "count": s["count"], "errors": s["errors"],
+                    "mean_ms": s["total_ms"] / s["count"], "p50_ms": float(p50), "p95_ms": float(p95),
+                    "p99_ms": float(p99), "max_ms": s["max_ms"],
+                    "bytes_total": s["bytes_total"], "bytes_max": s["bytes_max"],
+                }
+            return out
+
+    def histogram(self, stage) -> dict:
+        """{libellé de case: nombre d'appels} ("<= 5 ms", ..., "> 10000 ms")."""
+        with self._lock:
+            hist = self._stages[stage]["hist"] if stage in self._stages else [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            labels = [f"<= {b} ms" for b in LATENCY_BUCKETS_MS] + [f"> {LATENCY_BUCKETS_MS[-1]} ms"]
+            return dict(zip(labels, hist))
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def snapshot(self) -> dict:
+        """Etat complet : étapes, compteurs et statistiques du cache partagé (hits / misses)."""
+        return {"ts": time.time(), "pid": os.getpid(), "enabled": is_enabled(),
+                "stages": self.stages(), "counters": self.counters(), "cache": get_cache().stats()}
+
+    def export_jsonl(self, path=None) -> str:
+        """
+        Evénements gardés (un objet JSON par ligne) suivis d'une ligne "summary" (snapshot).
+        Avec `path`, les lignes sont aussi ajoutées à ce fichier (comparaisons entre exécutions).
+        """
+        with self._lock:
+            events = list(self._events)
+        lines = [json.dumps(e) for e in events]
+        lines.append(json.dumps({"type": "summary", **self.snapshot()}, default=float))
+        text = "\n".join(lines) + "\n"
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self._events.clear()
+
+
+_recorder = Recorder()
+_enabled = INSTRUMENTATION_ENABLED
+
+
+def get_recorder() -> Recorder:
+    return _recorder
+
+
+def set_enabled(enabled: bool):
+    """Active / désactive les mesures (désactivées : timed et instrumented ne coûtent qu'un test)."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _Timer:
+    __slots__ = ("stage", "nbytes", "_start")
+
+    def __init__(self, stage, nbytes=None):
+        self.stage = stage
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _recorder.observe(self.stage, (time.perf_counter() - self._start) * 1000.0, self.nbytes,
+                          error=exc_type is not None)
+        return False
+
+
+class _NullTimer:
+    """Timer inactif (instrumentation désactivée) : aucune mesure, attributs ignorés."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(stage, nbytes=None):
+    """
+    Context manager : durée du bloc enregistrée sous `stage`.
+    La taille des données produites peut être renseignée dans le bloc :
+
+        with timed("data.fetch") as t:
+            df = ...
+            t.nbytes = payload_size(df)
+    """
+    return _Timer(stage, nbytes) if _enabled else _NULL_TIMER
+
+
+def instrumented(stage=None, size=False):
+    """
+    Décorateur : durée de chaque appel (stage par défaut : module.fonction).
+    size=True : taille du résultat enregistrée (payload_size).
+    """
+    def decorator(fn):
+        name = stage or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Timer(name) as t:
+                result = fn(*args, **kwargs)
+                if size:
+                    t.nbytes = payload_size(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """Incrémente un compteur (ex : "data.retries")."""
+    if _enabled:
+        _recorder.count(name, n)
+
+
+def payload_size(value) -> int:
+    """Taille approximative en octets (DataFrame, tableaux, tuples / dicts de ceux-ci)."""
+    return _sizeof(value)
+
+
+def plotly_chart(fig, stage="ui.plotly_chart", **kwargs):
+    """
+    st.plotly_chart instrumenté : la sérialisation JSON de la figure (taille envoyée au
+    navigateur) est mesurée à part, sous "ui.plotly_serialize". Cette sérialisation est
+    refaite par Streamlit : elle n'a lieu que si l'instrumentation est active.
+    """
+    import streamlit as st
+
+    if _enabled:
+        with _Timer("ui.plotly_serialize") as t:
+            t.nbytes = len(fig.to_json())
+    with timed(stage):
+        return st.plotly_chart(fig, **kwargs)
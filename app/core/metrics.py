@@ -2,6 +2,8 @@
 import pandas as pd
 import numpy as np
 
+from app.core.instrumentation import instrumented
+
 
 def max_drawdown(equity: pd.Series) -> float:
     """
@@ -61,3 +63,208 @@ def corr_matrix(returns_df: pd.DataFrame) -> pd.DataFrame:
     if returns_df is None or returns_df.empty:
         return pd.DataFrame()
     return returns_df.corr()
+
+
+# ---------------------------------------------------------------------------
+# Matrix engine: all metrics for all columns at once, and O(T) rolling versions
+# ---------------------------------------------------------------------------
+
+def _as_2d(data):
+    """(values T x k, index, columns, was_series) for a Series or DataFrame."""
+    if isinstance(data, pd.Series):
+        return data.to_numpy(dtype=float).reshape(-1, 1), data.index, [data.name], True
+    return data.to_numpy(dtype=float), data.index, list(data.columns), False
+
+
+def _wrap(values, index, columns, was_series):
+    if was_series:
+        return pd.Series(values[:, 0], index=index, name=columns[0])
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def fold_first_row(returns: np.ndarray) -> np.ndarray:
+    """
+    Returns from row 1 on, with row 0 compounded into row 1.
+    Row 0 has no price return but may carry a cost (entry at the first close): dropping it
+    would leave that cost out of the stats, keeping it as a period would change T.
+    """
+    r = np.array(returns, dtype=float)
+    if len(r) < 2:
+        return r[1:]
+    r[1] = (1.0 + np.nan_to_num(r[0])) * (1.0 + r[1]) - 1.0
+    return r[1:]
+
+
+@instrumented()
+def column_stats(returns: np.ndarray, equity: np.ndarray = None, rf_annual: float = 0.0,
+                 periods_per_year: int = 252) -> dict:
+    """
+    Whole-period metrics for every column of a (T, k) returns array, NaN ignored per column.
+    Same definitions as the scalar functions above (all in %, except Sharpe).
+    If equity is None, it is rebuilt as cumprod(1 + r).
+
+    Returns a dict of (k,) arrays: Annualized_Return, Annualized_Vol, Sharpe, Max_Drawdown.
+    """
+    r = np.asarray(returns, dtype=float)
+    if r.ndim == 1:
+        r = r.reshape(-1, 1)
+    valid = ~np.isnan(r)
+    n = valid.sum(axis=0)
+    r0 = np.where(valid, r, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        compounded = np.prod(1.0 + r0, axis=0)
+        ann_ret = np.where(n > 0, (compounded ** (periods_per_year / np.maximum(n, 1)) - 1.0) * 100.0, np.nan)
+
+        mean = r0.sum(axis=0) / n
+        var = (np.where(valid, r - mean, 0.0) ** 2).sum(axis=0) / (n - 1)
+        std = np.where(n > 1, np.sqrt(var), np.nan)
+        ann_vol = std * np.sqrt(periods_per_year) * 100.0
+
+        excess = mean - rf_annual / periods_per_year
+        sharpe = np.where(std > 0, excess / std * np.sqrt(periods_per_year), np.nan)
+
+    if equity is None:
+        equity = np.cumprod(1.0 + r0, axis=0)
+        equity[~valid] = np.nan
+    mdd = max_drawdowns(equity)
+
+    return {
+        "Annualized_Return": ann_ret,
+        "Annualized_Vol": ann_vol,
+        "Sharpe": sharpe,
+        "Max_Drawdown": mdd,
+    }
+
+
+def max_drawdowns(equity: np.ndarray) -> np.ndarray:
+    """Max drawdown in % for every column of a (T, k) equity array, NaN ignored."""
+    eq = np.asarray(equity, dtype=float)
+    if eq.ndim == 1:
+        eq = eq.reshape(-1, 1)
+    if eq.shape[0] == 0:
+        return np.full(eq.shape[1], np.nan)
+    # fmax ignores NaN: the running max only moves on observed values
+    running_max = np.fmax.accumulate(eq, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = (eq - running_max) / running_max
+    dd = np.where(np.isnan(dd), np.inf, dd).min(axis=0)
+    return np.where(np.isinf(dd), np.nan, dd * 100.0)
+
+
+@instrumented()
+def metrics_table(returns_df: pd.DataFrame, equity_df: pd.DataFrame = None, rf_annual: float = 0.0,
+                  periods_per_year: int = 252) -> pd.DataFrame:
+    """
+    All whole-period metrics for all columns in one pass.
+    One row per column: Annualized_Return, Annualized_Vol, Sharpe, Max_Drawdown.
+    """
+    if returns_df is None or returns_df.empty:
+        return pd.DataFrame()
+    r, _, columns, _ = _as_2d(returns_df)
+    eq = None if equity_df is None else _as_2d(equity_df)[0]
+    stats = column_stats(r, eq, rf_annual=rf_annual, periods_per_year=periods_per_year)
+    return pd.DataFrame(stats, index=columns)
+
+
+def _window_sums(values: np.ndarray, window: int):
+    """
+    Sum over the last `window` rows (NaN counted as 0) and number of NaN in the window,
+    from cumulative sums. Rows before the first full window are flagged as incomplete.
+    """
+    valid = ~np.isnan(values)
+    cs = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    cn = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(~valid, axis=0)])
+    T = values.shape[0]
+    sums = np.full(values.shape, np.nan)
+    missing = np.ones(values.shape, dtype=bool)
+    if 0 < window <= T:
+        sums[window - 1:] = cs[window:] - cs[:-window]
+        missing[window - 1:] = (cn[window:] - cn[:-window]) > 0
+    return sums, missing
+
+
+def _rolling_mean_std(values: np.ndarray, window: int):
+    """Rolling mean and sample std (ddof=1); std is NaN for window < 2, as in pandas."""
+    s1, missing = _window_sums(values, window)
+    s2, _ = _window_sums(values ** 2, window)
+    mean = s1 / window
+    if window < 2:
+        std = np.full(values.shape, np.nan)
+    else:
+        var = (s2 - s1 * mean) / (window - 1)
+        std = np.sqrt(np.clip(var, 0.0, None))
+    mean[missing] = np.nan
+    std[missing] = np.nan
+    return mean, std
+
+
+def rolling_vol(returns, window: int, periods_per_year: int = 252):
+    """Rolling annualized volatility in % (Series or DataFrame), O(T) per column."""
+    r, index, columns, was_series = _as_2d(returns)
+    _, std = _rolling_mean_std(r, window)
+    return _wrap(std * np.sqrt(periods_per_year) * 100.0, index, columns, was_series)
+
+
+def rolling_sharpe(returns, window: int, rf_annual: float = 0.0, periods_per_year: int = 252):
+    """Rolling annualized Sharpe ratio (Series or DataFrame), O(T) per column."""
+    r, index, columns, was_series = _as_2d(returns)
+    mean, std = _rolling_mean_std(r, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sharpe = (mean - rf_annual / periods_per_year) / std * np.sqrt(periods_per_year)
+    sharpe[~(std > 0)] = np.nan
+    return _wrap(sharpe, index, columns, was_series)
+
+
+def _rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Max over the last `window` rows for every column, O(T) with the van Herk / Gil-Werman
+    block trick (prefix max + suffix max inside blocks of size `window`).
+    Rows before the first full window use the max since the start.
+    """
+    T, k = values.shape
+    if window <= 1 or T == 0:
+        return values.copy()
+    nb = -(-T // window)
+    padded = np.full((nb * window, k), -np.inf)
+    padded[:T] = np.where(np.isnan(values), -np.inf, values)
+    blocks = padded.reshape(nb, window, k)
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(-1, k)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, k)
+
+    out = np.maximum.accumulate(padded[:window], axis=0)[:min(window, T)]
+    if T > window:
+        i = np.arange(window, T)
+        out = np.vstack([out, np.maximum(suffix[i - window + 1], prefix[i])])
+    out[np.isinf(out)] = np.nan
+    return out
+
+
+def rolling_drawdown(equity, window: int):
+    """Drawdown in % from the highest equity of the last `window` rows (Series or DataFrame), O(T)."""
+    eq, index, columns, was_series = _as_2d(equity)
+    peak = _rolling_max(eq, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dd = (eq - peak) / peak * 100.0
+    return _wrap(dd, index, columns, was_series)
+
+
+def rolling_corr(returns_df: pd.DataFrame, window: int) -> pd.DataFrame:
+    """
+    Rolling correlation of every pair of columns, O(T) per pair.
+    Columns are named "A/B".
+    """
+    if returns_df is None or returns_df.empty:
+        return pd.DataFrame()
+    r, index, columns, _ = _as_2d(returns_df)
+    mean, std = _rolling_mean_std(r, window)
+
+    out = {}
+    k = r.shape[1]
+    for i in range(k):
+        for j in range(i + 1, k):
+            sxy, _ = _window_sums((r[:, i] * r[:, j]).reshape(-1, 1), window)
+            cov = (sxy[:, 0] - window * mean[:, i] * mean[:, j]) / (window - 1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[f"{columns[i]}/{columns[j]}"] = cov / (std[:, i] * std[:, j])
+    return pd.DataFrame(out, index=index)
@@ -0,0 +1,153 @@
+# app/core/montecarlo.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app.core.instrumentation import instrumented
+from app.core.metrics import corr_matrix
+
+# Matrice des rendements historiques du portefeuille, chargée une fois par processus du pool
+_WORKER_HISTORY = None
+
+
+def _init_worker(history):
+    global _WORKER_HISTORY
+    _WORKER_HISTORY = history
+
+
+def _portfolio_history(returns_df: pd.DataFrame, weights: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rendements historiques du portefeuille à poids constants (rebalancé à chaque pas).
+    Renvoie (rendements (T,), poids normalisés (actifs,) dans l'ordre des colonnes).
+    """
+    assets = list(returns_df.columns)
+    w = pd.Series(weights, dtype=float).reindex(assets).fillna(0.0).to_numpy()
+    w = w / w.sum() if w.sum() > 0 else np.full(len(assets), 1.0 / len(assets))
+    return returns_df.fillna(0.0).to_numpy(dtype=float) @ w, w
+
+
+def _simulate_chunk(n_paths, horizon, seed, method, params, fan_steps):
+    """
+    Simule un bloc de trajectoires et renvoie (rendements finaux, max drawdowns, equity aux fan_steps).
+    Chaque bloc a sa propre graine (SeedSequence.spawn) : le résultat ne dépend pas du nombre de processus.
+    """
+    rng = np.random.default_rng(seed)
+
+    if method == "bootstrap":
+        history = params["history"] if params.get("history") is not None else _WORKER_HISTORY
+        block = params["block_size"]
+        T = len(history)
+        n_blocks = -(-horizon // block)
+        starts = rng.integers(0, T - block + 1, size=(n_paths, n_blocks))
+        idx = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :horizon]
+        r = history[idx]
+    else:
+        r = rng.normal(params["mu"], params["sigma"], size=(n_paths, horizon))
+        r = np.maximum(r, -1.0)
+
+    equity = np.cumprod(1.0 + r, axis=1)
+    # Le pic de départ est la valeur initiale (1.0)
+    running_max = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    mdd = ((equity - running_max) / running_max).min(axis=1)
+    return equity[:, -1] - 1.0, mdd, equity[:, fan_steps].astype(np.float32)
+
+
+@instrumented()
+def monte_carlo_portfolio(
+    returns_df: pd.DataFrame,
+    weights: dict,
+    n_paths: int = 10_000,
+    horizon: int = 288,
+    method: str = "bootstrap",
+    block_size: int = 24,
+    seed=None,
+    max_cells: int = 5_000_000,
+    fan_points: int = 100,
+    n_jobs: int = 1,
+) -> dict:
+    """
+    Simulation Monte Carlo des trajectoires futures d'un portefeuille.
+
+    method:
+    - "bootstrap": block bootstrap des rendements historiques (mêmes dates pour tous les actifs,
+      donc corrélations et volatilité en grappes conservées à l'intérieur d'un bloc)
+    - "normal": loi normale multivariée (moyennes, volatilités et corr_matrix des rendements).
+      A poids constants, le rendement du portefeuille est alors normal de variance w' Σ w,
+      on le tire directement.
+
+    Les trajectoires sont simulées par blocs (horizon x bloc <= max_cells) pour borner la mémoire ;
+    avec n_jobs > 1, les blocs sont répartis sur un pool de processus.
+
+    Returns:
+        dict avec terminal_returns (array), max_drawdowns (array, <= 0),
+        fan (DataFrame : percentiles 5/25/50/75/95 de l'equity base 100 par pas)
+    """
+    returns_df = returns_df.dropna(how="all")
+    if returns_df.empty:
+        raise ValueError("Not enough returns to simulate.")
+
+    fan_steps = np.unique(np.linspace(0, horizon - 1, min(fan_points, horizon)).astype(int))
+    chunk = max(1, max_cells // horizon)
+    sizes = [min(chunk, n_paths - lo) for lo in range(0, n_paths, chunk)]
+    use_pool = bool(n_jobs and n_jobs > 1 and len(sizes) > 1)
+
+    history, w = _portfolio_history(returns_df, weights)
+    if method == "bootstrap":
+        block_size = max(1, min(int(block_size), len(history)))
+        # Avec le pool, l'historique est transmis une fois par processus (initializer), pas par bloc
+        params = {"block_size": block_size, "history": None if use_pool else history}
+    elif method == "normal":
+        vols = returns_df.std().to_numpy()
+        cov = corr_matrix(returns_df).to_numpy() * np.outer(vols, vols)
+        params = {"mu": float(returns_df.mean().to_numpy() @ w), "sigma": float(np.sqrt(w @ cov @ w))}
+    else:
+        raise ValueError(f"Unknown method: {method}")
+
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(size, horizon, s, method, params, fan_steps) for size, s in zip(sizes, seeds)]
+
+    if use_pool:
+        workers = min(n_jobs, len(tasks), os.cpu_count() or 1)
+        # spawn : pas de fork d'un processus multi-thread (serveur Streamlit)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(history,)) as pool:
+            results = list(pool.map(_simulate_chunk, *zip(*tasks)))
+    else:
+        results = [_simulate_chunk(*task) for task in tasks]
+
+    terminal = np.concatenate([r[0] for r in results])
+    mdd = np.concatenate([r[1] for r in results])
+    fan_equity = np.vstack([r[2] for r in results])
+
+    percentiles = [5, 25, 50, 75, 95]
+    fan = pd.DataFrame(
+        100.0 * np.percentile(fan_equity, percentiles, axis=0).T,
+        index=pd.Index(fan_steps + 1, name="step"),
+        columns=[f"p{p}" for p in percentiles],
+    )
+    return {"terminal_returns": terminal, "max_drawdowns": mdd, "fan": fan}
+
+
+def var_cvar(terminal_returns: np.ndarray, levels=(0.95, 0.99)) -> pd.DataFrame:
+    """
+    Value-at-Risk et Conditional VaR (Expected Shortfall) des rendements finaux, en % de perte.
+    """
+    rows = []
+    for level in levels:
+        q = np.quantile(terminal_returns, 1.0 - level)
+        tail = terminal_returns[terminal_returns <= q]
+        rows.append({
+            "Level": f"{level:.0%}",
+            "VaR": -q * 100.0,
+            "CVaR": -tail.mean() * 100.0 if len(tail) else float("nan"),
+        })
+    return pd.DataFrame(rows).set_index("Level")
+
+
+def drawdown_distribution(max_drawdowns: np.ndarray, percentiles=(5, 25, 50, 75, 95)) -> pd.Series:
+    """Percentiles des max drawdowns simulés (en %)."""
+    values = np.percentile(max_drawdowns, percentiles) * 100.0
+    return pd.Series(values, index=[f"p{p}" for p in percentiles], name="Max_Drawdown")
@@ -1,30 +1,49 @@
 import pandas as pd
 import numpy as np
-import streamlit as st
 
-from app.core.data import get_historical_data
+from app.core.costs import as_cost_model
+from app.core.align import align_frames
+from app.core.config import ALIGN_FFILL_LIMIT, ALIGN_WARN_COVERAGE
+from app.core.data import get_historical_data_many
+from app.core.instrumentation import instrumented
+from app.core.metrics import column_stats, fold_first_row
 
 
-def build_prices_matrix(symbol_keys, period="7d", interval="5m") -> pd.DataFrame:
+@instrumented(size=True)
+def build_prices_matrix(symbol_keys, period="7d", interval="5m", ffill_limit=ALIGN_FFILL_LIMIT,
+                        return_coverage=False):
     """
     Constructs a time-aligned price matrix (Close).
     Columns = assets (keys), index = UTC datetime.
+    All assets are fetched in one batch (see get_historical_data_many).
+
+    Assets are aligned with an as-of join on the union of their timestamps (see
+    app.core.align.align_frames): short gaps (up to ffill_limit in-session bars) and
+    closed-market hours (ASSET_CALENDARS) carry the last price instead of dropping the
+    row for every asset. With return_coverage=True, returns (prices, coverage), coverage
+    being the per-asset report of align_frames.
     """
-    price_series = {}
+    frames, failures = get_historical_data_many(symbol_keys, period=period, interval=interval)
+    prices, coverage = align_frames(frames, ffill_limit=ffill_limit)
 
-    for k in symbol_keys:
-        df = get_historical_data(k, period=period, interval=interval)
-        if df is None or df.empty:
-            st.warning(f"[Portfolio] No data for {k}.")
-            continue
-        price_series[k] = df["Close"].rename(k)
+    warnings = [f"No data for {k}." for k in failures]
+    warnings += [f"{k}: only {c:.0%} of in-session bars are actual quotes."
+                 for k, c in coverage["Coverage"].items() if c < ALIGN_WARN_COVERAGE]
+    if warnings:
+        import streamlit as st
+        for w in warnings:
+            st.warning(f"[Portfolio] {w}")
+    return (prices, coverage) if return_coverage else prices
 
-    if not price_series:
-        return pd.DataFrame()
 
-    prices = pd.concat(price_series.values(), axis=1).sort_index()
-    prices = prices.dropna(how="any")
-    return prices
+def build_volumes_matrix(symbol_keys, index, period="7d", interval="5m") -> pd.DataFrame:
+    """
+    Volume matrix aligned on a prices matrix index (same columns as build_prices_matrix),
+    for the volume-based slippage of the cost model. Served from the shared price cache.
+    """
+    frames, _ = get_historical_data_many(symbol_keys, period=period, interval=interval)
+    volumes = pd.concat([df["Volume"].rename(k) for k, df in frames.items()], axis=1) if frames else pd.DataFrame()
+    return volumes.reindex(index)
 
 
 def normalize_weights(weights: dict) -> dict:
@@ -38,14 +57,93 @@ def normalize_weights(weights: dict) -> dict:
     return w.to_dict()
 
 
+def _rebalance_starts(index: pd.DatetimeIndex, rebalance: str) -> np.ndarray:
+    """
+    Row positions where a rebalance period starts.
+    The first row always starts a period (initial allocation).
+    """
+    labels = pd.Series(0, index=index).resample(rebalance).first().index
+    positions = np.flatnonzero(index.isin(labels))
+    return np.union1d([0], positions).astype(np.int64)
+
+
+def _drifted_returns(returns: np.ndarray, weights: np.ndarray, starts: np.ndarray, return_drift: bool = False):
+    """
+    Portfolio returns with weight drift between rebalances.
+
+    returns: (T, n_assets) simple returns.
+    weights: (n_assets,) or (n_assets, n_portfolios) target weights, summing to 1.
+    starts: sorted row positions where weights are reset to target.
+
+    Inside a period, the value of each asset sleeve is weight * cumprod(1 + r),
+    so the portfolio return is V_t / V_{t-1} - 1 with V the sum of the sleeves.
+
+    With return_drift=True, also returns the weights held just before each rebalance,
+    shape (n_starts,) + weights.shape (zeros before the first one: allocation from cash).
+    """
+    T = returns.shape[0]
+    out_shape = (T,) + weights.shape[1:]
+    port = np.zeros(out_shape, dtype=float)
+    bounds = np.append(starts, T)
+    drift = np.zeros((len(starts),) + weights.shape)
+
+    for i, (s, e) in enumerate(zip(bounds[:-1], bounds[1:])):
+        growth = np.cumprod(1.0 + returns[s:e], axis=0)
+        value = growth @ weights
+        prev = np.empty_like(value)
+        prev[0] = weights.sum(axis=0)
+        prev[1:] = value[:-1]
+        np.divide(value - prev, prev, out=port[s:e], where=prev > 0)
+        if return_drift and i + 1 < len(starts):
+            end = weights * growth[-1].reshape((-1,) + (1,) * (weights.ndim - 1))
+            np.divide(end, value[-1], out=drift[i + 1], where=value[-1] > 0)
+
+    return (port, drift) if return_drift else port
+
+
+def _rebalance_costs(model, port, weights, drift, starts, prices, volumes):
+    """
+    Rebalancing costs, charged on the first return of each period.
+    Trades are |target - drifted| weights; the portfolio value at the trade is the
+    gross (pre-cost) equity at the previous close, price/volume are those of that bar.
+
+    Returns (cost per row (T[, N]), turnover per row, {Fees, Fixed, Slippage} per row).
+    """
+    trades = np.abs(weights[None] - drift)
+    gross = model.capital * np.cumprod(1.0 + port, axis=0)
+    trade_rows = np.maximum(starts - 1, 0)
+    value = np.where((starts > 0).reshape((-1,) + (1,) * (port.ndim - 1)), gross[trade_rows], model.capital)
+    price = prices[trade_rows]
+    volume = None if volumes is None else volumes[trade_rows]
+    parts = model.costs(trades, value[:, None], price=price, volume=volume)
+
+    rows = {}
+    for name, values in parts.items():
+        full = np.zeros(port.shape)
+        full[starts] = values.sum(axis=1)
+        rows[name] = full
+    turnover = np.zeros(port.shape)
+    turnover[starts] = trades.sum(axis=1)
+    return sum(rows.values()), turnover, rows
+
+
+@instrumented()
 def simulate_portfolio(
     prices: pd.DataFrame,
     weights: dict,
     rebalance: str = "W",
     base: float = 100.0,
+    costs=None,
+    volumes: pd.DataFrame = None,
 ) -> pd.DataFrame:
     """
     Simulate a rebalanced portfolio.
+    Weights are reset to target at each rebalance date and drift with returns in between.
+
+    costs: None, a proportional rate (0.001 = 10 bps) or an app.core.costs.CostModel,
+    applied to the rebalance weight deltas (volumes, same columns as prices, feed the
+    slippage). Portfolio_Returns are then net of costs, with extra columns
+    Gross_Returns, Turnover, Fees, Fixed, Slippage and Costs.
     """
     if prices.empty:
         return pd.DataFrame()
@@ -56,25 +154,115 @@ def simulate_portfolio(
 
     returns = prices.pct_change().fillna(0.0)
 
-    rebalance_dates = set(returns.resample(rebalance).first().index)
-
-    current_w = pd.Series(weights, index=assets)
-    port_returns = []
-
-    for t in returns.index:
-        if t in rebalance_dates:
-            current_w = pd.Series(weights, index=assets)
-
-        r_t = returns.loc[t]
-        port_r = float((current_w * r_t).sum())
-        port_returns.append(port_r)
-
-        # Weight drift
-        current_w = current_w * (1.0 + r_t)
-        if current_w.sum() > 0:
-            current_w = current_w / current_w.sum()
+    starts = _rebalance_starts(returns.index, rebalance)
+    w = np.array([weights[a] for a in assets], dtype=float)
+    model = as_cost_model(costs)
+    if model is None:
+        port_returns = _drifted_returns(returns.to_numpy(dtype=float), w, starts)
+    else:
+        gross, drift = _drifted_returns(returns.to_numpy(dtype=float), w, starts, return_drift=True)
+        vol = None if volumes is None else volumes.reindex(index=prices.index, columns=assets).to_numpy(dtype=float)
+        total, turnover, parts = _rebalance_costs(
+            model, gross, w, drift, starts, prices.to_numpy(dtype=float), vol)
+        port_returns = gross - total
 
     out = pd.DataFrame(index=returns.index)
     out["Portfolio_Returns"] = port_returns
     out["Portfolio_Equity"] = base * (1.0 + out["Portfolio_Returns"]).cumprod()
+    if model is not None:
+        out["Gross_Returns"] = gross
+        out["Turnover"] = turnover
+        for name, values in parts.items():
+            out[name] = values
+        out["Costs"] = total
     return out
+
+
+@instrumented()
+def simulate_portfolios_batch(
+    prices: pd.DataFrame,
+    weights: np.ndarray,
+    rebalance: str = "W",
+    base: float = 100.0,
+    rf_annual: float = 0.0,
+    periods_per_year: int = 252,
+    keep_equity: bool = True,
+    max_cells: int = 5_000_000,
+    costs=None,
+    volumes: pd.DataFrame = None,
+):
+    """
+    Simulate many rebalanced portfolios on the same prices matrix in one call.
+
+    weights: (N_portfolios, N_assets) array, columns in the order of prices.columns.
+    Rows are normalized to sum to 1 (equal-weight if the row sum is <= 0).
+    Portfolios are processed in chunks so that T x chunk stays below max_cells.
+
+    costs / volumes: as in simulate_portfolio (rebalancing costs, net returns).
+
+    Returns (equity, stats):
+    - equity: DataFrame (index = prices.index, one column per portfolio), or None if keep_equity=False
+    - stats: DataFrame with Annualized_Return, Annualized_Vol, Sharpe, Max_Drawdown per portfolio
+      (same definitions as app.core.metrics, in %), plus Turnover and Costs (sum, % of value)
+      when costs are set
+    """
+    if prices.empty:
+        return (pd.DataFrame() if keep_equity else None), pd.DataFrame()
+
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    n_assets = prices.shape[1]
+    if W.shape[1] != n_assets:
+        raise ValueError(f"weights must have {n_assets} columns (one per asset), got {W.shape[1]}.")
+
+    W = np.nan_to_num(W, nan=0.0)
+    sums = W.sum(axis=1, keepdims=True)
+    W = np.where(sums > 0, W / np.where(sums > 0, sums, 1.0), 1.0 / n_assets)
+
+    returns = prices.pct_change().fillna(0.0)
+    R = returns.to_numpy(dtype=float)
+    starts = _rebalance_starts(returns.index, rebalance)
+
+    T, N = R.shape[0], W.shape[0]
+    chunk = max(1, max_cells // max(T, 1))
+
+    equity_out = np.empty((T, N)) if keep_equity else None
+    stats_cols = {name: np.empty(N) for name in ["Annualized_Return", "Annualized_Vol", "Sharpe", "Max_Drawdown"]}
+
+    model = as_cost_model(costs)
+    if model is not None:
+        P = prices.to_numpy(dtype=float)
+        V = None if volumes is None else volumes.reindex(index=prices.index, columns=prices.columns).to_numpy(dtype=float)
+        stats_cols.update({"Turnover": np.empty(N), "Costs": np.empty(N)})
+
+    for lo in range(0, N, chunk):
+        hi = min(lo + chunk, N)
+        if model is None:
+            port = _drifted_returns(R, W[lo:hi].T, starts)
+        else:
+            gross, drift = _drifted_returns(R, W[lo:hi].T, starts, return_drift=True)
+            total, turnover, _ = _rebalance_costs(model, gross, W[lo:hi].T, drift, starts, P, V)
+            port = gross - total
+            stats_cols["Turnover"][lo:hi] = turnover.sum(axis=0)
+            stats_cols["Costs"][lo:hi] = total.sum(axis=0) * 100.0
+        equity = base * np.cumprod(1.0 + port, axis=0)
+
+        chunk_stats = column_stats(fold_first_row(port), equity, rf_annual=rf_annual,
+                                   periods_per_year=periods_per_year)
+        for name, values in chunk_stats.items():
+            stats_cols[name][lo:hi] = values
+
+        if keep_equity:
+            equity_out[:, lo:hi] = equity
+
+    stats = pd.DataFrame(W, columns=list(prices.columns))
+    for name, values in stats_cols.items():
+        stats[name] = values
+
+    equity_df = pd.DataFrame(equity_out, index=prices.index) if keep_equity else None
+    return equity_df, stats
+
+
+def random_weights(n_portfolios: int, n_assets: int, seed=None) -> np.ndarray:
+    """Uniform random long-only weights on the simplex (Dirichlet(1, ..., 1))."""
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.ones(n_assets), size=n_portfolios)
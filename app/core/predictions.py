@@ -1,40 +1,157 @@
 # app/core/predictions.py
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+
+
+def rolling_ols(values, window: int):
+    """
+    Régression linéaire glissante (moindres carrés, forme fermée) sur chaque colonne.
+
+    Pour chaque instant t, on ajuste y = intercept + slope * x sur les `window` derniers points,
+    avec x = 0 .. window-1 (x = window-1 pour le point t).
+    Calcul en O(T) par colonne à partir de sommes cumulées : pas de fit de modèle.
+
+    Args:
+        values: array (T,) ou (T, n_assets)
+        window: nombre de points par régression (>= 2)
+
+    Returns:
+        (slope, intercept): arrays de même forme que values, NaN tant que la fenêtre
+        n'est pas remplie ou si elle contient un prix manquant.
+    """
+    y = np.asarray(values, dtype=float)
+    squeeze = y.ndim == 1
+    if squeeze:
+        y = y.reshape(-1, 1)
+    T = y.shape[0]
+    slope = np.full(y.shape, np.nan)
+    intercept = np.full(y.shape, np.nan)
+    if window < 2 or window > T:
+        return (slope[:, 0], intercept[:, 0]) if squeeze else (slope, intercept)
+
+    valid = np.isfinite(y)
+    # On centre les prix (premier prix de chaque colonne) pour limiter l'erreur d'arrondi
+    first = np.array([col[ok][0] if ok.any() else 0.0 for col, ok in zip(y.T, valid.T)])
+    yc = np.where(valid, y - first, 0.0)
+
+    i = np.arange(T, dtype=float).reshape(-1, 1)
+    zero = np.zeros((1, y.shape[1]))
+    cs_y = np.vstack([zero, np.cumsum(yc, axis=0)])
+    cs_iy = np.vstack([zero, np.cumsum(i * yc, axis=0)])
+    cs_bad = np.vstack([zero, np.cumsum(~valid, axis=0)])
+
+    w = window
+    sy = cs_y[w:] - cs_y[:-w]
+    # sum(j * y) avec j = i - début de fenêtre
+    start = np.arange(T - w + 1, dtype=float).reshape(-1, 1)
+    sxy = (cs_iy[w:] - cs_iy[:-w]) - start * sy
+    sx = w * (w - 1) / 2.0
+    sxx = (w - 1) * w * (2 * w - 1) / 6.0
+
+    b = (w * sxy - sx * sy) / (w * sxx - sx ** 2)
+    a = (sy - b * sx) / w + first
+    bad = (cs_bad[w:] - cs_bad[:-w]) > 0
+    b[bad] = np.nan
+    a[bad] = np.nan
+
+    slope[w - 1:] = b
+    intercept[w - 1:] = a
+    return (slope[:, 0], intercept[:, 0]) if squeeze else (slope, intercept)
+
+
+def predict_linear_trend(prices: pd.DataFrame, window: int = 30, horizon: int = 5) -> pd.DataFrame:
+    """
+    Tendance linéaire locale pour tous les actifs d'un coup (une colonne = un actif).
+    Ajuste une droite sur les `window` derniers points et la prolonge de `horizon` points.
+
+    Returns:
+        DataFrame indexé par actif : Last_Price, Predicted_Price, Slope, Change_Pct, Trend
+    """
+    columns = ['Last_Price', 'Predicted_Price', 'Slope', 'Change_Pct', 'Trend']
+    if prices is None or prices.empty:
+        return pd.DataFrame(columns=columns)
+
+    tail = prices.tail(window)
+    w = len(tail)
+    slope, intercept = rolling_ols(tail.to_numpy(dtype=float), w)
+    b, a = slope[-1], intercept[-1]
+    predicted = a + b * (w - 1 + horizon)
+    last = tail.to_numpy(dtype=float)[-1]
+
+    out = pd.DataFrame({
+        'Last_Price': last,
+        'Predicted_Price': predicted,
+        'Slope': b,
+        'Change_Pct': (predicted / last - 1.0) * 100.0,
+    }, index=prices.columns)
+    out['Trend'] = np.where(out['Predicted_Price'] > out['Last_Price'], "Hausse ↗️", "Baisse ↘️")
+    return out
+
+
+def walk_forward_errors(prices, windows=(10, 20, 30, 60), horizon: int = 5) -> pd.DataFrame:
+    """
+    Evaluation hors échantillon sur tout l'historique : à chaque instant t, la droite
+    ajustée sur les `window` points jusqu'à t prédit le prix en t + horizon, comparé au prix réel.
+
+    Args:
+        prices: Series ou DataFrame de prix (une colonne = un actif)
+        windows: longueurs de fenêtre à comparer
+
+    Returns:
+        DataFrame (une ligne par (actif, fenêtre)) : Asset, Window, N, MAE, RMSE, MAPE (%)
+    """
+    if isinstance(prices, pd.Series):
+        prices = prices.to_frame(prices.name or 'Close')
+    y = prices.to_numpy(dtype=float)
+    T = y.shape[0]
+
+    rows = []
+    for w in windows:
+        slope, intercept = rolling_ols(y, w)
+        forecast = intercept + slope * (w - 1 + horizon)
+        if T > horizon:
+            err = y[horizon:] - forecast[:-horizon]
+            actual = y[horizon:]
+        else:
+            err = np.full((0, y.shape[1]), np.nan)
+            actual = err
+        ok = np.isfinite(err)
+        n = ok.sum(axis=0)
+        abs_err = np.where(ok, np.abs(err), 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mae = abs_err.sum(axis=0) / n
+            rmse = np.sqrt(np.where(ok, err ** 2, 0.0).sum(axis=0) / n)
+            mape = np.where(ok, np.abs(err / actual), 0.0).sum(axis=0) / n * 100.0
+        for j, asset in enumerate(prices.columns):
+            rows.append({'Asset': asset, 'Window': w, 'N': int(n[j]),
+                         'MAE': mae[j], 'RMSE': rmse[j], 'MAPE': mape[j]})
+    return pd.DataFrame(rows, columns=['Asset', 'Window', 'N', 'MAE', 'RMSE', 'MAPE'])
+
 
 def predict_linear_regression(df: pd.DataFrame, days_ahead: int = 5):
     """
-    Entraîne une régression linéaire sur les 30 derniers points (Tendance locale).
+    Régression linéaire sur les 30 derniers points (Tendance locale).
+    Forme fermée (moindres carrés), sans entraîner de modèle scikit-learn.
     """
-    # --- CORRECTION ICI : On ne garde que les 30 derniers points ---
+    # On ne garde que les 30 derniers points
     # Cela permet au modèle de coller au prix actuel ("Momentum")
-    df_ml = df[['Close']].tail(30).copy() 
-    
-    # Le reste ne change pas...
-    df_ml['Day_ID'] = np.arange(len(df_ml))
-    
-    X = df_ml[['Day_ID']]
-    y = df_ml['Close']
-    
-    # Entraînement
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    # Préparation des jours futurs pour la prédiction
-    last_day_id = df_ml['Day_ID'].iloc[-1]
-    future_days_id = np.array([last_day_id + i for i in range(1, days_ahead + 1)]).reshape(-1, 1)
-    
-    # Prédiction
-    future_prices = model.predict(future_days_id)
-    
+    close = df['Close'].tail(30).to_numpy(dtype=float)
+    n = len(close)
+
+    slope, intercept = rolling_ols(close, n)
+    b, a = slope[-1], intercept[-1]
+
+    # Prédiction pour les jours futurs (suite des indices 0 .. n-1)
+    future_days_id = np.arange(n, n + days_ahead)
+    future_prices = a + b * future_days_id
+
     # Génération des dates futures pour l'affichage
     last_date = df.index[-1]
     future_dates = [last_date + pd.Timedelta(days=i) for i in range(1, days_ahead + 1)]
-    
+
     # Détection de la tendance
     current_price = df['Close'].iloc[-1]
     predicted_final_price = future_prices[-1]
     trend = "Hausse ↗️" if predicted_final_price > current_price else "Baisse ↘️"
-    
-    return future_dates, future_prices, trend
\ No newline at end of file
+
+    return future_dates, future_prices, trend
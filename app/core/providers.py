@@ -0,0 +1,199 @@
+# app/core/providers.py
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import TIMEOUT
+from app.core.store import interval_to_timedelta, period_start
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def clean_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalise un DataFrame brut : colonnes OHLCV simples, index datetime UTC trié.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+    # Yahoo renvoie parfois un MultiIndex difficile à gérer, on le simplifie
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+
+    df = df[OHLCV_COLUMNS]
+
+    # On s'assure que l'index est bien un datetime UTC (important pour comparer)
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    else:
+        index = index.tz_convert('UTC')
+    df = df.set_axis(index)
+
+    # Requêtes multi-tickers : lignes vides là où un ticker n'a pas de bougie
+    df = df.dropna(how='all')
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df
+
+
+class YahooProvider:
+    """Source de données Yahoo Finance (yfinance)."""
+
+    name = "yahoo"
+    supports_batch = True
+
+    def fetch(self, ticker, interval, period=None, start=None):
+        """
+        Télécharge les bougies d'un ticker.
+        Si `start` est donné, seules les bougies à partir de cette date sont demandées.
+        """
+        # Import au premier appel : yfinance est lourd et inutile quand le stockage suffit
+        import yfinance as yf
+
+        if start is not None:
+            raw = yf.download(ticker, start=start, interval=interval, progress=False, timeout=TIMEOUT)
+        else:
+            raw = yf.download(ticker, period=period, interval=interval, progress=False, timeout=TIMEOUT)
+        return clean_ohlcv(raw)
+
+    def fetch_many(self, tickers, interval, period=None):
+        """
+        Télécharge plusieurs tickers en une seule requête.
+        Renvoie {ticker: DataFrame} ; les tickers absents de la réponse sont omis.
+        """
+        import yfinance as yf
+
+        raw = yf.download(list(tickers), period=period, interval=interval, group_by='ticker',
+                          progress=False, timeout=TIMEOUT)
+        frames = {}
+        if raw is None or raw.empty:
+            return frames
+        for t in tickers:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if t not in raw.columns.get_level_values(0):
+                    continue
+                sub = raw[t]
+            else:
+                sub = raw
+            df = clean_ohlcv(sub)
+            if not df.empty:
+                frames[t] = df
+        return frames
+
+
+class FakeProvider:
+    """
+    Flux de marché synthétique et déterministe (aucun accès réseau).
+    Le prix d'une bougie ne dépend que du ticker et de son horodatage,
+    donc deux appels successifs renvoient des données cohérentes.
+    """
+
+    name = "fake"
+
+    def __init__(self, now=None, base_price=100.0, latency=0.0, failure_rate=0.0, seed=None, batch=True):
+        """
+        latency: délai (secondes) simulé pour chaque requête
+        failure_rate: probabilité qu'une requête lève une exception
+        batch: si False, fetch_many n'est pas annoncé (force le pool de threads)
+        """
+        self.supports_batch = batch
+        self.now = now
+        self.base_price = base_price
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.calls_by_ticker = {}
+
+    def _now(self):
+        now = pd.Timestamp(self.now) if self.now is not None else pd.Timestamp.now(tz='UTC')
+        return now.tz_localize('UTC') if now.tz is None else now.tz_convert('UTC')
+
+    def _request(self, tickers):
+        """Comptabilise la requête, applique la latence et l'échec éventuel."""
+        with self._lock:
+            self.calls += 1
+            for t in tickers:
+                self.calls_by_ticker[t] = self.calls_by_ticker.get(t, 0) + 1
+            failed = self._rng.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise ConnectionError(f"Echec simulé pour {', '.join(tickers)}")
+
+    def fetch(self, ticker, interval, period=None, start=None):
+        self._request([ticker])
+        return self._bars_between(ticker, interval, period, start)
+
+    def fetch_many(self, tickers, interval, period=None):
+        self._request(list(tickers))
+        return {t: self._bars_between(t, interval, period, None) for t in tickers}
+
+    def _bars_between(self, ticker, interval, period, start):
+        step = interval_to_timedelta(interval)
+        end = self._now().floor(step)
+        if start is not None:
+            first = pd.Timestamp(start)
+            first = first.tz_localize('UTC') if first.tz is None else first.tz_convert('UTC')
+        else:
+            first = period_start(end, period or "7d")
+        if first is None:
+            first = end - 1000 * step
+        first = first.ceil(step)
+        if first > end:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+        index = pd.date_range(first, end, freq=step)
+        return self.bars(ticker, index)
+
+    def bars(self, ticker, index):
+        """Génère les bougies OHLCV pour un index donné."""
+        t = pd.DatetimeIndex(index).as_unit("s").asi8.astype(float)
+        seed = sum(ord(c) for c in ticker)
+        phase = (seed % 97) / 97.0 * 2 * np.pi
+
+        def hash01(x):
+            # Bruit pseudo-aléatoire vectorisé, fonction pure de x
+            return np.modf(np.abs(np.sin(x * 12.9898 + seed) * 43758.5453))[0]
+
+        level = self.base_price * (1.0 + seed % 10)
+        close = level * (1.0
+                         + 0.10 * np.sin(2 * np.pi * t / (30 * 86400) + phase)
+                         + 0.03 * np.sin(2 * np.pi * t / 86400 + phase)
+                         + 0.005 * (hash01(t) - 0.5))
+        open_ = level * (1.0
+                         + 0.10 * np.sin(2 * np.pi * (t - 1) / (30 * 86400) + phase)
+                         + 0.03 * np.sin(2 * np.pi * (t - 1) / 86400 + phase)
+                         + 0.005 * (hash01(t - 1) - 0.5))
+        spread = level * 0.002 * hash01(t + 7)
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': 1000.0 * (1.0 + hash01(t + 13)),
+        }, index=index)
+
+
+def synthetic_ohlcv(n_rows, interval="5m", seed=0, start="2024-01-01", base_price=100.0, vol=0.002):
+    """
+    Bougies OHLCV synthétiques (marche aléatoire géométrique), pour les benchmarks
+    et les tests hors ligne. Index UTC régulier de n_rows bougies à partir de `start`.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(pd.Timestamp(start, tz='UTC'), periods=n_rows, freq=interval_to_timedelta(interval))
+    log_r = rng.normal(0.0, vol, n_rows)
+    close = base_price * np.exp(np.cumsum(log_r))
+    open_ = np.concatenate([[base_price], close[:-1]])
+    spread = np.abs(rng.normal(0.0, vol / 2, n_rows)) * close
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': rng.lognormal(7.0, 1.0, n_rows),
+    }, index=index)
@@ -0,0 +1,281 @@
+# app/core/reports.py
+import glob
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import ASSETS
+from app.core.data import get_historical_data_many, align_closes
+from app.core.metrics import column_stats
+from app.core.portfolio import simulate_portfolio
+
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "reports")
+REPORTS_DB = "history.sqlite"  # Historique indexé des rapports, dans le dossier des rapports
+
+# Colonnes numériques d'une ligne de rapport (un actif ou "PORTFOLIO")
+METRIC_COLUMNS = ["open", "close", "volatility", "max_drawdown", "annualized_return", "annualized_vol", "sharpe"]
+
+
+def compute_daily_metrics(symbol_keys=None, period="1mo", interval="1d", rebalance="W"):
+    """
+    Métriques du rapport journalier pour tous les actifs + le portefeuille équipondéré.
+    Les données sont récupérées en parallèle via la couche data, les métriques
+    sont calculées en un seul passage sur la matrice des rendements.
+
+    Returns:
+        (rows, failures): rows = liste de dicts (un par actif, puis "PORTFOLIO"),
+        failures = {clé: raison} pour les actifs sans données
+    """
+    symbol_keys = list(ASSETS.keys()) if symbol_keys is None else list(symbol_keys)
+    frames, failures = get_historical_data_many(symbol_keys, period=period, interval=interval)
+    if not frames:
+        return [], failures
+
+    keys = list(frames)
+    # Matrice des clôtures en jointure externe : chaque actif garde toutes ses bougies
+    closes = pd.concat([frames[k]["Close"].rename(k) for k in keys], axis=1).sort_index()
+    returns = closes.pct_change(fill_method=None)
+
+    # Un seul passage vectorisé pour tous les actifs
+    stats = column_stats(returns.to_numpy(dtype=float)[1:], closes.to_numpy(dtype=float))
+    period_vol = returns.std().to_numpy() * 100.0
+
+    rows = []
+    for i, k in enumerate(keys):
+        df = frames[k]
+        rows.append({
+            "asset": k,
+            "open": float(df["Open"].iloc[-1]),
+            "close": float(df["Close"].iloc[-1]),
+            "volatility": float(period_vol[i]),
+            "max_drawdown": float(stats["Max_Drawdown"][i]),
+            "annualized_return": float(stats["Annualized_Return"][i]),
+            "annualized_vol": float(stats["Annualized_Vol"][i]),
+            "sharpe": float(stats["Sharpe"][i]),
+        })
+
+    # Portefeuille équipondéré (rebalancement hebdomadaire)
+    prices = align_closes(frames)
+    if not prices.empty:
+        sim = simulate_portfolio(prices, {k: 1.0 for k in prices.columns}, rebalance=rebalance)
+        port_r = sim["Portfolio_Returns"].to_numpy(dtype=float)
+        port_stats = column_stats(port_r[1:], sim["Portfolio_Equity"].to_numpy(dtype=float))
+        rows.append({
+            "asset": "PORTFOLIO",
+            "open": float(sim["Portfolio_Equity"].iloc[-2]) if len(sim) > 1 else float("nan"),
+            "close": float(sim["Portfolio_Equity"].iloc[-1]),
+            "volatility": float(np.std(port_r[1:], ddof=1) * 100.0) if len(port_r) > 2 else float("nan"),
+            "max_drawdown": float(port_stats["Max_Drawdown"][0]),
+            "annualized_return": float(port_stats["Annualized_Return"][0]),
+            "annualized_vol": float(port_stats["Annualized_Vol"][0]),
+            "sharpe": float(port_stats["Sharpe"][0]),
+        })
+    return rows, failures
+
+
+def format_report(rows, failures, generated_at: datetime, period="1mo") -> str:
+    """Rapport texte lisible (même présentation que le rapport historique BTC)."""
+    lines = [f"--- RAPPORT JOURNALIER ({generated_at.strftime('%Y-%m-%d %H:%M:%S')}) ---", ""]
+    for row in rows:
+        label = "PORTEFEUILLE ÉQUIPONDÉRÉ (base 100)" if row["asset"] == "PORTFOLIO" else row["asset"]
+        prefix = "" if row["asset"] == "PORTFOLIO" else "$"
+        lines += [
+            f"{label}",
+            f"  PRIX:",
+            f"  - Open : {prefix}{row['open']:.2f}",
+            f"  - Close: {prefix}{row['close']:.2f}",
+            f"  RISQUE ({period}):",
+            f"  - Volatilité : {row['volatility']:.2f}%",
+            f"  - Max Drawdown: {row['max_drawdown']:.2f}%",
+            f"  - Sharpe (annualisé): {row['sharpe']:.2f}",
+            "",
+        ]
+    if failures:
+        lines.append("Actifs sans données : " + ", ".join(f"{k} ({v})" for k, v in failures.items()))
+    lines.append("-------------------------------------")
+    return "\n".join(lines) + "\n"
+
+
+def write_report(rows, failures, generated_at: datetime, report_dir=REPORTS_DIR, period="1mo"):
+    """
+    Ecrit le rapport texte et l'instantané JSON du jour, et ajoute ses lignes à
+    l'historique indexé (ReportHistory). Renvoie (chemin texte, chemin JSON).
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    day = generated_at.strftime("%Y-%m-%d")
+    text = format_report(rows, failures, generated_at, period=period)
+
+    txt_path = os.path.join(report_dir, f"report_{day}.txt")
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    json_path = os.path.join(report_dir, f"report_{day}.json")
+    snapshot = {
+        "date": day,
+        "generated_at": generated_at.isoformat(timespec="seconds"),
+        "period": period,
+        "rows": rows,
+        "failures": failures,
+    }
+    tmp = f"{json_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2, allow_nan=True)
+    os.replace(tmp, json_path)
+
+    get_report_history(report_dir).append({**snapshot, "text": text})
+    return txt_path, json_path
+
+
+class ReportHistory:
+    """
+    Historique des rapports journaliers dans une base SQLite (un fichier, module standard) :
+    - reports : une ligne par jour (date, generated_at, period, failures en JSON, texte du rapport)
+    - report_rows : une ligne par (date, actif), colonnes METRIC_COLUMNS
+    Index sur la date (clé primaire) et sur (actif, date) : le dernier rapport et les
+    requêtes par période ou par actif ne lisent que les lignes utiles, quel que soit
+    le nombre de rapports accumulés. Relancer le rapport d'un jour remplace ses lignes.
+    Une connexion par appel : utilisable depuis plusieurs sessions Streamlit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=10)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def init(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with closing(self._connect()) as con, con:
+            con.execute("""CREATE TABLE IF NOT EXISTS reports (
+                date TEXT PRIMARY KEY, generated_at TEXT, period TEXT, failures TEXT, text TEXT)""")
+            con.execute(f"""CREATE TABLE IF NOT EXISTS report_rows (
+                date TEXT NOT NULL, asset TEXT NOT NULL, {", ".join(f"{c} REAL" for c in METRIC_COLUMNS)},
+                PRIMARY KEY (date, asset))""")
+            con.execute("CREATE INDEX IF NOT EXISTS report_rows_asset ON report_rows (asset, date)")
+
+    def append(self, snapshot):
+        """Ajoute (ou remplace) le rapport d'un jour : dict au format de l'instantané JSON."""
+        self.init()
+        day = snapshot["date"]
+        rows = [(day, r["asset"], *(_real(r.get(c)) for c in METRIC_COLUMNS)) for r in snapshot["rows"]]
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM report_rows WHERE date = ?", (day,))
+            con.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)",
+                        (day, snapshot.get("generated_at"), snapshot.get("period"),
+                         json.dumps(snapshot.get("failures") or {}), snapshot.get("text")))
+            con.executemany(f"INSERT INTO report_rows VALUES ({', '.join('?' * (2 + len(METRIC_COLUMNS)))})", rows)
+
+    def dates(self):
+        """Dates des rapports, de la plus ancienne à la plus récente."""
+        if not self.exists():
+            return []
+        with closing(self._connect()) as con:
+            return [r[0] for r in con.execute("SELECT date FROM reports ORDER BY date")]
+
+    def latest(self, day=None):
+        """
+        Dernier rapport (ou celui de `day`, "YYYY-MM-DD") au format de l'instantané JSON
+        (date, generated_at, period, rows, failures) + text ; None s'il n'y en a pas.
+        """
+        if not self.exists():
+            return None
+        with closing(self._connect()) as con:
+            if day is None:
+                head = con.execute("SELECT * FROM reports ORDER BY date DESC LIMIT 1").fetchone()
+            else:
+                head = con.execute("SELECT * FROM reports WHERE date = ?", (day,)).fetchone()
+            if head is None:
+                return None
+            rows = con.execute("SELECT * FROM report_rows WHERE date = ? ORDER BY asset = 'PORTFOLIO', rowid",
+                               (head["date"],)).fetchall()
+        return {
+            "date": head["date"],
+            "generated_at": head["generated_at"],
+            "period": head["period"],
+            "rows": [{"asset": r["asset"], **{c: np.nan if r[c] is None else r[c] for c in METRIC_COLUMNS}}
+                     for r in rows],
+            "failures": json.loads(head["failures"] or "{}"),
+            "text": head["text"],
+        }
+
+    def query(self, start=None, end=None, assets=None) -> pd.DataFrame:
+        """
+        Lignes des rapports entre start et end inclus (dates "YYYY-MM-DD" ou datetime, bornes
+        optionnelles), pour `assets` (tous si None). Colonnes : date (datetime), asset, METRIC_COLUMNS.
+        """
+        empty = pd.DataFrame(columns=["date", "asset"] + METRIC_COLUMNS)
+        if not self.exists():
+            return empty
+        where, args = [], []
+        if start is not None:
+            where.append("date >= ?")
+            args.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            where.append("date <= ?")
+            args.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+        if assets:
+            where.append(f"asset IN ({', '.join('?' * len(assets))})")
+            args += list(assets)
+        sql = "SELECT * FROM report_rows" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY date, asset"
+        with closing(self._connect()) as con:
+            df = pd.read_sql_query(sql, con, params=args)
+        if df.empty:
+            return empty
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def import_snapshots(self, report_dir=REPORTS_DIR) -> int:
+        """Reprend les instantanés report_*.json absents de l'historique. Renvoie le nombre importé."""
+        known = set(self.dates())
+        count = 0
+        for path in sorted(glob.glob(os.path.join(report_dir, "report_*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except Exception as e:
+                print(f"[Reports] Lecture impossible {path}: {e}")
+                continue
+            if snapshot.get("date") in known:
+                continue
+            txt_path = path[:-len(".json")] + ".txt"
+            if os.path.exists(txt_path):
+                with open(txt_path, "r", encoding="utf-8") as f:
+                    snapshot["text"] = f.read()
+            self.append(snapshot)
+            count += 1
+        return count
+
+
+def _real(value):
+    return None if value is None else float(value)
+
+
+def get_report_history(report_dir=REPORTS_DIR) -> ReportHistory:
+    """
+    Historique du dossier de rapports. A la création de la base, les instantanés JSON
+    déjà présents (rapports antérieurs à l'historique) y sont importés une fois.
+    """
+    history = ReportHistory(os.path.join(report_dir, REPORTS_DB))
+    if not history.exists() and glob.glob(os.path.join(report_dir, "report_*.json")):
+        history.init()
+        history.import_snapshots(report_dir)
+    return history
+
+
+def load_latest_snapshot(report_dir=REPORTS_DIR):
+    """Dernier rapport (dict, voir ReportHistory.latest) ou None."""
+    try:
+        return get_report_history(report_dir).latest()
+    except Exception as e:
+        print(f"[Reports] Lecture de l'historique impossible : {e}")
+        return None
@@ -0,0 +1,88 @@
+# app/core/resample.py
+import numpy as np
+import pandas as pd
+
+from app.core.config import RESAMPLE_BASES
+from app.core.providers import OHLCV_COLUMNS
+from app.core.store import interval_to_timedelta, period_start
+
+# Agrégation OHLCV d'une bougie fine vers une bougie plus large
+OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def _is_fixed(interval: str) -> bool:
+    # Semaines et mois ne se découpent pas en durées fixes alignées sur l'epoch
+    return not interval.endswith(("wk", "mo"))
+
+
+def base_interval(interval: str, period: str, now=None) -> str:
+    """
+    Résolution de base à partir de laquelle servir (interval, period) :
+    la plus fine des RESAMPLE_BASES qui divise `interval` et dont l'historique
+    disponible couvre `period` ; à défaut, celle qui a le plus d'historique (la source
+    ne renverrait pas plus en natif). Renvoie `interval` lui-même s'il n'est pas
+    dérivable (semaines, mois, aucune base qui le divise).
+    """
+    if not _is_fixed(interval):
+        return interval
+    target = interval_to_timedelta(interval)
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    wanted = period_start(now, period)
+
+    fallback, fallback_oldest = interval, None
+    for base, history in sorted(RESAMPLE_BASES.items(), key=lambda kv: interval_to_timedelta(kv[0])):
+        step = interval_to_timedelta(base)
+        if step > target or target % step != pd.Timedelta(0):
+            continue
+        oldest = period_start(now, history)
+        if oldest is None or (wanted is not None and wanted >= oldest):
+            return base
+        if fallback_oldest is None or oldest < fallback_oldest:
+            fallback, fallback_oldest = base, oldest
+    return fallback
+
+
+def bucket_starts(index: pd.DatetimeIndex, interval: str) -> pd.DatetimeIndex:
+    """Début (UTC, aligné sur l'epoch : 4h -> 00h, 04h, 08h...) du bucket de chaque bougie."""
+    index = pd.DatetimeIndex(index)
+    index = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+    return index.floor(interval_to_timedelta(interval))
+
+
+def resample_ohlcv(df: pd.DataFrame, interval: str, drop_partial_first: bool = False) -> pd.DataFrame:
+    """
+    Agrège des bougies fines en bougies `interval` (Open first, High max, Low min,
+    Close last, Volume sum), horodatées au début du bucket UTC. Les buckets sans
+    bougie ne sont pas créés ; la dernière bougie peut être partielle (en cours).
+
+    drop_partial_first : supprime le premier bucket si la série commence après son début
+    (historique de base tronqué au milieu d'un bucket).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    labels = bucket_starts(df.index, interval)
+    out = df[OHLCV_COLUMNS].groupby(labels).agg(OHLCV_AGG)
+    # Une somme de volumes tous manquants vaut NaN, pas 0
+    counts = df["Volume"].groupby(labels).count()
+    out.loc[counts.to_numpy() == 0, "Volume"] = np.nan
+    out.index.name = df.index.name
+
+    if drop_partial_first and len(out) and df.index[0] > out.index[0]:
+        out = out.iloc[1:]
+    return out
+
+
+def update_resampled(derived: pd.DataFrame, base: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Mise à jour incrémentale : seules les bougies de base à partir du dernier bucket déjà
+    dérivé sont ré-agrégées (le dernier bucket, souvent partiel, est recalculé).
+    Si l'historique de base remonte plus loin que `derived` (période plus longue demandée
+    depuis, ex: 7d puis 1mo), toute la plage est ré-agrégée.
+    Renvoie les buckets recalculés ou nouveaux (à fusionner avec `derived`).
+    """
+    if derived is None or derived.empty:
+        return resample_ohlcv(base, interval, drop_partial_first=True)
+    older = base[base.index < derived.index[0]]
+    if not resample_ohlcv(older, interval, drop_partial_first=True).empty:
+        return resample_ohlcv(base, interval, drop_partial_first=True)
+    return resample_ohlcv(base[base.index >= derived.index[-1]], interval)
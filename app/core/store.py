@@ -0,0 +1,204 @@
+# app/core/store.py
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from app.core.config import STORE_DIR, STORE_MAX_SEGMENTS
+
+_INTERVAL_UNITS = {
+    "m": "min",
+    "h": "h",
+    "d": "D",
+    "wk": "W",
+}
+
+
+def interval_to_timedelta(interval: str) -> pd.Timedelta:
+    """
+    Convertit un intervalle Yahoo ('5m', '1h', '4h', '1d', '1wk', '1mo') en durée.
+    Les intervalles mensuels sont approximés à 30 jours.
+    """
+    match = re.fullmatch(r"(\d+)(m|h|d|wk|mo)", interval)
+    if not match:
+        raise ValueError(f"Intervalle non supporté : {interval}")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == "mo":
+        return pd.Timedelta(days=30 * n)
+    return pd.Timedelta(n, unit=_INTERVAL_UNITS[unit])
+
+
+def period_start(end: pd.Timestamp, period: str):
+    """
+    Début de la fenêtre `period` (ex: '7d', '1mo', '1y', 'ytd') qui se termine à `end`.
+    Renvoie None pour 'max' (tout l'historique).
+    """
+    if period == "max":
+        return None
+    if period == "ytd":
+        return end.normalize().replace(month=1, day=1)
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Période non supportée : {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        return end - pd.Timedelta(days=n)
+    if unit == "wk":
+        return end - pd.Timedelta(weeks=n)
+    if unit == "mo":
+        return end - pd.DateOffset(months=n)
+    return end - pd.DateOffset(years=n)
+
+
+class OHLCVStore:
+    """
+    Stockage local des bougies OHLCV, un fichier Parquet par (ticker, intervalle).
+
+    Les ajouts incrémentaux sont écrits dans des segments à part (<clé>.<n>.seg.parquet) :
+    un refresh n'écrit que ses nouvelles bougies au lieu de réécrire tout l'historique.
+    Au-delà de max_segments, les segments sont fusionnés dans le fichier principal.
+    A la lecture, une bougie présente dans plusieurs fichiers prend la valeur la plus récente.
+
+    A côté de chaque fichier, un petit JSON garde :
+    - covered_since : début de l'historique demandé à la source (pour savoir s'il faut compléter)
+    - fetched_at : date (epoch) de la dernière synchro avec la source
+    - last : horodatage de la dernière bougie stockée (sans relire le Parquet)
+    Les écritures passent par un fichier temporaire + os.replace (atomique).
+    """
+
+    def __init__(self, root: str = STORE_DIR, max_segments: int = STORE_MAX_SEGMENTS):
+        self.root = root
+        self.max_segments = max_segments
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _key(self, ticker, interval):
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", ticker)
+        return f"{safe}_{interval}"
+
+    def _paths(self, ticker, interval):
+        key = self._key(ticker, interval)
+        return os.path.join(self.root, f"{key}.parquet"), os.path.join(self.root, f"{key}.json")
+
+    def _segments(self, ticker, interval) -> list:
+        """Segments d'ajout, du plus ancien au plus récent."""
+        prefix = f"{self._key(ticker, interval)}."
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(os.path.join(self.root, n) for n in names
+                      if n.startswith(prefix) and n.endswith(".seg.parquet"))
+
+    def lock(self, ticker, interval) -> threading.Lock:
+        """Verrou par (ticker, intervalle) pour sérialiser les synchros entre sessions."""
+        key = self._key(ticker, interval)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def load(self, ticker, interval) -> pd.DataFrame:
+        """Toutes les bougies stockées (DataFrame vide si rien)."""
+        path, _ = self._paths(ticker, interval)
+        for _ in range(3):
+            files = ([path] if os.path.exists(path) else []) + self._segments(ticker, interval)
+            if not files:
+                return pd.DataFrame()
+            try:
+                frames = [pd.read_parquet(f) for f in files]
+            except FileNotFoundError:
+                # Segments fusionnés entre-temps (autre processus) : on relit
+                continue
+            except Exception as e:
+                print(f"[Store] Lecture impossible {path}: {e}")
+                return pd.DataFrame()
+            if len(frames) == 1:
+                return frames[0]
+            merged = pd.concat(frames)
+            return merged[~merged.index.duplicated(keep="last")].sort_index()
+        return pd.DataFrame()
+
+    def meta(self, ticker, interval) -> dict:
+        _, meta_path = self._paths(ticker, interval)
+        if not os.path.exists(meta_path):
+            return {}
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def last_timestamp(self, ticker, interval, meta=None):
+        """Dernière bougie stockée, lue dans la méta (le Parquet n'est relu que pour un ancien stockage)."""
+        meta = self.meta(ticker, interval) if meta is None else meta
+        if meta.get("last"):
+            return pd.Timestamp(meta["last"])
+        df = self.load(ticker, interval)
+        return None if df.empty else df.index[-1]
+
+    def _write(self, df, path):
+        tmp = f"{path}.tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, path)
+
+    def append(self, ticker, interval, new: pd.DataFrame, covered_since=None):
+        """
+        Ajoute de nouvelles bougies (les nouvelles valeurs gagnent en cas de doublon,
+        ex: dernière bougie encore en cours) sans relire l'existant : elles sont écrites
+        dans un segment, fusionné plus tard avec le fichier principal (compact).
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path, meta_path = self._paths(ticker, interval)
+        meta = self.meta(ticker, interval)
+
+        if new is not None and not new.empty:
+            if not os.path.exists(path):
+                self._write(new, path)
+            else:
+                name = f"{self._key(ticker, interval)}.{time.time_ns():020d}.seg.parquet"
+                self._write(new, os.path.join(self.root, name))
+            last = new.index.max()
+            if not meta.get("last") or last > pd.Timestamp(meta["last"]):
+                meta["last"] = last.isoformat()
+
+        if covered_since is not None:
+            previous = meta.get("covered_since")
+            since = pd.Timestamp(covered_since)
+            if previous is None or since < pd.Timestamp(previous):
+                meta["covered_since"] = since.isoformat()
+        meta["fetched_at"] = time.time()
+
+        tmp = f"{meta_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+        if len(self._segments(ticker, interval)) > self.max_segments:
+            self.compact(ticker, interval)
+
+    def compact(self, ticker, interval):
+        """Fusionne les segments dans le fichier principal (une réécriture pour max_segments ajouts)."""
+        segments = self._segments(ticker, interval)
+        if not segments:
+            return
+        path, _ = self._paths(ticker, interval)
+        self._write(self.load(ticker, interval), path)
+        for seg in segments:
+            try:
+                os.remove(seg)
+            except FileNotFoundError:
+                pass
+
+    def read(self, ticker, interval, period) -> pd.DataFrame:
+        """Tranche `period` des bougies stockées, mesurée depuis la dernière bougie."""
+        df = self.load(ticker, interval)
+        if df.empty:
+            return df
+        start = period_start(df.index[-1], period)
+        if start is None:
+            return df
+        return df[df.index > start]
@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
+from collections import deque
 
+from app.core.costs import COST_COLUMNS, as_cost_model
+from app.core.instrumentation import instrumented
+from app.core.metrics import column_stats
+
+@instrumented()
 def calculate_buy_and_hold(df):
     """
     Stratégie simple : On achète au début et on ne touche plus.
@@ -20,17 +26,21 @@ def calculate_buy_and_hold(df):
     
     return df
 
-def calculate_ma_crossover(df, short_window=20, long_window=50):
+@instrumented()
+def calculate_ma_crossover(df, short_window=20, long_window=50, costs=None):
     """
     Stratégie Croisement Moyennes Mobiles.
     Achat (1) quand Courte > Longue.
     Cash (0) quand Courte < Longue.
+    costs : None, un taux proportionnel ou un CostModel (app.core.costs), appliqué aux
+    changements de signal ; ajoute les colonnes Turnover, Fees, Fixed, Slippage, Costs.
     """
     df = df.copy()
     
-    # 1. Calcul des indicateurs
-    df['SMA_Short'] = df['Close'].rolling(window=short_window).mean()
-    df['SMA_Long'] = df['Close'].rolling(window=long_window).mean()
+    # 1. Calcul des indicateurs (sommes cumulées, voir rolling_means)
+    means = rolling_means(df['Close'], [short_window, long_window])
+    df['SMA_Short'] = means[int(short_window)]
+    df['SMA_Long'] = means[int(long_window)]
     
     # 2. Génération du Signal (0 ou 1)
     df['Signal'] = 0.0
@@ -45,8 +55,380 @@ def calculate_ma_crossover(df, short_window=20, long_window=50):
     # Sinon on triche (Look-ahead bias).
     df['Strategy_Returns'] = df['Signal'].shift(1) * df['Returns']
     df['Strategy_Returns'] = df['Strategy_Returns'].fillna(0)
+
+    # Coûts de transaction sur les changements de position (voir _apply_costs)
+    model = as_cost_model(costs)
+    if model is not None:
+        _apply_costs(df, model)
     
     # Courbe de performance (Base 100)
     df['Strategy_Equity'] = 100 * (1 + df['Strategy_Returns']).cumprod()
     
-    return df
\ No newline at end of file
+    return df
+
+def _apply_costs(df, model):
+    """
+    Prélève les coûts du CostModel sur Strategy_Returns, à la bougie où le signal change
+    (turnover = |Signal_t - Signal_t-1|, entrée depuis le cash à la première bougie).
+    Valeur du portefeuille au moment de l'ordre : equity brute (avant coûts).
+    """
+    signal = df['Signal'].to_numpy(dtype=float)
+    turnover = np.abs(np.diff(signal, prepend=0.0))
+    value = model.capital * np.cumprod(1 + df['Strategy_Returns'].to_numpy(dtype=float))
+    volume = df['Volume'].to_numpy(dtype=float)[:, None] if 'Volume' in df else None
+    parts = model.costs(turnover[:, None], value, price=df['Close'].to_numpy(dtype=float)[:, None], volume=volume)
+
+    df['Turnover'] = turnover
+    for name in COST_COLUMNS:
+        df[name] = parts[name][:, 0]
+    df['Costs'] = df[COST_COLUMNS].sum(axis=1)
+    df['Strategy_Returns'] = df['Strategy_Returns'] - df['Costs']
+
+
+def _close_array(data):
+    """Clôtures en float64 : DataFrame ('Close'), PriceArrays (vue .close) ou tableau."""
+    if isinstance(data, pd.DataFrame):
+        return data['Close'].to_numpy(dtype=float)
+    return np.asarray(getattr(data, 'close', data), dtype=float)
+
+
+def buy_and_hold_equity(data, base=100.0):
+    """
+    Equity de calculate_buy_and_hold sans copier le DataFrame ni ajouter de colonnes.
+    Accepte un DataFrame, un PriceArrays (float32) ou un tableau de clôtures.
+    """
+    close = _close_array(data)
+    r = np.zeros(len(close))
+    r[1:] = close[1:] / close[:-1] - 1
+    return base * np.cumprod(1 + np.nan_to_num(r, nan=0.0))
+
+
+def ma_crossover_equity(data, short_window=20, long_window=50, base=100.0):
+    """
+    Equity de calculate_ma_crossover sans copier le DataFrame ni ajouter de colonnes.
+    Accepte un DataFrame, un PriceArrays (float32) ou un tableau de clôtures.
+    """
+    close = _close_array(data)
+    means = rolling_means(close, [short_window, long_window])
+    signal = (means[int(short_window)] > means[int(long_window)]).astype(float)
+    r = np.zeros(len(close))
+    r[1:] = signal[:-1] * (close[1:] / close[:-1] - 1)
+    return base * np.cumprod(1 + np.nan_to_num(r, nan=0.0))
+
+
+def rolling_means(close, windows):
+    """
+    Moyennes mobiles simples pour plusieurs fenêtres, calculées une seule fois
+    à partir d'une somme cumulée (O(T) par fenêtre).
+    Renvoie un dict {fenêtre: np.ndarray}, NaN tant que la fenêtre n'est pas remplie
+    ou si elle contient un prix manquant (comme .rolling(window).mean()).
+    close peut être une matrice (T x actifs) : chaque colonne est traitée séparément,
+    en un seul passage, et les moyennes ont la même forme que close.
+    """
+    x = np.asarray(close, dtype=float)
+    shape = x.shape
+    x = x.reshape(len(x), -1)
+    finite = np.isfinite(x)
+    # On centre les prix pour limiter l'erreur d'arrondi de la somme cumulée
+    # (première valeur finie de chaque colonne)
+    first = np.argmax(finite, axis=0)
+    offset = np.where(finite.any(axis=0), x[first, np.arange(x.shape[1])], 0.0)
+    zero = np.zeros((1, x.shape[1]))
+    cs = np.concatenate([zero, np.cumsum(np.where(finite, x - offset, 0.0), axis=0)])
+    missing = np.concatenate([zero.astype(int), np.cumsum(~finite, axis=0)])
+
+    means = {}
+    for w in sorted(set(int(w) for w in windows)):
+        sma = np.full(x.shape, np.nan)
+        if 0 < w <= len(x):
+            sma[w - 1:] = (cs[w:] - cs[:-w]) / w + offset
+            sma[w - 1:][(missing[w:] - missing[:-w]) > 0] = np.nan
+        means[w] = sma.reshape(shape)
+    return means
+
+
+@instrumented()
+def ma_crossover_grid(df, short_windows=range(5, 51), long_windows=range(10, 201),
+                      periods_per_year=252, max_cells=5_000_000):
+    """
+    Balayage de paramètres du croisement de moyennes mobiles
+    (df : DataFrame, PriceArrays ou tableau de clôtures).
+    Evalue toutes les paires (courte < longue) en un passage vectorisé :
+    chaque moyenne mobile est calculée une seule fois et partagée entre les paires.
+
+    Renvoie un DataFrame (une ligne par paire) :
+    Short, Long, Final_Equity (base 100), Sharpe, Max_Drawdown (%).
+    Les paires sont traitées par blocs pour que T x bloc reste sous max_cells.
+    """
+    columns = ['Short', 'Long', 'Final_Equity', 'Sharpe', 'Max_Drawdown']
+    pairs = [(s, l) for s in short_windows for l in long_windows if s < l]
+    close = _close_array(df)
+    T = len(close)
+    if not pairs or T == 0:
+        return pd.DataFrame(columns=columns)
+
+    means = rolling_means(close, [s for s, _ in pairs] + [l for _, l in pairs])
+    windows = sorted(means)
+    position = {w: i for i, w in enumerate(windows)}
+    sma = np.column_stack([means[w] for w in windows])
+
+    returns = np.zeros(T)
+    returns[1:] = close[1:] / close[:-1] - 1.0
+    returns = np.nan_to_num(returns, nan=0.0)
+
+    short_idx = np.array([position[s] for s, _ in pairs])
+    long_idx = np.array([position[l] for _, l in pairs])
+
+    n = len(pairs)
+    final_equity = np.empty(n)
+    sharpe = np.empty(n)
+    mdd = np.empty(n)
+    chunk = max(1, max_cells // T)
+
+    for lo in range(0, n, chunk):
+        hi = min(lo + chunk, n)
+        # Signal de la veille (shift 1) pour éviter le look-ahead bias
+        signal = sma[:, short_idx[lo:hi]] > sma[:, long_idx[lo:hi]]
+        strat_r = np.zeros((T, hi - lo))
+        strat_r[1:] = signal[:-1] * returns[1:, None]
+
+        equity = 100 * np.cumprod(1 + strat_r, axis=0)
+        final_equity[lo:hi] = equity[-1]
+
+        stats = column_stats(strat_r, equity, periods_per_year=periods_per_year)
+        sharpe[lo:hi] = stats['Sharpe']
+        mdd[lo:hi] = stats['Max_Drawdown']
+
+    pairs = np.array(pairs)
+    return pd.DataFrame({
+        'Short': pairs[:, 0],
+        'Long': pairs[:, 1],
+        'Final_Equity': final_equity,
+        'Sharpe': sharpe,
+        'Max_Drawdown': mdd,
+    })
+
+
+class BuyAndHoldStream:
+    """
+    Version incrémentale de calculate_buy_and_hold.
+    update() ne traite que les nouvelles bougies (O(nouvelles bougies)) et renvoie
+    exactement les mêmes valeurs que la fonction appliquée à tout l'historique.
+    Une bougie déjà vue (même horodatage que la dernière) est recalculée : c'est
+    le cas de la dernière bougie encore en cours renvoyée par la source.
+
+    Le DataFrame passé à update() est la fenêtre affichée (`period`) : les bougies plus
+    anciennes que son début sont oubliées. Tant que ce début ne bouge pas (historique qui
+    s'allonge), frame() est identique au bit près à la fonction batch sur la fenêtre.
+    Quand la fenêtre glisse, frame() rebase l'equity à 100 sur sa première bougie : les
+    valeurs sont celles de la fonction batch sur la fenêtre à l'arrondi près (écart
+    relatif < 1e-9), car le résultat exact dépend du point de départ du produit cumulé
+    et le recalculer rendrait chaque refresh O(fenêtre).
+    """
+
+    def __init__(self):
+        self.last_timestamp = None
+        self._origin = None
+        self._state = self._initial_state()
+        self._before_last = None
+        self._chunks = []
+
+    def _initial_state(self):
+        return {'n': 0, 'prev_close': np.nan, 'growth': 1.0}
+
+    def _copy_state(self, state):
+        return dict(state)
+
+    def _returns(self, state, close):
+        # Même formule que pct_change : close / close.shift(1) - 1
+        prev = np.concatenate([[state['prev_close']], close[:-1]])
+        r = close / prev - 1
+        if state['n'] == 0:
+            r[0] = np.nan
+        return r
+
+    def _equity(self, state, strat_r):
+        # Produit cumulé séquentiel, repris là où l'état s'était arrêté
+        growth = np.cumprod(np.concatenate([[state['growth']], 1 + strat_r]))[1:]
+        state['growth'] = growth[-1]
+        return 100 * growth
+
+    def _process(self, state, close):
+        """Calcule les colonnes de la stratégie pour un bloc de prix et met l'état à jour."""
+        r = np.nan_to_num(self._returns(state, close), nan=0.0)
+        equity = self._equity(state, r)
+        state['n'] += len(close)
+        state['prev_close'] = close[-1]
+        return {'Returns': r, 'Strategy_Equity': equity}
+
+    def update(self, df):
+        """
+        Ajoute les nouvelles bougies (DataFrame avec au moins 'Close', index trié).
+        Renvoie les lignes calculées pour ces bougies (colonnes d'origine + colonnes de la stratégie).
+        """
+        if df.empty:
+            return df
+        start = df.index[0]
+        if self.last_timestamp is not None:
+            df = df.iloc[df.index.searchsorted(self.last_timestamp):]
+        if df.empty:
+            self._trim(start)
+            return df
+
+        if self.last_timestamp is not None and df.index[0] == self.last_timestamp:
+            # La dernière bougie a pu changer : on repart de l'état d'avant
+            self._state = self._copy_state(self._before_last)
+            self._drop_last_row()
+
+        if self._origin is None:
+            self._origin = df.index[0]
+        close = df['Close'].to_numpy(dtype=float)
+        head = self._process(self._state, close[:-1]) if len(close) > 1 else {}
+        self._before_last = self._copy_state(self._state)
+        tail = self._process(self._state, close[-1:])
+
+        out = df.copy()
+        for col, values in tail.items():
+            out[col] = np.concatenate([head[col], values]) if head else values
+        self.last_timestamp = df.index[-1]
+        self._chunks.append(out)
+        self._trim(start)
+        return out
+
+    def _trim(self, start):
+        """Oublie les bougies antérieures au début de la fenêtre (mémoire bornée par `period`)."""
+        while self._chunks and self._chunks[0].index[-1] < start:
+            self._chunks.pop(0)
+        if self._chunks and self._chunks[0].index[0] < start:
+            self._chunks[0] = self._chunks[0].iloc[self._chunks[0].index.searchsorted(start):]
+
+    def _drop_last_row(self):
+        last = self._chunks[-1]
+        if len(last) > 1:
+            self._chunks[-1] = last.iloc[:-1]
+        else:
+            self._chunks.pop()
+
+    def frame(self):
+        """Fenêtre calculée (équivalent du DataFrame renvoyé par la fonction batch sur cette fenêtre)."""
+        if not self._chunks:
+            return pd.DataFrame()
+        if len(self._chunks) > 1:
+            self._chunks = [pd.concat(self._chunks)]
+        out = self._chunks[0].copy()
+        # Début de fenêtre déplacé : rebasage (sinon valeurs déjà exactes)
+        return self._rebase(out) if out.index[0] != self._origin else out
+
+    def _rebase(self, out):
+        # Première bougie de la fenêtre : rendement nul, equity de départ à 100
+        out.iloc[0, out.columns.get_loc('Returns')] = 0.0
+        equity = out['Strategy_Equity'].to_numpy()
+        out['Strategy_Equity'] = 100 * equity / equity[0]
+        return out
+
+
+class MACrossoverStream(BuyAndHoldStream):
+    """
+    Version incrémentale de calculate_ma_crossover.
+    Les moyennes mobiles sont tenues à jour avec un tampon circulaire des dernières
+    sommes cumulées, avec les mêmes opérations que rolling_means : les résultats sont
+    identiques au bit près à la fonction batch appliquée au même historique.
+
+    Sur une fenêtre glissante, la fonction batch n'a pas de moyennes sur les premières
+    bougies (chauffe) : frame() recalcule ces max(courte, longue) premières lignes avec
+    les mêmes opérations que calculate_ma_crossover et enchaîne l'equity du flux à leur suite.
+    Les moyennes suivantes gardent les sommes cumulées du début du flux : comme l'equity,
+    elles ne sont alors exactes qu'à l'arrondi près (écart relatif < 1e-9).
+    """
+
+    def __init__(self, short_window=20, long_window=50):
+        self.short_window = int(short_window)
+        self.long_window = int(long_window)
+        super().__init__()
+
+    def _initial_state(self):
+        size = max(self.short_window, self.long_window) + 1
+        state = super()._initial_state()
+        state.update({
+            'offset': None,
+            'prev_signal': np.nan,
+            'cs': deque([0.0], maxlen=size),
+            'missing': deque([0], maxlen=size),
+        })
+        return state
+
+    def _copy_state(self, state):
+        copied = dict(state)
+        copied['cs'] = deque(state['cs'], maxlen=state['cs'].maxlen)
+        copied['missing'] = deque(state['missing'], maxlen=state['missing'].maxlen)
+        return copied
+
+    def _rebase(self, out):
+        # Lignes de chauffe recalculées comme calculate_ma_crossover sur la fenêtre
+        h = min(len(out), max(self.short_window, self.long_window))
+        close = out['Close'].to_numpy(dtype=float)[:h]
+        means = rolling_means(close, [self.short_window, self.long_window])
+        sma_short, sma_long = means[self.short_window], means[self.long_window]
+        signal = np.where(sma_short > sma_long, 1.0, 0.0)
+        r = np.concatenate([[np.nan], close[1:] / close[:-1] - 1])
+        strat_r = np.nan_to_num(np.concatenate([[np.nan], signal[:-1]]) * r, nan=0.0)
+        head_equity = 100 * np.cumprod(1 + strat_r)
+
+        equity = out['Strategy_Equity'].to_numpy()
+        head = {'SMA_Short': sma_short, 'SMA_Long': sma_long, 'Signal': signal, 'Returns': r,
+                'Strategy_Returns': strat_r,
+                'Strategy_Equity': np.concatenate([head_equity, equity[h:] / equity[h - 1] * head_equity[-1]])}
+        for col, values in head.items():
+            full = out[col].to_numpy(copy=True)
+            full[:len(values)] = values
+            out[col] = full
+        return out
+
+    def _process(self, state, close):
+        finite = np.isfinite(close)
+        if state['offset'] is None and finite.any():
+            state['offset'] = float(close[finite][0])
+        offset = state['offset'] if state['offset'] is not None else 0.0
+
+        # Sommes cumulées prolongées depuis le tampon (même ordre d'addition que np.cumsum)
+        past = len(state['cs'])
+        x = np.where(finite, close - offset, 0.0)
+        cs = np.concatenate([np.asarray(state['cs']), np.cumsum(np.concatenate([[state['cs'][-1]], x]))[1:]])
+        missing = np.concatenate([np.asarray(state['missing']),
+                                  state['missing'][-1] + np.cumsum(~finite)])
+
+        k = len(close)
+        pos = past + np.arange(k)
+        count = state['n'] + np.arange(1, k + 1)
+        means = {}
+        for w in (self.short_window, self.long_window):
+            sma = np.full(k, np.nan)
+            ok = count >= w if w > 0 else np.zeros(k, dtype=bool)
+            lo = pos[ok] - w
+            sma[ok] = (cs[pos[ok]] - cs[lo]) / w + offset
+            sma[ok] = np.where(missing[pos[ok]] - missing[lo] > 0, np.nan, sma[ok])
+            means[w] = sma
+
+        sma_short, sma_long = means[self.short_window], means[self.long_window]
+        signal = np.where(sma_short > sma_long, 1.0, 0.0)
+
+        r = self._returns(state, close)
+        # Signal de la veille (shift 1) pour éviter le look-ahead bias
+        prev_signal = np.concatenate([[state['prev_signal']], signal[:-1]])
+        strat_r = np.nan_to_num(prev_signal * r, nan=0.0)
+        equity = self._equity(state, strat_r)
+
+        state['n'] += k
+        state['prev_close'] = close[-1]
+        state['prev_signal'] = signal[-1]
+        state['cs'].extend(cs[past:])
+        state['missing'].extend(missing[past:])
+
+        return {
+            'SMA_Short': sma_short,
+            'SMA_Long': sma_long,
+            'Signal': signal,
+            'Returns': r,
+            'Strategy_Returns': strat_r,
+            'Strategy_Equity': equity,
+        }
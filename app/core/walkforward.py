@@ -0,0 +1,201 @@
+# app/core/walkforward.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app.core.instrumentation import instrumented
+from app.core.metrics import column_stats
+from app.core.strategies import _close_array, rolling_means
+
+# Données partagées par les processus du pool (chargées une fois par processus, voir _init_worker)
+_WORKER_DATA = None
+
+CRITERIA = ("Sharpe", "Final_Equity")
+
+
+def _init_worker(data):
+    global _WORKER_DATA
+    _WORKER_DATA = data
+
+
+def make_folds(n_bars, train_bars=None, test_bars=None, n_folds=6, anchored=False):
+    """
+    Découpage walk-forward en fenêtres (train, test) successives, les tests se suivant
+    sans chevauchement. Par défaut : test = n_bars // (n_folds + 3), train = 3 x test.
+    anchored=True : chaque train démarre au début de l'historique (fenêtre croissante).
+
+    Returns:
+        liste de tuples (train_start, train_end, test_start, test_end), bornes de fin exclues
+    """
+    if test_bars is None:
+        test_bars = n_bars // (n_folds + 3)
+    if train_bars is None:
+        train_bars = 3 * test_bars
+    if test_bars < 2 or train_bars < 2:
+        raise ValueError("Not enough history for walk-forward folds.")
+
+    folds = []
+    test_start = train_bars
+    while test_start + test_bars <= n_bars:
+        train_start = 0 if anchored else test_start - train_bars
+        folds.append((train_start, test_start, test_start, test_start + test_bars))
+        test_start += test_bars
+    if not folds:
+        raise ValueError("Not enough history for walk-forward folds.")
+    return folds
+
+
+def _segment_sums(short_windows, long_windows):
+    """
+    Pour chaque paire (courte < longue) du bloc : sommes par segment (entre deux bornes
+    de fold) de s_{t-1} * r_t, s_{t-1} * r_t^2 et s_{t-1} * log(1 + r_t), s_{t-1} étant
+    le signal de la veille. Les rendements sont décalés d'un cran (q_next[u] = q[u + 1])
+    plutôt que le signal, ce qui évite une copie de la matrice des signaux.
+    Chaque moyenne mobile est calculée une seule fois pour le bloc, puis réutilisée
+    par toutes les paires et tous les folds.
+
+    Returns:
+        (pairs (n, 2), sums (3, n_segments, n))
+    """
+    close, q_next, bounds = _WORKER_DATA["close"], _WORKER_DATA["q_next"], _WORKER_DATA["bounds"]
+    # Segment [a, b) des rendements <=> signaux [a - 1, b - 1)
+    lo_hi = list(zip(np.maximum(bounds[:-1] - 1, 0), bounds[1:] - 1))
+    means = rolling_means(close, list(short_windows) + list(long_windows))
+    longs = np.column_stack([means[l] for l in long_windows])
+
+    pairs, sums = [], []
+    for s in short_windows:
+        keep = np.array([l > s for l in long_windows])
+        if not keep.any():
+            continue
+        signal = (means[s][:, None] > longs[:, keep]).astype(float)
+        # Une petite multiplication matricielle par segment : (3, len) @ (len, n)
+        block = np.stack([q_next[a:b].T @ signal[a:b] for a, b in lo_hi], axis=1)
+        pairs += [(s, l) for l, k in zip(long_windows, keep) if k]
+        sums.append(block)
+    if not pairs:
+        return np.empty((0, 2), dtype=int), np.empty((3, len(bounds) - 1, 0))
+    return np.array(pairs), np.concatenate(sums, axis=2)
+
+
+def _train_scores(sums, n, criterion, periods_per_year):
+    """Critère d'optimisation sur le train, à partir des sommes (mêmes formules que column_stats)."""
+    s1, s2, slog = sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if criterion == "Final_Equity":
+            return 100.0 * np.exp(slog)
+        mean = s1 / n
+        std = np.sqrt(np.maximum(s2 - s1 * s1 / n, 0.0) / (n - 1))
+        return np.where(std > 0, mean / std * np.sqrt(periods_per_year), np.nan)
+
+
+@instrumented()
+def walk_forward_ma(
+    df,
+    short_windows=range(5, 51),
+    long_windows=range(10, 201),
+    train_bars=None,
+    test_bars=None,
+    n_folds=6,
+    anchored=False,
+    criterion="Sharpe",
+    periods_per_year=252,
+    max_cells=5_000_000,
+    n_jobs=1,
+) -> dict:
+    """
+    Optimisation walk-forward du croisement de moyennes mobiles.
+
+    Pour chaque fold, la meilleure paire (courte, longue) est choisie sur la fenêtre de
+    train (criterion : "Sharpe" ou "Final_Equity"), puis appliquée telle quelle sur la
+    fenêtre de test suivante ; les rendements des tests sont chaînés en une seule courbe
+    hors échantillon. Les moyennes mobiles sont calculées sur tout l'historique (elles
+    n'utilisent que le passé), donc sans période de chauffe perdue au début d'un fold.
+
+    Les scores de toutes les paires sur tous les folds sont obtenus en un passage :
+    sommes par segment entre bornes de fold, puis cumul par fold. Le balayage est
+    découpé en blocs de fenêtres longues (T x bloc <= max_cells) ; avec n_jobs > 1,
+    les blocs sont répartis sur un pool de processus lancés en "spawn" (démarrage plus
+    lent qu'un fork, mais sûr depuis un processus qui a des threads).
+
+    Returns:
+        dict avec folds (DataFrame : bornes, Short, Long, score train, Test_Return, Test_Sharpe),
+        returns / equity (Series hors échantillon, base 100) et stats (column_stats hors échantillon)
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Unknown criterion: {criterion}")
+
+    close = _close_array(df)
+    index = df.index if isinstance(df, pd.DataFrame) else None
+    if index is None and hasattr(df, "datetime_index"):
+        index = df.datetime_index()
+    T = len(close)
+    folds = make_folds(T, train_bars, test_bars, n_folds, anchored)
+
+    r = np.zeros(T)
+    r[1:] = close[1:] / close[:-1] - 1.0
+    r = np.nan_to_num(r, nan=0.0)
+    q_next = np.zeros((T, 3))
+    q_next[:-1] = np.column_stack([r, r * r, np.log1p(r)])[1:]
+
+    bounds = np.unique([b for fold in folds for b in fold])
+    data = {"close": close, "q_next": q_next, "bounds": bounds}
+
+    longs = [l for l in sorted(set(int(l) for l in long_windows)) if l <= T]
+    shorts = sorted(set(int(s) for s in short_windows))
+    chunk = max(1, max_cells // max(T, 1))
+    tasks = [(shorts, longs[lo:lo + chunk]) for lo in range(0, len(longs), chunk)]
+    if not tasks:
+        raise ValueError("No valid (short, long) pair for this history.")
+
+    if n_jobs and n_jobs > 1 and len(tasks) > 1:
+        workers = min(n_jobs, len(tasks), os.cpu_count() or 1)
+        # spawn : pas de fork d'un processus multi-thread (serveur Streamlit)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(data,)) as pool:
+            results = list(pool.map(_segment_sums, *zip(*tasks)))
+    else:
+        _init_worker(data)
+        results = [_segment_sums(*task) for task in tasks]
+
+    pairs = np.concatenate([p for p, _ in results])
+    if not len(pairs):
+        raise ValueError("No valid (short, long) pair for this history.")
+    seg = np.concatenate([s for _, s in results], axis=2)
+    cum = np.concatenate([np.zeros((3, 1, seg.shape[2])), np.cumsum(seg, axis=1)], axis=1)
+    position = {b: i for i, b in enumerate(bounds)}
+
+    rows, oos = [], []
+    for i, (tr_a, tr_b, te_a, te_b) in enumerate(folds):
+        train = cum[:, position[tr_b]] - cum[:, position[tr_a]]
+        scores = _train_scores(train, tr_b - tr_a, criterion, periods_per_year)
+        best = int(np.argmax(np.where(np.isnan(scores), -np.inf, scores)))
+        s, l = (int(w) for w in pairs[best])
+
+        means = rolling_means(close[:te_b], [s, l])
+        signal = means[s] > means[l]
+        test_r = signal[te_a - 1:te_b - 1] * r[te_a:te_b]
+        test_stats = column_stats(test_r, periods_per_year=periods_per_year)
+        oos.append(test_r)
+        rows.append({
+            "Fold": i + 1,
+            "Train_Start": index[tr_a] if index is not None else tr_a,
+            "Train_End": index[tr_b - 1] if index is not None else tr_b - 1,
+            "Test_Start": index[te_a] if index is not None else te_a,
+            "Test_End": index[te_b - 1] if index is not None else te_b - 1,
+            "Short": s,
+            "Long": l,
+            f"Train_{criterion}": float(scores[best]),
+            "Test_Return": (np.prod(1.0 + test_r) - 1.0) * 100.0,
+            "Test_Sharpe": float(test_stats["Sharpe"][0]),
+        })
+
+    oos_r = np.concatenate(oos)
+    oos_index = index[folds[0][2]:folds[-1][3]] if index is not None else None
+    returns = pd.Series(oos_r, index=oos_index, name="OOS_Returns")
+    equity = pd.Series(100.0 * np.cumprod(1.0 + oos_r), index=oos_index, name="OOS_Equity")
+    stats = {k: float(v[0]) for k, v in column_stats(oos_r, equity.to_numpy(), periods_per_year=periods_per_year).items()}
+    return {"folds": pd.DataFrame(rows), "returns": returns, "equity": equity, "stats": stats}
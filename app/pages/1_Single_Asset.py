@@ -6,10 +6,16 @@ import plotly.graph_objects as go
 # Fix des chemins
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from app.core.data import get_historical_data
+from app.core.cache import cached_compute
+from app.core.costs import CostModel
+from app.core.data import get_historical_data, get_price_arrays, refresh_prices
 from app.core.config import ASSETS
-from app.core.strategies import calculate_buy_and_hold, calculate_ma_crossover
+from app.core.backtest import backtest, get_strategy, list_strategies
+from app.core.strategies import ma_crossover_grid
 from app.core.predictions import predict_linear_regression
+from app.core.walkforward import walk_forward_ma
+from app.core.downsampling import downsample_line
+from app.core.instrumentation import plotly_chart
 st.set_page_config(page_title="Single Asset Strat", layout="wide")
 st.title("🧠 Analyse Stratégique (Quant A)")
 
@@ -20,15 +26,28 @@ period = st.sidebar.selectbox("Période", ["7d", "1mo", "3mo", "1y"], index=1)
 interval = st.sidebar.selectbox("Intervalle", ["15m", "1h", "1d"], index=1)
 
 st.sidebar.header("2. Stratégie")
-strat_name = st.sidebar.selectbox("Type", ["Buy & Hold", "MA Crossover"])
+# Stratégies du registre (app.core.backtest) : les champs viennent des paramètres déclarés
+strategy_labels = dict(list_strategies())
+strat_key = st.sidebar.selectbox("Type", list(strategy_labels), format_func=strategy_labels.get)
+strategy = get_strategy(strat_key)
+strat_name = strategy.label
 
-params = {}
-if strat_name == "MA Crossover":
-    params['short'] = st.sidebar.number_input("Moyenne Courte", 5, 50, 20)
-    params['long'] = st.sidebar.number_input("Moyenne Longue", 10, 200, 50)
+params = {
+    k: st.sidebar.number_input(spec["label"], spec["min"], spec["max"], spec["default"])
+    for k, spec in strategy.params.items()
+}
+
+st.sidebar.header("3. Coûts de transaction")
+cost_model = CostModel(
+    fee_bps=st.sidebar.number_input("Frais (bps)", 0.0, 100.0, 0.0, step=1.0),
+    fixed_cost=st.sidebar.number_input("Coût fixe par ordre ($)", 0.0, 100.0, 0.0, step=0.5),
+    impact_coef=st.sidebar.number_input("Slippage (coef. racine carrée du volume)", 0.0, 1.0, 0.0, step=0.01),
+    capital=st.sidebar.number_input("Capital ($)", 100.0, 1e9, 10_000.0, step=1000.0),
+)
 
 if st.sidebar.button("Appliquer Stratégie"):
-    st.cache_data.clear()
+    # Invalidation ciblée : seul l'actif / intervalle affiché est resynchronisé
+    refresh_prices(asset, period=period, interval=interval)
 
 # --- MAIN ---
 with st.spinner("Calcul en cours..."):
@@ -37,10 +56,31 @@ with st.spinner("Calcul en cours..."):
     
     if not df.empty:
         # 2. Application de la Stratégie
-        if strat_name == "Buy & Hold":
-            df_strat = calculate_buy_and_hold(df)
-        elif strat_name == "MA Crossover":
-            df_strat = calculate_ma_crossover(df, params['short'], params['long'])
+        # L'état de la stratégie est gardé dans la session : à chaque refresh,
+        # seules les nouvelles bougies sont calculées (mêmes résultats que le calcul complet).
+        # Un seul flux par session, marqué par sa sélection : changer d'actif ou de
+        # paramètres remplace le précédent au lieu de l'accumuler.
+        stream_key = (asset, period, interval, strat_key, tuple(sorted(params.items())))
+        stored_key, stream = st.session_state.get("stream", (None, None))
+        if stored_key != stream_key:
+            stream = None
+        if cost_model.is_free() and (stream is None or stream.last_timestamp not in df.index):
+            stream = strategy.stream(**params)
+            st.session_state["stream"] = (stream_key, stream)
+        result = None
+        if cost_model.is_free() and stream is not None:
+            stream.update(df)
+            df_strat = stream.frame()
+        else:
+            # Avec coûts, ou stratégie sans version incrémentale : exécuteur commun (calcul complet)
+            result = backtest(strat_key, df, params, costs=cost_model)
+            df_strat = df.assign(
+                Position=result["positions"].iloc[:, 0],
+                Turnover=result["turnover"].iloc[:, 0],
+                Costs=result["costs"].iloc[:, 0],
+                Strategy_Returns=result["returns"].iloc[:, 0],
+                Strategy_Equity=result["equity"].iloc[:, 0],
+            )
         
         # 3. Affichage Résultats
         last_equity = df_strat['Strategy_Equity'].iloc[-1]
@@ -54,8 +94,11 @@ with st.spinner("Calcul en cours..."):
         fig = go.Figure()
         
         # Ligne 1 : Prix de l'actif (échelle de gauche)
+        # Séries sous-échantillonnées (LTTB) avant envoi au navigateur
+        price_line = downsample_line(df_strat['Close'])
+        equity_line = downsample_line(df_strat['Strategy_Equity'])
         fig.add_trace(go.Scatter(
-            x=df.index, y=df['Close'], 
+            x=price_line.index, y=price_line, 
             name="Prix Actif", 
             line=dict(color='white', width=1),
             yaxis='y1'
@@ -63,7 +106,7 @@ with st.spinner("Calcul en cours..."):
         
         # Ligne 2 : Portefeuille Stratégie (échelle de droite pour bien comparer)
         fig.add_trace(go.Scatter(
-            x=df.index, y=df_strat['Strategy_Equity'], 
+            x=equity_line.index, y=equity_line, 
             name=f"Stratégie {strat_name}",
             line=dict(color='#2E91E5', width=2),
             yaxis='y2'
@@ -78,16 +121,123 @@ with st.spinner("Calcul en cours..."):
             hovermode="x unified"
         )
         
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart(fig, stage="ui.single_asset.price", use_container_width=True)
         
+        if result is not None and not cost_model.is_free():
+            attribution = result["cost_attribution"].iloc[0]
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Ordres", f"{int(attribution['Trades'])}", f"turnover {attribution['Turnover']:.1f}x")
+            c2.metric("Frais", f"{attribution['Fees']:.2f}%")
+            c3.metric("Coûts fixes", f"{attribution['Fixed']:.2f}%")
+            c4.metric("Slippage", f"{attribution['Slippage']:.2f}%")
+            st.caption("Coûts cumulés en % de la valeur du portefeuille au moment des ordres.")
+
         with st.expander("Voir données calculées"):
             st.dataframe(df_strat.tail(10))
 
+        # Clôtures float32 partagées entre sessions (vue, sans copie du DataFrame)
+        arrays = get_price_arrays(asset, period=period, interval=interval)
+        close = arrays.close if arrays is not None else df["Close"].to_numpy()
+
+        with st.expander("🔎 Optimisation MA Crossover (grille de paramètres)", expanded=False):
+            # Calcul lourd (une paire par cellule) : seulement sur demande. Le dernier résultat est
+            # gardé dans la session, un refresh (nouvelle bougie) ne relance pas la grille.
+            grid_key = f"grid::{asset}::{period}::{interval}"
+            with st.form("ma_grid"):
+                g1, g2 = st.columns(2)
+                short_range = g1.slider("Fenêtres courtes", 5, 50, (5, 50))
+                long_range = g2.slider("Fenêtres longues", 10, 200, (10, 200))
+                run_grid = st.form_submit_button("Lancer l'optimisation")
+            grid_metric = st.selectbox("Critère", ["Sharpe", "Final_Equity", "Max_Drawdown"])
+
+            if run_grid:
+                short_windows = range(short_range[0], short_range[1] + 1)
+                long_windows = range(long_range[0], long_range[1] + 1)
+                st.session_state[grid_key] = (cached_compute(
+                    "ma_crossover_grid", close, {"short": short_windows, "long": long_windows},
+                    lambda: ma_crossover_grid(close, short_windows=short_windows, long_windows=long_windows),
+                ), df.index[-1])
+            grid, grid_last = st.session_state.get(grid_key, (None, None))
+
+            if grid is None:
+                st.caption("Choisir les plages puis lancer l'optimisation.")
+            elif grid.empty:
+                st.info("Aucune paire (courte < longue) dans ces plages.")
+            else:
+                import plotly.express as px  # Seulement si la grille est affichée
+
+                heat = grid.pivot(index='Short', columns='Long', values=grid_metric)
+                fig_grid = px.imshow(
+                    heat, origin='lower', aspect='auto', color_continuous_scale='RdYlGn',
+                    labels=dict(x="Moyenne Longue", y="Moyenne Courte", color=grid_metric),
+                )
+                fig_grid.update_layout(height=500)
+                plotly_chart(fig_grid, stage="ui.single_asset.grid", use_container_width=True)
+
+                best = grid.loc[grid[grid_metric].idxmax()]
+                st.caption(
+                    f"Meilleure paire ({grid_metric}) : courte {int(best['Short'])} / longue {int(best['Long'])} "
+                    f"• Sharpe {best['Sharpe']:.2f} • Equity {best['Final_Equity']:.2f} "
+                    f"• Max DD {best['Max_Drawdown']:.2f}% • données jusqu'au {grid_last:%Y-%m-%d %H:%M}"
+                )
+
+        with st.expander("🧪 Walk-forward (validation hors échantillon)", expanded=False):
+            st.caption(
+                "Historique découpé en fenêtres train / test : la meilleure paire MA du train "
+                "est appliquée au test suivant, les tests sont chaînés en une courbe hors échantillon."
+            )
+            # Même règle que la grille : calcul sur demande, dernier résultat gardé dans la session
+            wf_key = f"walkforward::{asset}::{period}::{interval}"
+            with st.form("walk_forward"):
+                w1, w2, w3, w4 = st.columns(4)
+                wf_folds = w1.number_input("Folds", 2, 20, 6)
+                wf_criterion = w2.selectbox("Critère (train)", ["Sharpe", "Final_Equity"])
+                wf_step = w3.selectbox("Pas des fenêtres longues", [1, 2, 5, 10], index=2)
+                wf_anchored = w4.checkbox("Train ancré au début", value=False)
+                run_wf = st.form_submit_button("Lancer le walk-forward")
+
+            if run_wf:
+                wf_shorts = range(5, 51)
+                wf_longs = range(10, 201, int(wf_step))
+                try:
+                    # Calcul dans le processus du serveur (n_jobs=1) : pas de pool par session
+                    st.session_state[wf_key] = cached_compute(
+                        "walk_forward_ma", close,
+                        {"short": wf_shorts, "long": wf_longs, "folds": int(wf_folds),
+                         "criterion": wf_criterion, "anchored": wf_anchored},
+                        lambda: walk_forward_ma(
+                            df, short_windows=wf_shorts, long_windows=wf_longs, n_folds=int(wf_folds),
+                            anchored=wf_anchored, criterion=wf_criterion, n_jobs=1,
+                        ),
+                    )
+                except ValueError as e:
+                    st.warning(f"Walk-forward impossible : {e}")
+                    st.session_state.pop(wf_key, None)
+            wf = st.session_state.get(wf_key)
+
+            if wf is not None:
+                s = wf["stats"]
+                k1, k2, k3 = st.columns(3)
+                k1.metric("Rendement annualisé (OOS)", f"{s['Annualized_Return']:.2f}%")
+                k2.metric("Sharpe (OOS)", f"{s['Sharpe']:.2f}")
+                k3.metric("Max Drawdown (OOS)", f"{s['Max_Drawdown']:.2f}%")
+
+                oos = wf["equity"]
+                in_sample = df_strat['Strategy_Equity'].loc[oos.index[0]:]
+                in_sample = 100 * in_sample / in_sample.iloc[0]
+                fig_wf = go.Figure()
+                for name, series in (("Hors échantillon (walk-forward)", oos), (f"{strat_name} (in-sample)", in_sample)):
+                    line = downsample_line(series)
+                    fig_wf.add_trace(go.Scatter(x=line.index, y=line, name=name))
+                fig_wf.update_layout(height=400, yaxis_title="Base 100", hovermode="x unified")
+                plotly_chart(fig_wf, stage="ui.single_asset.walkforward", use_container_width=True)
+                st.dataframe(wf["folds"], use_container_width=True)
+
     else:
         st.error("Pas de données.")
 
     with st.expander("🔮 Bonus : Prédiction ML (Tendance future)", expanded=False):
-        st.write("Modèle : Régression Linéaire simple sur l'historique chargé.")
+        st.write("Modèle : Régression Linéaire simple (moindres carrés, forme fermée) sur les 30 derniers points.")
         
         try:
             # APPEL DE LA FONCTION DÉLOCALISÉE (Backend)
@@ -117,7 +267,7 @@ with st.spinner("Calcul en cours..."):
                     margin=dict(t=0, b=0, l=0, r=0),
                     showlegend=True
                 )
-                st.plotly_chart(fig_pred, use_container_width=True)
+                plotly_chart(fig_pred, stage="ui.single_asset.prediction", use_container_width=True)
                 
         except Exception as e:
             st.error(f"Erreur lors de la prédiction : {e}")
@@ -4,18 +4,36 @@ import plotly.graph_objects as go
 import plotly.express as px
 
 from app.core.config import ASSETS
-from app.core.portfolio import build_prices_matrix, simulate_portfolio, normalize_weights
-from app.core.metrics import max_drawdown, annualized_return, annualized_vol, sharpe_ratio, corr_matrix
+from app.core.portfolio import (
+    build_prices_matrix,
+    build_volumes_matrix,
+    simulate_portfolio,
+    normalize_weights,
+    simulate_portfolios_batch,
+    random_weights,
+)
+from app.core.metrics import (
+    max_drawdown,
+    annualized_return,
+    annualized_vol,
+    sharpe_ratio,
+    corr_matrix,
+    metrics_table,
+    rolling_vol,
+    rolling_sharpe,
+)
+from app.core.predictions import predict_linear_trend, walk_forward_errors
+from app.core.downsampling import downsample_line
+from app.core.instrumentation import plotly_chart
+from app.core.backtest import backtest, combine_sleeves, get_strategy, list_strategies, sleeve_returns
+from app.core.cache import cached_compute
+from app.core.costs import CostModel
+from app.core.montecarlo import monte_carlo_portfolio, var_cvar, drawdown_distribution
 
 st.set_page_config(layout="wide", page_title="Quant-B Portfolio", page_icon="📊")
 
 # Auto-refresh every 5 minutes (safe + simple)
-st.caption("Auto-refresh every 5 minutes (cache TTL = 300s).")
-
-
-@st.cache_data(ttl=300)
-def cached_prices(keys, period, interval):
-    return build_prices_matrix(keys, period=period, interval=interval)
+st.caption("Auto-refresh every 5 minutes (shared cache, TTL = bar interval).")
 
 
 def main():
@@ -59,18 +77,39 @@ def main():
         weights = normalize_weights(raw)
         st.sidebar.caption(f"Normalized sum = {sum(weights.values()):.2f}")
 
+    # ---------- Transaction costs ----------
+    st.sidebar.subheader("Transaction costs")
+    cost_model = CostModel(
+        fee_bps=st.sidebar.number_input("Fees (bps)", 0.0, 100.0, 0.0, step=1.0),
+        fixed_cost=st.sidebar.number_input("Fixed cost per order ($)", 0.0, 100.0, 0.0, step=0.5),
+        impact_coef=st.sidebar.number_input("Slippage (square-root volume coef.)", 0.0, 1.0, 0.0, step=0.01),
+        capital=st.sidebar.number_input("Capital ($)", 100.0, 1e9, 10_000.0, step=1000.0),
+    )
+    cost_params = vars(cost_model)
+
     # ---------- Data ----------
-    prices = cached_prices(tuple(selected), period, interval)
+    prices, coverage = build_prices_matrix(selected, period=period, interval=interval, return_coverage=True)
     if prices.empty:
         st.error("No data available. Try another period/interval.")
         return
+    with st.expander("Data coverage (alignment)"):
+        st.caption("Assets are aligned on the union of their timestamps: short gaps and closed-market "
+                   "hours carry the last price; rows still missing a price are dropped.")
+        st.dataframe(coverage.style.format({"Coverage": "{:.1%}"}), use_container_width=True)
 
     returns = prices.pct_change().dropna()
     corr = corr_matrix(returns)
+    # Volumes seulement pour le slippage (servis par le cache des prix)
+    volumes = build_volumes_matrix(selected, prices.index, period=period, interval=interval) \
+        if cost_model.impact_coef > 0 else None
 
 
     # ---------- Portfolio simulation ----------
-    sim = simulate_portfolio(prices, weights, rebalance=rebalance, base=100.0)
+    sim = cached_compute(
+        "simulate_portfolio", prices, {"weights": weights, "rebalance": rebalance, "costs": cost_params},
+        lambda: simulate_portfolio(prices, weights, rebalance=rebalance, base=100.0,
+                                   costs=cost_model, volumes=volumes),
+    )
     if sim.empty:
         st.error("Portfolio simulation failed.")
         return
@@ -95,6 +134,15 @@ def main():
     k5.metric("Sharpe (rf=0)", f"{sharpe_ratio(port_r):.2f}")
     k6.metric("Max Drawdown", f"{max_drawdown(sim['Portfolio_Equity']):.2f}%")
 
+    if "Costs" in sim:
+        # Attribution des coûts de rebalancement (en % de la valeur au moment des ordres)
+        t1, t2, t3, t4, t5 = st.columns(5)
+        t1.metric("Turnover (sum)", f"{sim['Turnover'].sum():.2f}x")
+        t2.metric("Gross ann. return", f"{annualized_return(sim['Gross_Returns']):.2f}%")
+        t3.metric("Fees", f"{sim['Fees'].sum() * 100:.2f}%")
+        t4.metric("Fixed costs", f"{sim['Fixed'].sum() * 100:.2f}%")
+        t5.metric("Slippage", f"{sim['Slippage'].sum() * 100:.2f}%")
+
 
     # ---------- Main chart ----------
     st.subheader("Normalized prices & Portfolio equity")
@@ -102,24 +150,178 @@ def main():
     norm = prices / prices.iloc[0] * 100.0
     fig = go.Figure()
 
+    # Séries sous-échantillonnées (LTTB) avant envoi au navigateur
     for col in norm.columns:
-        fig.add_trace(go.Scatter(x=norm.index, y=norm[col], mode="lines", name=f"{col} (base 100)"))
+        line = downsample_line(norm[col])
+        fig.add_trace(go.Scatter(x=line.index, y=line, mode="lines", name=f"{col} (base 100)"))
 
+    equity_line = downsample_line(sim["Portfolio_Equity"])
     fig.add_trace(go.Scatter(
-        x=sim.index, y=sim["Portfolio_Equity"],
+        x=equity_line.index, y=equity_line,
         mode="lines", name="Portfolio Equity", line=dict(width=4)
     ))
 
     fig.update_layout(height=600)
-    st.plotly_chart(fig, use_container_width=True)
+    plotly_chart(fig, stage="ui.portfolio.equity", use_container_width=True)
+
+    # ---------- Risk metrics (assets + portfolio, one pass) ----------
+    st.subheader("Risk metrics (assets & portfolio)")
+    all_returns = returns.join(port_r.rename("Portfolio"), how="inner")
+    all_equity = (norm.join(sim["Portfolio_Equity"].rename("Portfolio"), how="inner")).loc[all_returns.index]
+    st.dataframe(metrics_table(all_returns, all_equity).style.format("{:.2f}"), use_container_width=True)
+
+    window = st.slider("Rolling window (bars)", 10, 500, 100, step=10)
+    roll_metric = st.radio("Rolling metric", ["Volatility (%)", "Sharpe"], horizontal=True)
+    if roll_metric == "Sharpe":
+        rolling = rolling_sharpe(all_returns, window)
+    else:
+        rolling = rolling_vol(all_returns, window)
+    fig_roll = go.Figure()
+    for col in rolling.columns:
+        line = downsample_line(rolling[col])
+        fig_roll.add_trace(go.Scatter(x=line.index, y=line, mode="lines", name=col))
+    fig_roll.update_layout(height=400)
+    plotly_chart(fig_roll, stage="ui.portfolio.rolling", use_container_width=True)
 
     # ---------- Correlation matrix ----------
     st.subheader("Correlation matrix (returns)")
     if not corr.empty:
-        st.plotly_chart(px.imshow(corr, text_auto=True, aspect="auto"), use_container_width=True)
+        plotly_chart(px.imshow(corr, text_auto=True, aspect="auto"), stage="ui.portfolio.corr", use_container_width=True)
     else:
         st.info("Not enough data to compute correlation matrix.")
 
+    # ---------- Random portfolios (batch simulation) ----------
+    st.subheader("Random portfolios (risk / return cloud)")
+    n_random = st.slider("Number of random portfolios", 100, 5000, 1000, step=100)
+    W = random_weights(n_random, len(prices.columns), seed=42)
+    _, cloud = cached_compute(
+        "simulate_portfolios_batch", prices,
+        {"n": n_random, "seed": 42, "rebalance": rebalance, "costs": cost_params},
+        lambda: simulate_portfolios_batch(prices, W, rebalance=rebalance, base=100.0, keep_equity=False,
+                                          costs=cost_model, volumes=volumes),
+    )
+
+    fig_cloud = px.scatter(
+        cloud,
+        x="Annualized_Vol",
+        y="Annualized_Return",
+        color="Sharpe",
+        hover_data=list(prices.columns) + ["Max_Drawdown"],
+        labels={"Annualized_Vol": "Annualized Volatility (%)", "Annualized_Return": "Annualized Return (%)"},
+    )
+    fig_cloud.add_trace(go.Scatter(
+        x=[annualized_vol(port_r)], y=[annualized_return(port_r)],
+        mode="markers", name="Current portfolio",
+        marker=dict(symbol="star", size=16, color="red"),
+    ))
+    fig_cloud.update_layout(height=500)
+    plotly_chart(fig_cloud, stage="ui.portfolio.cloud", use_container_width=True)
+
+    best = cloud.loc[cloud["Sharpe"].idxmax()] if cloud["Sharpe"].notna().any() else None
+    if best is not None:
+        st.caption(
+            "Best Sharpe weights: "
+            + ", ".join(f"{a} {best[a]:.0%}" for a in prices.columns)
+            + f" • Sharpe {best['Sharpe']:.2f}"
+        )
+
+    # ---------- Strategy sleeves ----------
+    with st.expander("🧩 Strategy sleeves (combine strategies on the selected assets)", expanded=False):
+        labels = dict(list_strategies())
+        chosen = st.multiselect("Sleeves", list(labels), default=list(labels)[:2], format_func=labels.get)
+        sleeves, sleeve_weights = {}, {}
+        for name in chosen:
+            strategy = get_strategy(name)
+            cols = st.columns(1 + len(strategy.params))
+            sleeve_weights[name] = cols[0].number_input(
+                f"{strategy.label} weight", 0.0, 1.0, 1.0 / len(chosen), step=0.05, key=f"sleeve_w_{name}")
+            params = {
+                k: col.number_input(spec["label"], spec["min"], spec["max"], spec["default"], key=f"sleeve_{name}_{k}")
+                for col, (k, spec) in zip(cols[1:], strategy.params.items())
+            }
+            # Un seul appel vectorisé pour tous les actifs de la poche
+            result = cached_compute(
+                "backtest", prices, {"strategy": name, "params": params, "costs": cost_params},
+                lambda: backtest(name, prices, params, costs=cost_model, volumes=volumes),
+            )
+            sleeves[strategy.label] = sleeve_returns(result, weights)
+
+        if sleeves:
+            combined = combine_sleeves(sleeves, {get_strategy(n).label: w for n, w in sleeve_weights.items()})
+            fig_sleeves = go.Figure()
+            for col in combined.columns:
+                line = downsample_line(combined[col])
+                fig_sleeves.add_trace(go.Scatter(x=line.index, y=line, name=col,
+                                                 line=dict(width=3 if col == "Combined" else 1)))
+            fig_sleeves.update_layout(height=400, yaxis_title="Equity (base 100)", hovermode="x unified")
+            plotly_chart(fig_sleeves, stage="ui.portfolio.sleeves", use_container_width=True)
+            st.dataframe(
+                metrics_table(combined.pct_change(fill_method=None).iloc[1:], combined).style.format("{:.2f}"),
+                use_container_width=True,
+            )
+
+    # ---------- Monte Carlo (future paths) ----------
+    with st.expander("🎲 Monte Carlo simulation (future paths)", expanded=False):
+        # Simulated on demand only (a collapsed expander still runs, and every new bar changes the
+        # cache key); the last result is kept in the session, tagged with the portfolio it belongs to
+        with st.form("monte_carlo"):
+            m1, m2, m3, m4 = st.columns(4)
+            mc_method = m1.selectbox("Method", ["bootstrap", "normal"], format_func=lambda m: {
+                "bootstrap": "Block bootstrap", "normal": "Multivariate normal"}[m])
+            n_paths = m2.select_slider("Paths", [1_000, 5_000, 10_000, 50_000], value=5_000)
+            horizon = m3.number_input("Horizon (bars)", 10, 20_000, max(10, min(len(returns), 288)), step=10)
+            block_size = m4.number_input("Block size (bars)", 1, 500, 24, help="Block bootstrap only")
+            run_mc = st.form_submit_button("Run simulation")
+
+        mc_key = (tuple(selected), tuple(sorted(weights.items())), period, interval)
+        if run_mc:
+            mc = cached_compute(
+                "monte_carlo_portfolio", returns,
+                {"weights": weights, "n_paths": n_paths, "horizon": int(horizon),
+                 "method": mc_method, "block_size": int(block_size), "seed": 42},
+                lambda: monte_carlo_portfolio(
+                    returns, weights, n_paths=n_paths, horizon=int(horizon),
+                    method=mc_method, block_size=int(block_size), seed=42,
+                ),
+            )
+            st.session_state["mc_result"] = (mc_key, mc, returns.index[-1])
+        stored_key, mc, mc_last = st.session_state.get("mc_result", (None, None, None))
+
+        if stored_key != mc_key:
+            st.caption("Set the parameters, then run the simulation.")
+        else:
+            st.caption(f"Simulated from the history up to {mc_last:%Y-%m-%d %H:%M}.")
+            fan = mc["fan"]
+            fig_mc = go.Figure()
+            fig_mc.add_trace(go.Scatter(x=fan.index, y=fan["p95"], line=dict(width=0), showlegend=False))
+            fig_mc.add_trace(go.Scatter(x=fan.index, y=fan["p5"], fill="tonexty", line=dict(width=0), name="5–95%"))
+            fig_mc.add_trace(go.Scatter(x=fan.index, y=fan["p75"], line=dict(width=0), showlegend=False))
+            fig_mc.add_trace(go.Scatter(x=fan.index, y=fan["p25"], fill="tonexty", line=dict(width=0), name="25–75%"))
+            fig_mc.add_trace(go.Scatter(x=fan.index, y=fan["p50"], line=dict(width=2), name="Median"))
+            fig_mc.update_layout(height=400, xaxis_title="Bars ahead", yaxis_title="Equity (base 100)")
+            plotly_chart(fig_mc, stage="ui.portfolio.montecarlo", use_container_width=True)
+
+            c_var, c_dd = st.columns(2)
+            with c_var:
+                st.write("Terminal loss (% of capital)")
+                st.dataframe(var_cvar(mc["terminal_returns"]).style.format("{:.2f}%"), use_container_width=True)
+            with c_dd:
+                st.write("Max drawdown distribution (%)")
+                st.dataframe(drawdown_distribution(mc["max_drawdowns"]).to_frame().style.format("{:.2f}%"),
+                             use_container_width=True)
+
+    # ---------- Trend prediction (all assets, closed-form OLS) ----------
+    st.subheader("Linear trend prediction (30 last bars → +5 bars)")
+    st.dataframe(
+        predict_linear_trend(prices, window=30, horizon=5).style.format(
+            {"Last_Price": "{:,.2f}", "Predicted_Price": "{:,.2f}", "Slope": "{:.4f}", "Change_Pct": "{:+.2f}%"}
+        ),
+        use_container_width=True,
+    )
+    with st.expander("Walk-forward evaluation (out-of-sample error over the whole history)"):
+        wf = walk_forward_errors(prices, windows=(10, 20, 30, 60), horizon=5)
+        st.dataframe(wf.style.format({"MAE": "{:,.2f}", "RMSE": "{:,.2f}", "MAPE": "{:.2f}%"}), use_container_width=True)
+
     # Small debug expander (optional, pro for robustness)
     with st.expander("Data details"):
         st.write("Last timestamps:", prices.index[-3:])
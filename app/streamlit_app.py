@@ -1,11 +1,18 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import glob
 import os
 import plotly.graph_objects as go
 from datetime import datetime
 import pytz 
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core.config import ASSETS
+from app.core.data import get_historical_data
+from app.core.downsampling import downsample_ohlc
+from app.core.instrumentation import get_recorder, is_enabled, plotly_chart, set_enabled
+from app.core.reports import METRIC_COLUMNS, get_report_history, load_latest_snapshot
 
 # --- CONFIGURATION ---
 st.set_page_config(layout="wide", page_title="Accueil Dashboard", page_icon="📊")
@@ -15,40 +22,99 @@ def get_paris_time():
     tz_paris = pytz.timezone('Europe/Paris')
     return datetime.now(tz_paris).strftime('%H:%M:%S')
 
-@st.cache_data(ttl=300)
 def get_data(symbol, period, interval):
+    # Lecture via la couche data (stockage local alimenté par le worker d'ingestion).
+    # Pas de st.cache_data : le cache partagé de app.core.cache sert toutes les pages.
+    key = next((k for k, t in ASSETS.items() if t == symbol), None)
+    if key is None:
+        st.error(f"Erreur data : {symbol} n'est pas configuré.")
+        return pd.DataFrame()
     try:
-        data = yf.download(symbol, period=period, interval=interval, progress=False)
-        if isinstance(data.columns, pd.MultiIndex):
-            data.columns = data.columns.get_level_values(0)
-        
-        if data.empty:
-            return pd.DataFrame()
-
-        data.index = pd.to_datetime(data.index)
-        return data
+        return get_historical_data(key, period=period, interval=interval)
     except Exception as e:
         st.error(f"Erreur data : {e}")
         return pd.DataFrame()
 
 def get_latest_report():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    repo_dir = os.path.dirname(current_dir)
-    reports_dir = os.path.join(repo_dir, 'reports')
-
-    if not os.path.exists(reports_dir):
-        return f"⚠️ Dossier introuvable : {reports_dir}"
-
-    list_of_files = glob.glob(os.path.join(reports_dir, '*.txt'))
-    if not list_of_files:
-        return "⚠️ Aucun rapport trouvé."
-
-    latest_file = max(list_of_files, key=os.path.getctime)
+    # Texte du dernier rapport, lu dans l'historique indexé (une requête, quel que soit le nombre de rapports)
+    history = get_report_history()
+    if not history.exists():
+        return f"⚠️ Aucun rapport trouvé ({history.path})."
     try:
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            return f.read()
+        snapshot = history.latest()
     except Exception as e:
         return f"⚠️ Erreur lecture : {e}"
+    if snapshot is None or not snapshot.get("text"):
+        return "⚠️ Aucun rapport trouvé."
+    return snapshot["text"]
+
+def afficher_historique():
+    # Historique des rapports journaliers : tendance d'une métrique par actif sur une période
+    history = get_report_history()
+    dates = history.dates()
+    if len(dates) < 2:
+        return
+    st.subheader("Historique")
+    first, last = pd.Timestamp(dates[0]).date(), pd.Timestamp(dates[-1]).date()
+    c1, c2 = st.columns([2, 1])
+    with c1:
+        plage = st.date_input("Période", value=(max(first, last - pd.Timedelta(days=90)), last),
+                              min_value=first, max_value=last, key="report_range")
+    with c2:
+        metrique = st.selectbox("Métrique", METRIC_COLUMNS, index=METRIC_COLUMNS.index("sharpe"), key="report_metric")
+    if not isinstance(plage, (tuple, list)) or len(plage) != 2:
+        return
+
+    rows = history.query(start=plage[0], end=plage[1])
+    if rows.empty:
+        st.info("Aucun rapport sur cette période.")
+        return
+    trend = rows.pivot(index="date", columns="asset", values=metrique)
+    fig = go.Figure([go.Scatter(x=trend.index, y=trend[a], mode="lines+markers", name=a) for a in trend.columns])
+    fig.update_layout(height=350, margin=dict(l=0, r=0, t=30, b=0), yaxis_title=metrique)
+    plotly_chart(fig, stage="ui.home.report_history", use_container_width=True)
+    with st.expander("Données de l'historique"):
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+
+def afficher_instrumentation():
+    # Mesures du processus Streamlit (toutes sessions confondues), voir app.core.instrumentation
+    recorder = get_recorder()
+    snap = recorder.snapshot()
+    cache, counters = snap["cache"], snap["counters"]
+
+    st.subheader("Instrumentation")
+    actif = st.toggle("Mesures actives", value=is_enabled(), key="instrumentation_on")
+    if actif != is_enabled():
+        set_enabled(actif)
+
+    c1, c2, c3, c4 = st.columns(4)
+    hit_rate = cache["hit_rate"]
+    c1.metric("Cache (hit rate)", "-" if hit_rate != hit_rate else f"{hit_rate:.0%}",
+              help=f"{cache['hits']} hits / {cache['misses']} misses")
+    c2.metric("Cache (entrées)", f"{cache['entries']}", help=f"{cache['bytes'] / 1e6:,.1f} Mo")
+    c3.metric("Essais supplémentaires", f"{counters.get('data.retries', 0)}")
+    c4.metric("Téléchargements échoués", f"{counters.get('data.fetch_failures', 0)}")
+
+    if not snap["stages"]:
+        st.info("Aucune mesure pour l'instant.")
+        return
+
+    table = pd.DataFrame.from_dict(snap["stages"], orient="index")
+    table["total_s"] = table["mean_ms"] * table["count"] / 1000.0
+    table["bytes_total"] = table["bytes_total"] / 1e6
+    table["bytes_max"] = table["bytes_max"] / 1e6
+    table = table.rename(columns={"bytes_total": "Mo_total", "bytes_max": "Mo_max"}).sort_values("total_s", ascending=False)
+    st.dataframe(table.style.format("{:,.2f}"), use_container_width=True)
+
+    stage = st.selectbox("Histogramme des durées", list(table.index), key="instrumentation_stage")
+    st.bar_chart(pd.Series(recorder.histogram(stage), name="appels"))
+
+    d1, d2 = st.columns(2)
+    d1.download_button("Exporter (JSON lines)", recorder.export_jsonl(),
+                       file_name=f"instrumentation_{datetime.now():%Y%m%d_%H%M%S}.jsonl", mime="application/jsonl")
+    if d2.button("Remettre à zéro"):
+        recorder.reset()
+        st.rerun()
 
 # --- INTERFACE LIVE (Fragment) ---
 @st.fragment(run_every=300)
@@ -82,21 +148,33 @@ def afficher_dashboard_live(symbol, period, interval):
             col3.metric("Bas", f"${df['Low'].min().item():,.2f}")
 
             st.subheader(f"Analyse Technique ({interval})")
+            # Bougies regroupées côté serveur (extrêmes conservés) pour limiter le volume envoyé
+            df_chart = downsample_ohlc(df)
             fig = go.Figure(data=[go.Candlestick(
-                x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close']
+                x=df_chart.index, open=df_chart['Open'], high=df_chart['High'], low=df_chart['Low'], close=df_chart['Close']
             )])
             fig.update_layout(height=500, margin=dict(l=0, r=0, t=30, b=0), xaxis_rangeslider_visible=True)
-            st.plotly_chart(fig, use_container_width=True)
+            plotly_chart(fig, stage="ui.home.candles", use_container_width=True)
         else:
             st.warning("Données non disponibles.")
 
     # Contenu de l'onglet Rapports
     with tab2:
         st.header("Synthèse Stratégique")
-        st.text(get_latest_report())
+        snapshot = load_latest_snapshot()
+        if snapshot:
+            st.caption(f"Rapport du {snapshot['date']} (généré {snapshot['generated_at']})")
+            table = pd.DataFrame(snapshot["rows"]).set_index("asset")
+            st.dataframe(table.style.format("{:,.2f}"), use_container_width=True)
+            with st.expander("Rapport texte"):
+                st.text(snapshot.get("text") or get_latest_report())
+            afficher_historique()
+        else:
+            st.text(get_latest_report())
 
     with tab3:
         st.success("Système en ligne")
+        afficher_instrumentation()
 
 # --- LANCEMENT ---
 if __name__ == "__main__":
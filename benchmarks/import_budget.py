@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# Audit du temps de démarrage : temps d'import des modules app.core et temps jusqu'au premier
+# rendu de chaque page (streamlit.testing, flux de marché synthétique, aucun accès réseau).
+# Renvoie un code de sortie 1 si un budget est dépassé ou si un module lourd est importé
+# trop tôt : à lancer avant chaque déploiement (ou en CI).
+#
+#   python benchmarks/import_budget.py
+#   python benchmarks/import_budget.py --scale 2      # machine plus lente : budgets x2
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets en secondes (machine de référence : VM de prod)
+IMPORT_BUDGETS = {
+    "app.core.config": 0.05,
+    "app.core.data": 1.0,
+    "app.core.portfolio": 1.0,
+    "app.core.strategies": 1.0,
+    "app.core.metrics": 1.0,
+    "app.core.predictions": 1.0,
+    "app.core.montecarlo": 1.0,
+    "app.core.downsampling": 1.0,
+    "app.core.reports": 1.0,
+    "app.core.cache": 1.0,
+    "app.core.walkforward": 1.0,
+    "app.core.backtest": 1.0,
+    "app.core.costs": 1.0,
+    "app.core.resample": 1.0,
+    "app.core.batch": 1.0,
+    "app.core.instrumentation": 1.0,
+    "app.core.align": 1.0,
+}
+
+# Dépendances lourdes qui ne doivent être chargées qu'au premier usage
+LAZY_MODULES = ["yfinance", "sklearn", "streamlit", "plotly"]
+
+PAGE_BUDGETS = {
+    "app/streamlit_app.py": 4.0,
+    "app/pages/1_Single_Asset.py": 6.0,
+    "app/pages/2_Portfolio.py": 8.0,
+}
+
+
+def _env(store_dir):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env["DASHBOARD_DATA_PROVIDER"] = "fake"
+    env["DASHBOARD_STORE_DIR"] = store_dir
+    return env
+
+
+def import_time(module, env):
+    """Temps d'import cumulé (s) du module dans un interpréteur neuf (python -X importtime)."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, env=env, cwd=REPO_DIR, timeout=120)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    for line in out.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s?(\S+)$", line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1e6
+    return float("nan")
+
+
+def eagerly_loaded(module, env):
+    """Dépendances de LAZY_MODULES déjà présentes dans sys.modules après l'import du module."""
+    code = (f"import sys, json, {module}; "
+            f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         env=env, cwd=REPO_DIR, timeout=120)
+    return json.loads(out.stdout.strip().splitlines()[-1]) if out.returncode == 0 else ["<error>"]
+
+
+def first_render_time(page, env):
+    """Temps entre le lancement du processus et la fin du premier rendu de la page."""
+    code = ("from streamlit.testing.v1 import AppTest; "
+            f"at = AppTest.from_file({page!r}, default_timeout=300).run(); "
+            "print(len(at.exception))")
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         env=env, cwd=REPO_DIR, timeout=600)
+    elapsed = time.perf_counter() - start
+    errors = int(out.stdout.strip().splitlines()[-1]) if out.returncode == 0 and out.stdout.strip() else -1
+    return elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit et budget du temps de démarrage.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplie tous les budgets")
+    parser.add_argument("--skip-pages", action="store_true", help="Ne pas mesurer le rendu des pages")
+    parser.add_argument("--output", help="Ecrit les mesures en JSON")
+    args = parser.parse_args()
+
+    failures = []
+    results = {"imports": {}, "pages": {}}
+    with tempfile.TemporaryDirectory(prefix="import_budget_") as store_dir:
+        env = _env(store_dir)
+
+        print("Imports (interpréteur neuf) :")
+        for module, budget in IMPORT_BUDGETS.items():
+            seconds = import_time(module, env)
+            eager = eagerly_loaded(module, env)
+            budget *= args.scale
+            ok = seconds <= budget and not eager
+            results["imports"][module] = {"seconds": seconds, "budget": budget, "eager": eager}
+            print(f"  {'OK ' if ok else 'KO '} {module:28s} {seconds:6.3f}s / {budget:.2f}s"
+                  + (f"  importe déjà : {', '.join(eager)}" if eager else ""))
+            if not ok:
+                failures.append(module)
+
+        if not args.skip_pages:
+            print("Premier rendu des pages (processus neuf, FakeProvider) :")
+            for page, budget in PAGE_BUDGETS.items():
+                seconds, errors = first_render_time(page, env)
+                budget *= args.scale
+                ok = seconds <= budget and errors == 0
+                results["pages"][page] = {"seconds": seconds, "budget": budget, "errors": errors}
+                print(f"  {'OK ' if ok else 'KO '} {page:28s} {seconds:6.3f}s / {budget:.2f}s"
+                      + (f"  ({errors} erreur(s))" if errors else ""))
+                if not ok:
+                    failures.append(page)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if failures:
+        print(f"\nBudget dépassé : {', '.join(failures)}")
+        sys.exit(1)
+    print("\nTous les budgets sont respectés.")
+
+
+if __name__ == "__main__":
+    main()
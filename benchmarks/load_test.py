@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+# Test de charge : N sessions simulées rendent les pages du dashboard en parallèle, dans un
+# seul processus comme le serveur Streamlit (une session = un thread, cache et stockage
+# partagés). Chaque session fait un premier rendu puis --refreshes rafraîchissements ; par
+# défaut toutes les sessions rafraîchissent en même temps (fragments run_every=300 alignés).
+# Source de marché synthétique (FakeProvider) avec latence et taux d'échec réglables.
+#
+#   python benchmarks/load_test.py --sessions 20 --refreshes 3
+#   python benchmarks/load_test.py --sessions 50 --latency 0.5 --failure-rate 0.1 --vary --expire
+#   python benchmarks/load_test.py --pages portfolio --sessions 30 --read-only --output load.json
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+PAGES = {
+    "home": "app/streamlit_app.py",
+    "single": "app/pages/1_Single_Asset.py",
+    "portfolio": "app/pages/2_Portfolio.py",
+}
+
+
+def rss_mb():
+    """RSS courant du processus (Mo), NaN hors Linux."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return float("nan")
+
+
+def peak_rss_mb():
+    """Pic de RSS du processus depuis son lancement (Mo)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024.0 / (1024.0 if sys.platform == "darwin" else 1.0)
+
+
+def summarize(values):
+    if not values:
+        return {"n": 0, "p50": float("nan"), "p95": float("nan"), "p99": float("nan"), "max": float("nan")}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"n": len(values), "p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(max(values))}
+
+
+class Session:
+    """Une session navigateur : un AppTest sur une page, rejoué à chaque rafraîchissement."""
+
+    def __init__(self, number, page, timeout, vary, seed):
+        self.number = number
+        self.page = page
+        self.timeout = timeout
+        self.vary = vary
+        self.rng = np.random.default_rng(seed + number)
+        self.at = None
+
+    def _vary_widgets(self):
+        # Choix différents d'une session à l'autre (actif, période, intervalle, ...). Les listes
+        # avec format_func sont laissées telles quelles (AppTest ne connaît que les libellés).
+        for box in self.at.sidebar.selectbox:
+            if box.options and box.value in box.options:
+                box.select_index(int(self.rng.integers(len(box.options))))
+
+    def render(self):
+        """Rendu complet de la page ; renvoie (durée en s, nombre d'exceptions affichées)."""
+        from streamlit.testing.v1 import AppTest
+
+        start = time.perf_counter()
+        if self.at is None:
+            self.at = AppTest.from_file(os.path.join(REPO_DIR, PAGES[self.page]), default_timeout=self.timeout)
+            self.at.run()
+            if self.vary:
+                self._vary_widgets()
+                self.at.run()
+        else:
+            self.at.run()
+        return time.perf_counter() - start, len(self.at.exception)
+
+
+def share_script_cache():
+    """
+    Un seul cache de bytecode pour toutes les sessions, comme le serveur Streamlit (AppTest
+    en crée un par instance). Chaque page n'est compilée qu'une fois, sous verrou :
+    des ast.parse simultanés peuvent échouer en CPython 3.11 ("recursion depth mismatch").
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test
+
+    shared = ScriptCache()
+    app_test.ScriptCache = lambda: shared
+
+
+def run_round(sessions, jitter, rng):
+    """Rend toutes les sessions en parallèle, départ aligné (barrière) ou étalé sur `jitter` s."""
+    barrier = threading.Barrier(len(sessions))
+    delays = rng.uniform(0.0, jitter, len(sessions)) if jitter else np.zeros(len(sessions))
+
+    def job(i):
+        barrier.wait()
+        if delays[i]:
+            time.sleep(delays[i])
+        try:
+            elapsed, errors = sessions[i].render()
+        except Exception as e:
+            print(f"  session {i} ({sessions[i].page}) : {type(e).__name__}: {e}")
+            return sessions[i].page, float("nan"), 1
+        return sessions[i].page, elapsed, errors
+
+    with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+        return list(pool.map(job, range(len(sessions))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge des pages du dashboard (sessions simultanées).")
+    parser.add_argument("--sessions", type=int, default=20, help="Sessions simulées")
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES),
+                        help="Pages ouvertes, réparties entre les sessions")
+    parser.add_argument("--refreshes", type=int, default=3, help="Rafraîchissements après le premier rendu")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Départs étalés sur N secondes (0 : alignés)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Latence simulée par requête amont (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probabilité d'échec d'une requête amont")
+    parser.add_argument("--vary", action="store_true", help="Sélections aléatoires par session (barre latérale)")
+    parser.add_argument("--expire", action="store_true",
+                        help="Vide le cache partagé avant chaque rafraîchissement (TTL expiré après 5 min)")
+    parser.add_argument("--read-only", action="store_true", help="DASHBOARD_READ_ONLY_STORE=1 (worker d'ingestion)")
+    parser.add_argument("--store", default=None, help="Dossier du stockage (défaut : temporaire, démarrage à froid)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Timeout d'un rendu (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut : benchmarks/results/load_<date>.json)")
+    args = parser.parse_args()
+
+    # Configuration lue à l'import de app.core : à fixer avant
+    os.environ["DASHBOARD_DATA_PROVIDER"] = "fake"
+    os.environ["DASHBOARD_STORE_DIR"] = args.store or tempfile.mkdtemp(prefix="load_store_")
+    os.environ["DASHBOARD_READ_ONLY_STORE"] = "1" if args.read_only else "0"
+    sys.path.append(REPO_DIR)
+
+    from app.core import data
+    from app.core.cache import get_cache
+    from app.core.instrumentation import get_recorder
+    from app.core.providers import FakeProvider
+
+    share_script_cache()
+    provider = FakeProvider(latency=args.latency, failure_rate=args.failure_rate, seed=args.seed)
+    data.set_provider(provider)
+    cache = get_cache()
+    cache.invalidate()
+    get_recorder().reset()
+
+    sessions = [Session(i, args.pages[i % len(args.pages)], args.timeout, args.vary, args.seed)
+                for i in range(args.sessions)]
+    rng = np.random.default_rng(args.seed)
+    baseline_rss = rss_mb()
+    print(f"{args.sessions} sessions ({', '.join(args.pages)}), {args.refreshes} rafraîchissements, "
+          f"latence {args.latency}s, échecs {args.failure_rate:.0%}, stockage {os.environ['DASHBOARD_STORE_DIR']}")
+    print(f"{'tour':<12}{'p50 (s)':>9}{'p95 (s)':>9}{'max (s)':>9}{'erreurs':>9}{'appels':>8}{'RSS (Mo)':>10}")
+
+    renders = []  # (tour, page, durée, erreurs)
+    rounds = []
+    for r in range(args.refreshes + 1):
+        if r and args.expire:
+            cache.invalidate()
+        calls_before = provider.calls
+        start = time.perf_counter()
+        results = run_round(sessions, args.jitter, rng)
+        wall = time.perf_counter() - start
+        renders += [(r, page, elapsed, errors) for page, elapsed, errors in results]
+
+        times = [e for _, e, _ in results if e == e]
+        stats = summarize(times)
+        calls = provider.calls - calls_before
+        errors = sum(err for _, _, err in results)
+        rounds.append({"round": r, "wall_s": wall, "upstream_calls": calls, "errors": errors,
+                       "rss_mb": rss_mb(), **stats})
+        label = "premier" if r == 0 else f"refresh {r}"
+        print(f"{label:<12}{stats['p50']:>9.2f}{stats['p95']:>9.2f}{stats['max']:>9.2f}"
+              f"{errors:>9}{calls:>8}{rss_mb():>10.0f}")
+
+    def latencies(page=None, refresh=None):
+        return [e for r, p, e, _ in renders
+                if e == e and (page is None or p == page) and (refresh is None or (r > 0) == refresh)]
+
+    per_page = {}
+    for page in args.pages:
+        per_page[page] = {"first": summarize(latencies(page, refresh=False)),
+                          "refresh": summarize(latencies(page, refresh=True))}
+    cache_stats = cache.stats()
+    report = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": vars(args),
+        "render_latency_s": {"all": summarize(latencies()), "first": summarize(latencies(refresh=False)),
+                             "refresh": summarize(latencies(refresh=True)), "per_page": per_page},
+        "rounds": rounds,
+        "upstream": {"calls": provider.calls, "calls_by_ticker": provider.calls_by_ticker,
+                     "calls_per_render": provider.calls / max(len(renders), 1)},
+        "errors": sum(err for _, _, _, err in renders),
+        "cache": cache_stats,
+        "stages": get_recorder().stages(),
+        "counters": get_recorder().counters(),
+        "rss_mb": {"baseline": baseline_rss, "final": rss_mb(), "peak": peak_rss_mb()},
+    }
+
+    print()
+    print(f"{'page':<12}{'rendu':<9}{'p50 (s)':>9}{'p95 (s)':>9}{'p99 (s)':>9}{'n':>6}")
+    for page, kinds in per_page.items():
+        for kind, s in kinds.items():
+            if s["n"]:
+                print(f"{page:<12}{kind:<9}{s['p50']:>9.2f}{s['p95']:>9.2f}{s['p99']:>9.2f}{s['n']:>6}")
+    hit_rate = cache_stats["hit_rate"]
+    print(f"\nAppels amont : {provider.calls} ({report['upstream']['calls_per_render']:.2f} par rendu), "
+          f"cache : {hit_rate:.0%} de hits, erreurs : {report['errors']}")
+    print(f"RSS : {baseline_rss:.0f} Mo au départ, pic {report['rss_mb']['peak']:.0f} Mo")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Résultats : {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core import data, metrics
+from app.core.cache import get_cache
+from app.core.config import ASSETS
+from app.core.portfolio import build_prices_matrix, simulate_portfolio
+from app.core.predictions import predict_linear_regression, predict_linear_trend
+from app.core.providers import FakeProvider, synthetic_ohlcv
+from app.core.store import OHLCVStore
+from app.core.strategies import calculate_buy_and_hold, calculate_ma_crossover
+from app.core.walkforward import walk_forward_ma
+from app.core.backtest import backtest
+
+# Benchmarks des chemins critiques (données synthétiques, aucun accès réseau).
+# Chaque cas mesure le temps (médiane / min sur --repeat exécutions) et le pic mémoire (tracemalloc).
+#
+#   python benchmarks/run_benchmarks.py
+#   python benchmarks/run_benchmarks.py --rows 1000 100000 1000000 --assets 3 10
+#   python benchmarks/run_benchmarks.py --only simulate_portfolio --rows 1000 100000 1000000 --assets 10
+#   python benchmarks/run_benchmarks.py --only portfolio --compare benchmarks/results/old.json
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+# --- Données synthétiques ---
+
+def make_ohlcv(rows, seed=0):
+    return synthetic_ohlcv(rows, interval="5m", seed=seed)
+
+
+def make_prices(rows, assets, seed=0):
+    closes = {f"A{i}": make_ohlcv(rows, seed=seed + i)["Close"] for i in range(assets)}
+    return pd.DataFrame(closes)
+
+
+# --- Cas de benchmark : setup(rows, assets) -> fonction à chronométrer ---
+
+def case_simulate_portfolio(rows, assets):
+    prices = make_prices(rows, assets)
+    weights = {c: 1.0 / assets for c in prices.columns}
+    return lambda: simulate_portfolio(prices, weights, rebalance="W")
+
+
+def case_ma_crossover(rows, assets):
+    df = make_ohlcv(rows)
+    return lambda: calculate_ma_crossover(df, 20, 50)
+
+
+def case_buy_and_hold(rows, assets):
+    df = make_ohlcv(rows)
+    return lambda: calculate_buy_and_hold(df)
+
+
+def case_backtest_ma(rows, assets):
+    prices = make_prices(rows, assets)
+    return lambda: backtest("ma_crossover", prices, {"short": 20, "long": 50})
+
+
+def case_walk_forward(rows, assets):
+    df = make_ohlcv(rows)
+    return lambda: walk_forward_ma(df, short_windows=range(5, 51), long_windows=range(10, 201, 5),
+                                   n_jobs=os.cpu_count())
+
+
+def _series_case(fn, kind):
+    def setup(rows, assets):
+        close = make_ohlcv(rows)["Close"]
+        x = close.pct_change().dropna() if kind == "returns" else close
+        return lambda: fn(x)
+    return setup
+
+
+def _matrix_case(fn, kind, **kwargs):
+    def setup(rows, assets):
+        prices = make_prices(rows, assets)
+        x = prices.pct_change().dropna() if kind == "returns" else prices
+        return lambda: fn(x, **kwargs)
+    return setup
+
+
+def case_align_closes(rows, assets):
+    # 1 % de bougies manquantes par actif, à des instants différents
+    rng = np.random.default_rng(0)
+    frames = {}
+    for i in range(assets):
+        df = make_ohlcv(rows, seed=i)
+        frames[f"A{i}"] = df[rng.random(len(df)) > 0.01]
+    return lambda: data.align_closes(frames)
+
+
+def case_predict_linear_regression(rows, assets):
+    df = make_ohlcv(rows)
+    return lambda: predict_linear_regression(df, days_ahead=5)
+
+
+def case_predict_linear_trend(rows, assets):
+    prices = make_prices(rows, assets)
+    return lambda: predict_linear_trend(prices)
+
+
+def _rows_to_period(rows):
+    # Bougies 5m : 288 par jour
+    return f"{max(1, int(np.ceil(rows / 288)))}d"
+
+
+def _build_prices_case(warm):
+    def setup(rows, assets):
+        keys = [f"BENCH{i}" for i in range(assets)]
+        for k in keys:
+            ASSETS[k] = f"{k}-USD"
+        data.set_provider(FakeProvider())
+        period = _rows_to_period(rows)
+
+        def run():
+            if not warm:
+                data.set_store(OHLCVStore(tempfile.mkdtemp(prefix="bench_store_")))
+                get_cache().invalidate()
+            return build_prices_matrix(keys, period=period, interval="5m")
+
+        if warm:
+            data.set_store(OHLCVStore(tempfile.mkdtemp(prefix="bench_store_")))
+            run()
+        return run
+    return setup
+
+
+CASES = {
+    "portfolio.simulate_portfolio": (case_simulate_portfolio, True),
+    "strategies.calculate_ma_crossover": (case_ma_crossover, False),
+    "strategies.calculate_buy_and_hold": (case_buy_and_hold, False),
+    "backtest.backtest[ma_crossover]": (case_backtest_ma, True),
+    "walkforward.walk_forward_ma": (case_walk_forward, False),
+    "metrics.max_drawdown": (_series_case(metrics.max_drawdown, "prices"), False),
+    "metrics.annualized_vol": (_series_case(metrics.annualized_vol, "returns"), False),
+    "metrics.annualized_return": (_series_case(metrics.annualized_return, "returns"), False),
+    "metrics.sharpe_ratio": (_series_case(metrics.sharpe_ratio, "returns"), False),
+    "metrics.corr_matrix": (_matrix_case(metrics.corr_matrix, "returns"), True),
+    "metrics.metrics_table": (_matrix_case(metrics.metrics_table, "returns"), True),
+    "metrics.rolling_vol": (_matrix_case(metrics.rolling_vol, "returns", window=100), True),
+    "metrics.rolling_sharpe": (_matrix_case(metrics.rolling_sharpe, "returns", window=100), True),
+    "metrics.rolling_drawdown": (_matrix_case(metrics.rolling_drawdown, "prices", window=100), True),
+    "metrics.rolling_corr": (_matrix_case(metrics.rolling_corr, "returns", window=100), True),
+    "data.align_closes[gaps]": (case_align_closes, True),
+    "portfolio.build_prices_matrix[cold]": (_build_prices_case(warm=False), True),
+    "portfolio.build_prices_matrix[warm]": (_build_prices_case(warm=True), True),
+    "predictions.predict_linear_regression": (case_predict_linear_regression, False),
+    "predictions.predict_linear_trend": (case_predict_linear_trend, True),
+}
+
+
+# --- Mesures ---
+
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def peak_memory(fn):
+    """Pic mémoire (Mo) alloué pendant un appel (tracemalloc suit aussi les tableaux NumPy)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1e6
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(rows_list, assets_list, repeat, only=None):
+    results = []
+    for name, (setup, uses_assets) in CASES.items():
+        if only and not any(o in name for o in only):
+            continue
+        for rows in rows_list:
+            for assets in (assets_list if uses_assets else [1]):
+                fn = setup(rows, assets)
+                fn()  # échauffement (imports, caches)
+                timings = time_call(fn, repeat)
+                peak = peak_memory(fn)
+                res = {
+                    "name": name,
+                    "rows": rows,
+                    "assets": assets,
+                    "repeat": repeat,
+                    "median_s": statistics.median(timings),
+                    "min_s": min(timings),
+                    "peak_mb": peak,
+                }
+                results.append(res)
+                print(f"{name:45s} rows={rows:>9,d} assets={assets:>3d}  "
+                      f"median={res['median_s'] * 1e3:10.2f} ms  peak={peak:9.1f} MB")
+    return results
+
+
+def compare(results, previous_path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    before = {(r["name"], r["rows"], r["assets"]): r for r in previous.get("results", [])}
+    print(f"\nComparaison avec {previous_path} (ratio = nouveau / ancien, < 1 = plus rapide)")
+    for r in results:
+        old = before.get((r["name"], r["rows"], r["assets"]))
+        if old is None or old["median_s"] == 0:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        flag = "  <-- plus lent" if ratio > 1.2 else ""
+        print(f"{r['name']:45s} rows={r['rows']:>9,d} assets={r['assets']:>3d}  x{ratio:6.2f}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques (données synthétiques).")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Tailles testées (1 000 000 : à demander explicitement)")
+    parser.add_argument("--assets", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="Ne lancer que les cas dont le nom contient ces textes")
+    parser.add_argument("--output", help="Fichier JSON de résultats (défaut : benchmarks/results/bench_<date>.json)")
+    parser.add_argument("--compare", help="JSON d'un run précédent à comparer")
+    args = parser.parse_args()
+
+    results = run(args.rows, args.assets, args.repeat, args.only)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    payload = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nRésultats : {output}")
+
+    if args.compare:
+        compare(results, args.compare)
@@ -1,58 +1,34 @@
-import yfinance as yf
-import pandas as pd
+import time
 from datetime import datetime
-import os
+
+from app.core.config import ASSETS
+from app.core.reports import REPORTS_DIR, compute_daily_metrics, get_report_history, write_report
 
 # Configuration
-SYMBOL = "BTC-USD"
-REPORT_DIR = "reports"
+PERIOD = "1mo"      # Historique utilisé pour la volatilité et le drawdown
+INTERVAL = "1d"
+REPORT_DIR = REPORTS_DIR
 
-# Créer le dossier reports s'il n'existe pas
-os.makedirs(REPORT_DIR, exist_ok=True)
 
 def generate_daily_report():
-    print(f"Génération du rapport pour {SYMBOL}...")
-    
-    # 1. Récupérer les données (1 mois pour la volatilité, 1 jour pour le prix)
-    ticker = yf.Ticker(SYMBOL)
-    hist = ticker.history(period="1mo")
-    
-    # 2. Calculs
-    today_data = hist.iloc[-1]
-    open_price = today_data['Open']
-    close_price = today_data['Close']
-    
-    # Volatilité (écart type des rendements journaliers sur 1 mois)
-    hist['Returns'] = hist['Close'].pct_change()
-    volatility = hist['Returns'].std() * 100 # En pourcentage
-    
-    # Max Drawdown (Chute maximale depuis le sommet sur 1 mois)
-    rolling_max = hist['Close'].cummax()
-    drawdown = (hist['Close'] - rolling_max) / rolling_max
-    max_drawdown = drawdown.min() * 100 # En pourcentage
-
-    # 3. Création du contenu du rapport
-    report_date = datetime.now().strftime("%Y-%m-%d")
-    report_content = f"""
-    --- RAPPORT JOURNALIER : {SYMBOL} ---
-    Date : {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-    
-    PRIX:
-    - Open : ${open_price:.2f}
-    - Close: ${close_price:.2f}
-    
-    RISQUE (30 jours):
-    - Volatilité : {volatility:.2f}%
-    - Max Drawdown: {max_drawdown:.2f}%
-    -------------------------------------
-    """
-    
-    # 4. Sauvegarde
-    filename = f"{REPORT_DIR}/report_{report_date}.txt"
-    with open(filename, "w") as f:
-        f.write(report_content)
-    
-    print(f"Rapport sauvegardé : {filename}")
+    keys = list(ASSETS.keys())
+    print(f"Génération du rapport pour {', '.join(keys)} + portefeuille...")
+    start = time.perf_counter()
+
+    # 1. Récupération (en parallèle) + calculs (un seul passage vectorisé)
+    rows, failures = compute_daily_metrics(keys, period=PERIOD, interval=INTERVAL)
+    if failures:
+        print(f"Actifs sans données : {failures}")
+    if not rows:
+        print("Aucune donnée, rapport non généré.")
+        return
+
+    # 2. Sauvegarde (texte + instantané JSON + lignes ajoutées à l'historique indexé)
+    txt_path, json_path = write_report(rows, failures, datetime.now(), report_dir=REPORT_DIR, period=PERIOD)
+
+    print(f"Rapport sauvegardé : {txt_path} ({json_path}) en {time.perf_counter() - start:.1f}s")
+    print(f"Historique : {get_report_history(REPORT_DIR).path}")
+
 
 if __name__ == "__main__":
-    generate_daily_report()
\ No newline at end of file
+    generate_daily_report()
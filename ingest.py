@@ -0,0 +1,18 @@
+import argparse
+
+from app.core.ingestion import IngestionWorker
+
+# Worker d'ingestion : maintient le stockage local à jour pour tous les actifs.
+# Les pages Streamlit lancées avec DASHBOARD_READ_ONLY_STORE=1 ne font alors que lire ce stockage.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rafraîchit le stockage OHLCV local (Yahoo Finance).")
+    parser.add_argument("--once", action="store_true", help="Un seul passage puis arrêt")
+    parser.add_argument("--every", type=int, default=None, help="Fréquence en secondes")
+    args = parser.parse_args()
+
+    worker = IngestionWorker() if args.every is None else IngestionWorker(every_seconds=args.every)
+    if args.once:
+        worker.run_once()
+    else:
+        worker.run_forever()
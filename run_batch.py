@@ -0,0 +1,30 @@
+import argparse
+import json
+import os
+
+from app.core.batch import run_batch
+from app.core.config import BATCH_DIR
+
+# Backtests en lot, sans Streamlit : une spec JSON (actifs, intervalles, périodes, stratégies
+# et grilles de paramètres, portefeuilles et fréquences de rebalancement, coûts) est
+# répartie sur un pool de processus. Relancer la même commande reprend là où elle s'était arrêtée.
+#
+#   python run_batch.py spec.json
+#   python run_batch.py spec.json --out data/batch/nuit --workers 8
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exécute une grille de backtests sur un pool de processus.")
+    parser.add_argument("spec", help="Fichier JSON décrivant les jobs")
+    parser.add_argument("--out", default=None, help="Dossier de sortie (défaut : data/batch/<nom de la spec>)")
+    parser.add_argument("--workers", type=int, default=None, help="Processus (défaut : nombre de coeurs)")
+    parser.add_argument("--chunk", type=int, default=None, help="Jobs par tâche envoyée au pool")
+    parser.add_argument("--refresh-data", action="store_true", help="Recharge les bougies au lieu de réutiliser celles du dossier")
+    args = parser.parse_args()
+
+    with open(args.spec, encoding="utf-8") as f:
+        spec = json.load(f)
+    out = args.out or os.path.join(BATCH_DIR, os.path.splitext(os.path.basename(args.spec))[0])
+
+    results = run_batch(spec, out, n_workers=args.workers, chunk_size=args.chunk, refresh_data=args.refresh_data)
+    errors = int(results["Error"].notna().sum()) if "Error" in results else 0
+    print(f"{len(results)} résultats ({errors} en erreur) : {os.path.join(out, 'results.parquet')}")
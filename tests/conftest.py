@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core import data
+from app.core.cache import get_cache
+from app.core.providers import FakeProvider
+from app.core.store import OHLCVStore
+
+
+@pytest.fixture
+def fake_data(tmp_path):
+    """Source synthétique (horloge figée) et stockage dans un dossier temporaire, cache vidé."""
+    provider, store = data.get_provider(), data.get_store()
+    data.set_provider(FakeProvider(now=pd.Timestamp.now(tz="UTC").floor("D"), seed=0))
+    data.set_store(OHLCVStore(str(tmp_path / "store")))
+    get_cache().invalidate()
+    yield data
+    data.set_provider(provider)
+    data.set_store(store)
+    get_cache().invalidate()
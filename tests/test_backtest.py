@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.backtest import backtest
+from app.core.costs import CostModel
+
+
+@pytest.fixture
+def ohlcv():
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-01", periods=2000, freq="h", tz="UTC")
+    close = 100.0 * np.exp(np.cumsum(rng.normal(2e-4, 0.01, len(index))))
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                         "Volume": 1e6}, index=index)
+
+
+@pytest.mark.parametrize("name, params", [("buy_and_hold", {}), ("ma_crossover", {"short": 10, "long": 50})])
+def test_costs_lower_return_and_sharpe(ohlcv, name, params):
+    free = backtest(name, ohlcv, params)["stats"].iloc[0]
+    paid = backtest(name, ohlcv, params, costs=CostModel(fee_bps=10))["stats"].iloc[0]
+    assert paid["Annualized_Return"] < free["Annualized_Return"]
+    assert paid["Sharpe"] < free["Sharpe"]
+
+
+def test_stats_match_equity(ohlcv):
+    # Le rendement composé des stats redonne l'equity finale (frais d'entrée compris)
+    res = backtest("buy_and_hold", ohlcv, costs=CostModel(fee_bps=10))
+    n = len(ohlcv) - 1
+    total = (1.0 + res["stats"]["Annualized_Return"].iloc[0] / 100.0) ** (n / 252) - 1.0
+    assert total == pytest.approx(res["equity"].iloc[-1, 0] / 100.0 - 1.0, rel=1e-9)
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.metrics import rolling_sharpe, rolling_vol
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(rng.normal(0.0, 0.01, (300, 3)), columns=["A", "B", "C"],
+                         index=pd.date_range("2024-01-01", periods=300, freq="h", tz="UTC"))
+    frame.iloc[50, 1] = np.nan
+    return frame
+
+
+@pytest.mark.parametrize("window", [1, 2, 20])
+def test_rolling_vol_and_sharpe_match_pandas(returns, window):
+    std = returns.rolling(window).std()
+    mean = returns.rolling(window).mean()
+    expected_vol = std * np.sqrt(252) * 100.0
+    expected_sharpe = (mean / std * np.sqrt(252)).where(std > 0)
+    pd.testing.assert_frame_equal(rolling_vol(returns, window), expected_vol, rtol=1e-6)
+    pd.testing.assert_frame_equal(rolling_sharpe(returns, window), expected_sharpe, rtol=1e-6)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.costs import CostModel
+from app.core.metrics import column_stats, fold_first_row
+from app.core.portfolio import normalize_weights, simulate_portfolio, simulate_portfolios_batch
+
+
+def reference_simulate_portfolio(prices, weights, rebalance="W", base=100.0):
+    """Boucle d'origine (une ligne à la fois), gardée comme référence du moteur vectorisé."""
+    assets = list(prices.columns)
+    weights = normalize_weights({a: weights.get(a, 0.0) for a in assets})
+    returns = prices.pct_change().fillna(0.0)
+    rebalance_dates = set(returns.resample(rebalance).first().index)
+
+    current_w = pd.Series(weights, index=assets)
+    port_returns = []
+    for t in returns.index:
+        if t in rebalance_dates:
+            current_w = pd.Series(weights, index=assets)
+        r_t = returns.loc[t]
+        port_returns.append(float((current_w * r_t).sum()))
+        current_w = current_w * (1.0 + r_t)
+        if current_w.sum() > 0:
+            current_w = current_w / current_w.sum()
+
+    out = pd.DataFrame(index=returns.index)
+    out["Portfolio_Returns"] = port_returns
+    out["Portfolio_Equity"] = base * (1.0 + out["Portfolio_Returns"]).cumprod()
+    return out
+
+
+@pytest.fixture(scope="module")
+def prices():
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-01", periods=1000, freq="h", tz="UTC")
+    values = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, (len(index), 4)), axis=0))
+    frame = pd.DataFrame(values, index=index, columns=["A", "B", "C", "D"])
+    # Trous de cotation (une bougie isolée, un bloc, sur des actifs différents)
+    frame.iloc[100, 1] = np.nan
+    frame.iloc[400:430, 2] = np.nan
+    frame.iloc[900:905, [0, 3]] = np.nan
+    return frame
+
+
+@pytest.mark.parametrize("rebalance", ["h", "D", "W", "ME"])
+@pytest.mark.parametrize("weights", [
+    {"A": 0.25, "B": 0.25, "C": 0.25, "D": 0.25},
+    {"A": 0.6, "B": 0.3, "C": 0.1},
+    {"A": 5.0, "B": 1.0, "C": 3.0, "D": 1.0},
+])
+def test_simulate_portfolio_matches_reference_loop(prices, rebalance, weights):
+    with np.errstate(all="ignore"):
+        expected = reference_simulate_portfolio(prices, weights, rebalance)
+    result = simulate_portfolio(prices, weights, rebalance=rebalance)
+    pd.testing.assert_index_equal(result.index, expected.index)
+    for column in ["Portfolio_Returns", "Portfolio_Equity"]:
+        assert np.allclose(result[column], expected[column], rtol=1e-10, atol=1e-12), column
+
+
+@pytest.mark.parametrize("costs", [None, CostModel(fee_bps=10, fixed_cost=1.0)])
+def test_batch_stats_match_single_simulation(prices, costs):
+    # Mêmes statistiques que le backtest et le batch CLI (ligne 0 composée dans la ligne 1)
+    weights = np.array([[0.6, 0.3, 0.1, 0.0], [0.25, 0.25, 0.25, 0.25]])
+    _, stats = simulate_portfolios_batch(prices, weights, rebalance="D", costs=costs)
+    for i, row in enumerate(weights):
+        sim = simulate_portfolio(prices, dict(zip(prices.columns, row)), rebalance="D", costs=costs)
+        expected = column_stats(fold_first_row(sim["Portfolio_Returns"].to_numpy()), sim["Portfolio_Equity"].to_numpy())
+        for name, values in expected.items():
+            assert stats[name].iloc[i] == pytest.approx(values[0], rel=1e-10), name
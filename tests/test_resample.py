@@ -0,0 +1,19 @@
+import pandas as pd
+
+from app.core.cache import get_cache
+from app.core.store import OHLCVStore
+
+
+def test_derived_interval_follows_longer_period(fake_data, tmp_path):
+    # 4h dérivé de 5m : 7d puis 1mo doit donner le même historique qu'un stockage neuf en 1mo
+    fake_data.get_historical_data_many(["BTC"], period="7d", interval="4h")
+    frames, _ = fake_data.get_historical_data_many(["BTC"], period="1mo", interval="4h")
+    extended = frames["BTC"]
+
+    fake_data.set_store(OHLCVStore(str(tmp_path / "fresh")))
+    get_cache().invalidate()
+    frames, _ = fake_data.get_historical_data_many(["BTC"], period="1mo", interval="4h")
+    fresh = frames["BTC"]
+
+    assert len(extended) > 150
+    pd.testing.assert_frame_equal(extended, fresh)
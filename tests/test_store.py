@@ -0,0 +1,35 @@
+import pandas as pd
+
+from app.core.providers import synthetic_ohlcv
+from app.core.store import OHLCVStore
+
+
+def test_append_segments_and_compact(tmp_path):
+    store = OHLCVStore(str(tmp_path), max_segments=3)
+    bars = synthetic_ohlcv(500, interval="5m", seed=0)
+    expected = bars.copy()
+
+    store.append("BTC-USD", "5m", bars.iloc[:300], covered_since=bars.index[0])
+    for lo in range(299, 500, 40):
+        # Chaque refresh redemande la dernière bougie stockée (encore en cours)
+        chunk = bars.iloc[lo:lo + 41].copy()
+        chunk.iloc[0, chunk.columns.get_loc("Close")] += 1.0
+        expected.loc[chunk.index[0], "Close"] = chunk["Close"].iloc[0]
+        store.append("BTC-USD", "5m", chunk)
+        assert len(store._segments("BTC-USD", "5m")) <= 3
+        pd.testing.assert_frame_equal(store.load("BTC-USD", "5m"), expected.loc[:chunk.index[-1]], check_freq=False)
+
+    assert store.last_timestamp("BTC-USD", "5m") == bars.index[-1]
+    store.compact("BTC-USD", "5m")
+    assert store._segments("BTC-USD", "5m") == []
+    pd.testing.assert_frame_equal(store.load("BTC-USD", "5m"), expected, check_freq=False)
+
+
+def test_last_timestamp_from_meta(tmp_path):
+    store = OHLCVStore(str(tmp_path))
+    bars = synthetic_ohlcv(100, interval="1h", seed=1)
+    store.append("ETH-USD", "1h", bars)
+    path, _ = store._paths("ETH-USD", "1h")
+    with open(path, "wb") as f:
+        f.write(b"")  # Parquet illisible : la méta suffit
+    assert store.last_timestamp("ETH-USD", "1h") == bars.index[-1]
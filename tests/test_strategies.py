@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.providers import synthetic_ohlcv
+from app.core.strategies import (
+    BuyAndHoldStream,
+    MACrossoverStream,
+    calculate_buy_and_hold,
+    calculate_ma_crossover,
+)
+
+
+def _windows(df, size=600, step=7, sliding=True):
+    """Fenêtres successives (refresh) ; la dernière bougie peut encore changer."""
+    for end in range(size, len(df), step):
+        window = df.iloc[end - size if sliding else 0:end].copy()
+        # Bougie en cours : clôture provisoire, corrigée au refresh suivant
+        window.iloc[-1, window.columns.get_loc("Close")] *= 1.001
+        yield window
+
+
+STREAMS = [
+    (BuyAndHoldStream, calculate_buy_and_hold),
+    (lambda: MACrossoverStream(10, 50), lambda df: calculate_ma_crossover(df, 10, 50)),
+    (lambda: MACrossoverStream(50, 10), lambda df: calculate_ma_crossover(df, 50, 10)),
+]
+
+
+@pytest.mark.parametrize("make_stream, batch", STREAMS)
+def test_stream_is_bit_exact_on_growing_history(make_stream, batch):
+    df = synthetic_ohlcv(1000, interval="5m", seed=0)
+    stream = make_stream()
+    for window in _windows(df, sliding=False):
+        stream.update(window)
+        pd.testing.assert_frame_equal(stream.frame(), batch(window), check_exact=True)
+
+
+@pytest.mark.parametrize("make_stream, batch", STREAMS)
+def test_stream_matches_batch_on_sliding_window(make_stream, batch):
+    df = synthetic_ohlcv(1000, interval="5m", seed=0)
+    stream = make_stream()
+    for n, window in enumerate(_windows(df)):
+        stream.update(window)
+        result = stream.frame()
+        # Rebasage sur le début de la fenêtre : exact à l'arrondi près (voir BuyAndHoldStream)
+        pd.testing.assert_frame_equal(result, batch(window), check_exact=False, rtol=1e-9)
+        # Mémoire bornée : pas de bougie hors fenêtre
+        assert result.index[0] == window.index[0]
+    assert n > 10